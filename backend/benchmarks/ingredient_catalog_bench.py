@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+食材目錄微效能測試
+比較逐一掃描分類清單與雜湊索引查詢分類的耗時（目錄越大差距越明顯），
+以及每次請求序列化 /categories 與使用預先序列化內容的耗時
+
+用法: python benchmarks/ingredient_catalog_bench.py [--sizes 100 1000 10000 100000] [--lookups 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.ingredients import COMMON_INGREDIENTS  # noqa: E402
+from services.ingredient_catalog import IngredientCatalog  # noqa: E402
+
+
+def linear_category(categories, ingredient):
+    """舊做法：逐一掃描各分類清單"""
+    for category, ingredients in categories.items():
+        if ingredient in ingredients:
+            return category
+    return 'others'
+
+
+def synthetic_categories(size):
+    """以現有分類名稱產生共 size 種食材"""
+    names = list(COMMON_INGREDIENTS)
+    categories = {name: [] for name in names}
+    for i in range(size):
+        categories[names[i % len(names)]].append(f'食材{i}')
+    return categories
+
+
+def per_call_ns(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='食材目錄微效能測試')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000], help='食材種類數')
+    parser.add_argument('--lookups', type=int, default=20000, help='每次量測的查詢數')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'食材數':>10}{'掃描 ns/次':>14}{'索引 ns/次':>14}")
+    # 第一列為目前的食材資料
+    for categories in [COMMON_INGREDIENTS] + [synthetic_categories(size) for size in args.sizes]:
+        size = sum(len(names) for names in categories.values())
+        catalog = IngredientCatalog(categories)
+        names = [name for names in categories.values() for name in names] + ['不存在的食材']
+        queries = [rng.choice(names) for _ in range(args.lookups)]
+
+        def index():
+            for query in queries:
+                catalog.category(query)
+
+        # 大目錄的線性掃描很慢，減少查詢數
+        scan_number = max(1, args.lookups * 100 // max(size, 100))
+        scan_queries = queries[:scan_number]
+        scan_ns = min(timeit.repeat(
+            lambda: [linear_category(categories, query) for query in scan_queries], number=1, repeat=3
+        )) / len(scan_queries) * 1e9
+        index_ns = per_call_ns(index, 1) / len(queries)
+        print(f"{size:>10}{scan_ns:>14.0f}{index_ns:>14.0f}")
+
+    catalog = IngredientCatalog(COMMON_INGREDIENTS)
+    serialize_ns = per_call_ns(
+        lambda: json.dumps({'success': True, 'categories': COMMON_INGREDIENTS}, ensure_ascii=False).encode('utf-8'),
+        2000
+    )
+    cached_ns = per_call_ns(lambda: catalog.categories_payload, 2000)
+    print(f"\n/categories 序列化: 每次 {serialize_ns:.0f} ns，預先序列化: {cached_ns:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+食材共現建議效能測試
+以目錄食材組成帶有群聚結構的合成食譜（每道食譜從一個「菜系」食材群抽取，再混入少量隨機食材），
+量測完整建立、增量更新（新食譜批次累加後只重算受影響的列）與 suggest 查詢延遲
+
+用法: python benchmarks/ingredient_suggest_bench.py [--recipes 50000] [--batch 200] [--queries 20000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cooccurrence import CooccurrenceModel  # noqa: E402
+from services.ingredient_normalizer import ingredient_normalizer  # noqa: E402
+
+
+def synthetic_recipes(names, count, rng, clusters=12):
+    groups = [rng.sample(names, min(len(names), 15)) for _ in range(clusters)]
+    recipes = []
+    for _ in range(count):
+        group = rng.choice(groups)
+        chosen = rng.sample(group, rng.randint(3, 7)) + rng.sample(names, rng.randint(0, 2))
+        recipes.append({'ingredients': [{'name': name, 'amount': '適量'} for name in chosen]})
+    return recipes
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='食材共現建議效能測試')
+    parser.add_argument('--recipes', type=int, default=50000, help='初始食譜數')
+    parser.add_argument('--batch', type=int, default=200, help='增量更新每批新食譜數')
+    parser.add_argument('--queries', type=int, default=20000, help='suggest 查詢次數')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    names = list(ingredient_normalizer.vocabulary)
+    recipes = synthetic_recipes(names, args.recipes + args.batch, rng)
+
+    model = CooccurrenceModel()
+    count, build_seconds = timed(lambda: model.load(recipes[:args.recipes]))
+
+    added, add_seconds = timed(lambda: model.add_recipes(recipes[args.recipes:]))
+    rows, rebuild_seconds = timed(model.rebuild)
+
+    queries = [rng.sample(names, rng.randint(2, 6)) for _ in range(args.queries)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        model.suggest(query)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+
+    stats = model.stats()
+    print(f"{count:,} 道食譜，{stats['ingredients']} 種食材，{stats['pairs']:,} 組共現")
+    print(f"{'完整建立':<12}{build_seconds * 1000:>10.1f} ms")
+    print(f"{'增量累加':<12}{add_seconds * 1000:>10.1f} ms（{added} 道新食譜）")
+    print(f"{'增量重算':<12}{rebuild_seconds * 1000:>10.1f} ms（{rows} 列）")
+    print(f"{'suggest':<12} p50 {statistics.median(latencies):.1f} µs  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+食材即時搜尋效能測試
+以現有食材組合出數千種名稱（加上同義詞），模擬使用者逐字輸入（每次按鍵送出目前的前綴）
+與打錯字的查詢，比較逐筆子字串掃描與 typeahead 索引的每次查詢延遲（p50 / p99）
+
+用法: python benchmarks/ingredient_typeahead_bench.py [--sizes 1000 5000 12000] [--words 300]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.ingredients import catalog  # noqa: E402
+from services.ingredient_merge import normalize_name  # noqa: E402
+from services.ingredient_search import TypeaheadIndex  # noqa: E402
+
+MODIFIERS = ['', '冷凍', '新鮮', '有機', '台灣', '日本', '去骨', '醃漬', '乾燥', '煙燻', '進口', '小']
+FORMS = ['', '丁', '絲', '片', '泥', '粉', '塊', '條', '末', '醬']
+
+
+def synthetic_names(size):
+    """修飾詞 × 現有食材 × 切法，取前 size 個（第一批就是原本的食材）"""
+    names = {}
+    for modifier, form, (name, category) in itertools.product(MODIFIERS, FORMS, catalog.by_name.items()):
+        names.setdefault(modifier + name + form, category)
+        if len(names) >= size:
+            break
+    return names
+
+
+def linear_search(entries, query, limit=20):
+    """舊做法：逐筆子字串比對後截斷"""
+    query = normalize_name(query)
+    return [name for name, lowered in entries if query in lowered][:limit]
+
+
+def keystrokes(names, words, rng):
+    """逐字輸入的每個前綴，以及把一個字換掉的打錯字查詢"""
+    queries = []
+    for name in rng.sample(names, min(words, len(names))):
+        queries.extend(name[:i] for i in range(1, len(name) + 1))
+        if len(name) >= 3:
+            at = rng.randrange(len(name))
+            queries.append(name[:at] + '咪' + name[at + 1:])
+    return queries
+
+
+def latencies_us(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='食材即時搜尋效能測試')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 12000], help='食材名稱數（最多約 12000）')
+    parser.add_argument('--words', type=int, default=300, help='模擬輸入的名稱數')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'名稱數':>8}{'寫法數':>8}{'建立 ms':>9}{'查詢數':>8}"
+          f"{'掃描 p50':>10}{'p99 us':>8}{'索引 p50':>10}{'p99 us':>8}")
+    for size in args.sizes:
+        names = synthetic_names(size)
+        started = time.perf_counter()
+        index = TypeaheadIndex(names)
+        build_ms = (time.perf_counter() - started) * 1000
+        entries = [(name, normalize_name(name)) for name in names]
+        queries = keystrokes(list(names), args.words, rng)
+
+        scan = latencies_us(lambda query: linear_search(entries, query), queries)
+        indexed = latencies_us(lambda query: index.search(query), queries)
+        print(f"{len(names):>8}{index.term_count:>8}{build_ms:>9.0f}{len(queries):>8}"
+              f"{scan[0]:>10.0f}{scan[1]:>8.0f}{indexed[0]:>10.0f}{indexed[1]:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
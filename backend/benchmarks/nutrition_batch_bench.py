@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+食譜營養批次計算效能測試
+以目錄中的食材與常見份量隨機組成食譜，比較逐道、逐食材以 Python 迴圈累加
+與 NutritionTable.recipe_nutrition 一次向量化計算（含名稱正規化與份量解析）的吞吐量，
+另外量測純乘加核心（已解析好的陣列）的耗時
+
+用法: python benchmarks/nutrition_batch_bench.py [--recipes 20000] [--ingredients 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from services.nutrition import NUTRIENTS, NUTRITION_CSV_PATH, NutritionTable, parse_amount  # noqa: E402
+
+AMOUNTS = ['1個', '2個', '1/2顆', '200g', '50g', '1大匙', '2茶匙', '1碗', '3瓣', '1根', '適量', '少許']
+
+
+def random_recipes(table, count, size, rng):
+    return [
+        [{'name': rng.choice(table.names), 'amount': rng.choice(AMOUNTS)} for _ in range(size)]
+        for _ in range(count)
+    ]
+
+
+def python_loop(table, recipes):
+    """舊式做法：逐道食譜、逐個食材查表並累加"""
+    results = []
+    for ingredients in recipes:
+        totals = dict.fromkeys(NUTRIENTS, 0.0)
+        for item in ingredients:
+            canonical = table.normalizer.canonical(item['name'])
+            values = table.lookup(canonical)
+            amount = parse_amount(item['amount'])
+            if values is None or amount is None:
+                continue
+            grams = amount.quantity * (amount.unit_grams or table.unit_grams(canonical))
+            for nutrient in NUTRIENTS:
+                totals[nutrient] += values[nutrient] * grams / 100
+        results.append(totals)
+    return results
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='食譜營養批次計算效能測試')
+    parser.add_argument('--recipes', type=int, default=20000, help='食譜數')
+    parser.add_argument('--ingredients', type=int, default=8, help='每道食譜的食材數')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        table = NutritionTable.from_csv(NUTRITION_CSV_PATH, cache_dir)
+        recipes = random_recipes(table, args.recipes, args.ingredients, rng)
+
+        loop, loop_seconds = timed(lambda: python_loop(table, recipes))
+        batch, batch_seconds = timed(lambda: table.recipe_nutrition(recipes))
+        assert all(abs(a['calories'] - b['calories']) < 1 for a, b in zip(loop, batch))
+
+        total = args.recipes * args.ingredients
+        np_rng = np.random.default_rng(42)
+        recipe_ids = np.repeat(np.arange(args.recipes), args.ingredients)
+        positions = np_rng.integers(0, len(table), size=total)
+        grams = np_rng.uniform(1, 300, size=total)
+        _, core_seconds = timed(lambda: table.totals(recipe_ids, positions, grams, args.recipes))
+
+        print(f"{args.recipes:,} 道食譜 × {args.ingredients} 種食材（mmap: {table.mapped}）")
+        print(f"{'Python 迴圈':<14}{loop_seconds * 1000:>10.1f} ms{args.recipes / loop_seconds:>14,.0f} 道/秒")
+        print(f"{'批次（含解析）':<14}{batch_seconds * 1000:>10.1f} ms{args.recipes / batch_seconds:>14,.0f} 道/秒")
+        print(f"{'乘加核心':<14}{core_seconds * 1000:>10.1f} ms{args.recipes / core_seconds:>14,.0f} 道/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+食譜生成微批次效能測試
+以模擬的上游（固定的每次呼叫開銷 + 依輸出 token 數增加的生成時間，不呼叫 OpenAI API）
+比較停用與啟用微批次時的吞吐量、每個請求的 token 數、排隊延遲與端到端延遲
+
+用法: python benchmarks/recipe_micro_batch.py [--requests 400] [--concurrency 48]
+      [--window-ms 20] [--max-batch 8] [--overhead 0.3] [--token-ms 0.5]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RECIPE_CACHE_PATH', '')
+os.environ.setdefault('RECIPE_HEDGE', 'off')
+
+from routes import recipes  # noqa: E402
+from services.llm_gateway import AdaptiveLimiter, CircuitBreaker, LLMGateway  # noqa: E402
+from services.micro_batch import MicroBatcher  # noqa: E402
+
+# 模擬的 token 數：指示文字、每組請求的描述、每組輸出的三道食譜
+INSTRUCTION_TOKENS = 150
+REQUEST_TOKENS = 30
+RECIPES_TOKENS = 350
+
+VOCABULARY = ['番茄', '雞蛋', '豆腐', '蔥', '洋蔥', '馬鈴薯', '紅蘿蔔', '雞肉', '豬肉', '牛肉', '高麗菜', '青椒']
+
+
+class SimulatedClient:
+    """依請求組數回傳食譜 JSON，延遲 = 開銷 + 輸出 token 數 × 每 token 時間"""
+
+    def __init__(self, overhead, token_seconds):
+        self.overhead = overhead
+        self.token_seconds = token_seconds
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        prompt = messages[0]['content']
+        numbers = [int(number) for number in re.findall(r'請求 (\d+):', prompt)]
+        count = max(1, len(numbers))
+        time.sleep(self.overhead + RECIPES_TOKENS * count * self.token_seconds)
+
+        recipes_for = lambda number: [  # noqa: E731
+            {'name': f'料理{number}-{i}', 'time': 20, 'difficulty': '簡單', 'main_ingredients': ['番茄']}
+            for i in range(3)
+        ]
+        if numbers:
+            content = json.dumps({'results': [{'index': n, 'recipes': recipes_for(n)} for n in numbers]})
+        else:
+            content = json.dumps({'recipes': recipes_for(1)})
+        usage = SimpleNamespace(prompt_tokens=INSTRUCTION_TOKENS + REQUEST_TOKENS * count,
+                                completion_tokens=RECIPES_TOKENS * count)
+        return iter([
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None),
+            SimpleNamespace(choices=[], usage=usage),
+        ])
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(args, batcher):
+    """以 concurrency 個執行緒送出 requests 個互不相同的請求"""
+    recipes.recipe_batcher = batcher
+    gateway = recipes.recipe_router.gateway
+    tokens_before = gateway.token_usage(tier.model for tier in recipes.recipe_router.tiers)
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i):
+        canonical = {'ingredients': [VOCABULARY[i % len(VOCABULARY)], f'食材{i}'], 'preferences': {}}
+        started = time.perf_counter()
+        recipes._generate_recipes(canonical)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    tokens = gateway.token_usage(tier.model for tier in recipes.recipe_router.tiers) - tokens_before
+    return {
+        'throughput': args.requests / elapsed,
+        'tokens_per_request': tokens / args.requests,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'queue_p50': batcher.queue_delay.percentile(0.5) if batcher else 0.0,
+        'batch_size': batcher.stats()['avg_batch_size'] if batcher else 1.0,
+    }
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='食譜生成微批次效能測試')
+    parser.add_argument('--requests', type=int, default=400, help='請求數')
+    parser.add_argument('--concurrency', type=int, default=48, help='併發數')
+    parser.add_argument('--window-ms', type=float, default=20, help='批次窗口（毫秒）')
+    parser.add_argument('--max-batch', type=int, default=8, help='批次上限')
+    parser.add_argument('--overhead', type=float, default=0.3, help='每次呼叫的固定開銷（秒）')
+    parser.add_argument('--token-ms', type=float, default=0.5, help='每個輸出 token 的生成時間（毫秒）')
+    parser.add_argument('--upstream-concurrency', type=int, default=16, help='上游併發上限')
+    args = parser.parse_args()
+
+    # 以固定併發上限模擬上游，只看批次本身的效果
+    recipes.recipe_router.gateway = LLMGateway(
+        client=SimulatedClient(args.overhead, args.token_ms / 1000),
+        limiter=AdaptiveLimiter(args.upstream_concurrency, args.upstream_concurrency, target_latency=1e9),
+        breaker=CircuitBreaker(failure_threshold=10 ** 9),
+    )
+    recipes.recipe_writer = None
+
+    modes = [
+        ('unbatched', None),
+        ('batched', MicroBatcher('bench', recipes._complete_recipe_batch, recipes._complete_recipes,
+                                 args.window_ms / 1000, args.max_batch)),
+    ]
+    print(f"{'mode':<10}{'req/s':>9}{'tokens/req':>12}{'batch':>7}{'queue p50':>11}{'p50 s':>8}{'p99 s':>8}")
+    for name, batcher in modes:
+        result = run(args, batcher)
+        print(
+            f"{name:<10}{result['throughput']:>9.1f}{result['tokens_per_request']:>12.0f}"
+            f"{result['batch_size']:>7.1f}{result['queue_p50'] * 1000:>9.0f}ms"
+            f"{result['p50']:>8.2f}{result['p99']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+上傳流程離線壓測
+使用 replay 識別後端（不呼叫 OpenAI API），以多執行緒併發打 /api/vision/batch-upload，
+量測整個上傳流程（讀取上傳、去重、前處理、識別、合併）的吞吐量與延遲分佈
+
+用法: python benchmarks/upload_load_test.py [--requests 200] [--concurrency 32]
+      [--images-per-request 4] [--latency lognormal:0.8,0.4] [--recordings recordings/vision.json]
+未指定 --recordings 時會產生合成圖片與對應的錄製檔
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_INGREDIENTS = [
+    {'name': '番茄', 'confidence': 1.0, 'category': 'vegetables'},
+    {'name': '雞蛋', 'confidence': 1.0, 'category': 'others'},
+]
+
+
+def synthetic_images(count):
+    """產生內容互不相同的合成圖片（每張都會錯過快取）"""
+    return [f"synthetic-image-{i}".encode('utf-8') * 64 for i in range(count)]
+
+
+def write_recordings(images, path):
+    """為合成圖片產生錄製檔"""
+    from services.recognizers import image_digest
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({image_digest(image): SAMPLE_INGREDIENTS for image in images}, f, ensure_ascii=False)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='上傳流程離線壓測（replay 識別後端）')
+    parser.add_argument('--requests', type=int, default=200, help='請求總數')
+    parser.add_argument('--concurrency', type=int, default=32, help='同時送出的請求數')
+    parser.add_argument('--images-per-request', type=int, default=4, help='每個請求的圖片數')
+    parser.add_argument('--latency', default='lognormal:0.8,0.4', help='模擬識別延遲分佈')
+    parser.add_argument('--recordings', help='錄製檔（VISION_RECORD_PATH 產生）')
+    args = parser.parse_args()
+
+    images = synthetic_images(args.requests * args.images_per_request)
+    recordings = args.recordings
+    if not recordings:
+        recordings = os.path.join(tempfile.mkdtemp(), 'vision.json')
+        write_recordings(images, recordings)
+
+    # 識別後端在匯入時建立，需先設定環境變數；停用磁碟快取避免結果受先前執行影響
+    os.environ['VISION_RECOGNIZER'] = 'replay'
+    os.environ['VISION_REPLAY_PATH'] = recordings
+    os.environ['VISION_REPLAY_LATENCY'] = args.latency
+    os.environ.setdefault('VISION_REPLAY_SEED', '42')
+    os.environ['VISION_CACHE_PATH'] = ''
+    os.environ['VISION_RECORD_PATH'] = ''
+
+    from app import app
+    from services import metrics
+
+    client = app.test_client()
+
+    def send(i):
+        batch = images[i * args.images_per_request:(i + 1) * args.images_per_request]
+        data = {'files': [(io.BytesIO(image), f'image-{i}-{j}.jpg') for j, image in enumerate(batch)]}
+        started = time.perf_counter()
+        response = client.post(
+            '/api/vision/batch-upload', data=data, content_type='multipart/form-data',
+            headers={'X-Session-Id': f'load-test-{i}'}
+        )
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, _ in results]
+    failures = sum(1 for _, status in results if status != 200)
+    print(f"請求數: {args.requests}，併發: {args.concurrency}，每請求圖片數: {args.images_per_request}，延遲: {args.latency}")
+    print(f"總耗時: {elapsed:.2f}s，吞吐量: {args.requests / elapsed:.1f} req/s，"
+          f"{args.requests * args.images_per_request / elapsed:.1f} images/s，失敗: {failures}")
+    print(f"延遲 p50: {percentile(latencies, 0.5) * 1000:.0f} ms，p95: {percentile(latencies, 0.95) * 1000:.0f} ms，"
+          f"p99: {percentile(latencies, 0.99) * 1000:.0f} ms，max: {max(latencies) * 1000:.0f} ms")
+
+    snapshot = metrics.snapshot()
+    print(json.dumps({key: snapshot.get(key) for key in ('vision_replay', 'vision_executor')}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
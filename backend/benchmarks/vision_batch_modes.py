@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+批次識別模式效能比較
+比較 per_image（每張圖片一次呼叫）與 packed（多張圖片一次呼叫）的延遲與 token 用量
+會實際呼叫 OpenAI API（不經過快取），需設定 OPENAI_API_KEY
+
+用法: python benchmarks/vision_batch_modes.py <圖片資料夾> [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from routes import vision  # noqa: E402
+from services.concurrency import vision_executor  # noqa: E402
+from services.image_preprocess import prepare_image  # noqa: E402
+from services.recognizers import OpenAIRecognizer  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def load_images(directory):
+    """讀取資料夾中的圖片"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(directory, name), 'rb') as f:
+                images.append(f.read())
+    return images
+
+
+recognizer = OpenAIRecognizer()
+
+
+def run_per_image(images):
+    """每張圖片各自呼叫一次"""
+    def work(image):
+        with app.app_context():
+            return recognizer.recognize(image)
+
+    vision_executor.map_ordered(work, images, max_concurrency=vision.VISION_REQUEST_CONCURRENCY)
+
+
+def run_packed(images):
+    """依打包上限分組呼叫"""
+    prepared = [prepare_image(image) for image in images]
+    chunks = vision._chunk_prepared(prepared, vision.VISION_PACK_MAX_IMAGES, vision.VISION_PACK_MAX_IMAGE_TOKENS)
+
+    def work(chunk):
+        with app.app_context():
+            return recognizer.recognize_packed([images[i] for i in chunk], [prepared[i] for i in chunk])
+
+    vision_executor.map_ordered(work, chunks, max_concurrency=vision.VISION_REQUEST_CONCURRENCY)
+
+
+def measure(mode, runner, images, repeat):
+    """執行並回傳平均延遲與 token 用量"""
+    before = recognizer.usage.stats().get(mode, {})
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        runner(images)
+        latencies.append(time.perf_counter() - started)
+    after = recognizer.usage.stats().get(mode, {})
+
+    def delta(field):
+        return (after.get(field, 0) - before.get(field, 0)) / repeat
+
+    return {
+        'mode': mode,
+        'avg_seconds': sum(latencies) / len(latencies),
+        'max_seconds': max(latencies),
+        'calls': delta('calls'),
+        'prompt_tokens': delta('prompt_tokens'),
+        'completion_tokens': delta('completion_tokens'),
+    }
+
+
+def main():
+    """主程式"""
+    parser = argparse.ArgumentParser(description='比較批次識別模式')
+    parser.add_argument('directory', help='圖片資料夾')
+    parser.add_argument('--repeat', type=int, default=3, help='每種模式重複次數')
+    args = parser.parse_args()
+
+    if not recognizer.available or not os.environ.get('OPENAI_API_KEY'):
+        print("請先設定 OPENAI_API_KEY")
+        return
+
+    images = load_images(args.directory)
+    if not images:
+        print("資料夾中沒有圖片")
+        return
+
+    print(f"圖片數: {len(images)}，每種模式重複 {args.repeat} 次")
+    print(f"{'模式':<10}{'平均秒數':>10}{'最慢秒數':>10}{'呼叫數':>8}{'輸入tokens':>12}{'輸出tokens':>12}")
+    for mode, runner in (('per_image', run_per_image), ('packed', run_packed)):
+        result = measure(mode, runner, images, args.repeat)
+        print(
+            f"{result['mode']:<10}{result['avg_seconds']:>10.2f}{result['max_seconds']:>10.2f}"
+            f"{result['calls']:>8.1f}{result['prompt_tokens']:>12.0f}{result['completion_tokens']:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+離線預熱食譜快取
+從使用記錄（USAGE_LOG_PATH 的 JSONL 檔或 Postgres usage_logs 表）找出最常見的標準食材組合，
+在呼叫額度內預先生成食譜並寫入食譜快取（RECIPE_CACHE_*，與 API 伺服器共用同一個 SQLite 檔）
+
+用法:
+  # 以過去 7 天的記錄預熱前 500 組，每分鐘最多 30 次、總共最多 400 次 LLM 呼叫
+  python jobs/warm_recipe_cache.py run --days 7 --top 500 --rate 30 --max-calls 400
+  # 量測預熱結果對今天流量的覆蓋率
+  python jobs/warm_recipe_cache.py coverage --since 2024-06-02 --until 2024-06-03
+
+排程（尖峰前每日重新預熱，快取 TTL 為 24 小時）:
+  0 9 * * * cd /app && python jobs/warm_recipe_cache.py run --days 7 --force
+中斷後以相同參數重新執行會從檢查點續跑
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_gateway import llm_gateway  # noqa: E402
+from services.recipe_generation import (  # noqa: E402
+    RECIPE_PROMPT_VERSION, canonical_request, generate_recipes, recipe_cache, recipe_cache_key
+)
+from services.recipe_persist import create_recipe_writer  # noqa: E402
+from services.usage_log import USAGE_LOG_PATH, iter_usage_file, iter_usage_postgres  # noqa: E402
+from services.warm_cache import (  # noqa: E402
+    Checkpoint, RateBudget, top_combinations, traffic_coverage, warm_cache
+)
+
+DEFAULT_CHECKPOINT = os.environ.get('WARM_CACHE_CHECKPOINT', '/tmp/cache/warm_recipe_cache.json')
+
+
+def parse_day(value):
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def usage_records(source, since, until):
+    """source 為 postgres 或 JSONL 檔路徑"""
+    if source == 'postgres':
+        return iter_usage_postgres('recipe_search', since, until)
+    return iter_usage_file(source, 'recipe_search', since, until)
+
+
+def run(args):
+    until = parse_day(args.until) if args.until else datetime.now(timezone.utc)
+    since = until - timedelta(days=args.days)
+
+    combinations, total = top_combinations(
+        usage_records(args.source, since, until), canonical_request, recipe_cache_key,
+        limit=args.top, min_count=args.min_count
+    )
+    share = sum(combination.count for combination in combinations) / total if total else 0.0
+    print(f"{total} searches from {since:%Y-%m-%d} to {until:%Y-%m-%d}; "
+          f"top {len(combinations)} combinations cover {share:.1%}")
+
+    # 同一時間範圍與 Prompt 版本視為同一次執行，可續跑
+    run_id = f"{since:%Y-%m-%d}..{until:%Y-%m-%d}:{args.top}:{RECIPE_PROMPT_VERSION}"
+    checkpoint = Checkpoint(args.checkpoint, run_id)
+    budget = RateBudget(args.rate, args.max_calls)
+    # 與 API 伺服器相同：生成的食譜寫回食譜庫（RECIPE_PERSIST / RECIPE_EMBED）
+    writer = create_recipe_writer()
+
+    def generate(canonical):
+        recipes = generate_recipes(canonical)
+        if writer and recipes:
+            writer.submit(recipes, canonical['preferences'])
+        return recipes
+
+    # 額度以實際送出的 LLM 呼叫計算（含重試、升級層級與對沖）
+    stats = warm_cache(combinations, recipe_cache, generate, budget, checkpoint,
+                       force=args.force, progress=print, call_count=llm_gateway.call_count)
+    if writer and not writer.flush(60):
+        print("Recipe write-back did not finish within 60s")
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+def coverage(args):
+    since = parse_day(args.since)
+    until = parse_day(args.until) if args.until else since + timedelta(days=1)
+
+    with open(args.checkpoint, encoding='utf-8') as f:
+        state = json.load(f)
+    warmed = {key for key, recipes in state.get('done', {}).items() if recipes}
+
+    result = traffic_coverage(usage_records(args.source, since, until), canonical_request, recipe_cache_key, warmed)
+    result['warmed'] = len(warmed)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def main():
+    """主程式"""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='離線預熱食譜快取')
+    parser.add_argument('--source', default=USAGE_LOG_PATH or 'postgres',
+                        help='使用記錄來源：JSONL 檔路徑或 postgres（預設 USAGE_LOG_PATH）')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='續跑檢查點檔案')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='找出熱門組合並預熱快取')
+    run_parser.add_argument('--days', type=int, default=7, help='統計最近幾天的記錄')
+    run_parser.add_argument('--until', help='統計範圍結束日（不含，預設現在）')
+    run_parser.add_argument('--top', type=int, default=500, help='預熱前幾組')
+    run_parser.add_argument('--min-count', type=int, default=2, help='至少出現幾次才預熱')
+    run_parser.add_argument('--rate', type=float, default=30, help='每分鐘 LLM 呼叫數上限')
+    run_parser.add_argument('--max-calls', type=int, help='本次執行的 LLM 呼叫總數上限（含重試與升級，最後一組可能略微超出）')
+    run_parser.add_argument('--force', action='store_true', help='快取仍有效時也重新生成（排程更新）')
+    run_parser.set_defaults(handler=run)
+
+    coverage_parser = commands.add_parser('coverage', help='量測預熱結果對某段流量的覆蓋率')
+    coverage_parser.add_argument('--since', required=True, help='流量開始日')
+    coverage_parser.add_argument('--until', help='流量結束日（不含，預設開始日隔天）')
+    coverage_parser.set_defaults(handler=coverage)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 import logging
+from services.cooccurrence import ingredient_suggester
+from services.ingredient_catalog import COMMON_INGREDIENTS, IngredientCatalog
+from services.ingredient_normalizer import ingredient_normalizer
+from services.ingredient_search import DEFAULT_LIMIT, TypeaheadIndex
+from services.nutrition import NUTRIENT_UNITS, create_nutrition_table
 
 logger = logging.getLogger(__name__)
 
 # 建立藍圖
 bp = Blueprint('ingredients', __name__)
 
-# 常見食材資料庫
-COMMON_INGREDIENTS = {
-    'vegetables': [
-        '番茄', '洋蔥', '大蒜', '胡蘿蔔', '馬鈴薯', '高麗菜', '菠菜', 
-        '花椰菜', '蘑菇', '青椒', '紅椒', '黃椒', '小黃瓜', '芹菜',
-        '韭菜', '蔥', '薑', '蒜苗', '白蘿蔔', '紅蘿蔔', '玉米', '豌豆'
-    ],
-    'fruits': [
-        '蘋果', '香蕉', '橘子', '檸檬', '萊姆', '葡萄', '草莓', '藍莓',
-        '奇異果', '鳳梨', '芒果', '西瓜', '哈密瓜', '梨子', '桃子', '櫻桃'
-    ],
-    'meat': [
-        '雞肉', '牛肉', '豬肉', '羊肉', '火雞肉', '雞胸肉', '雞腿肉',
-        '牛絞肉', '豬絞肉', '培根', '火腿', '香腸', '臘肉'
-    ],
-    'seafood': [
-        '魚', '鮭魚', '鮪魚', '蝦子', '螃蟹', '龍蝦', '蛤蜊', '牡蠣',
-        '花枝', '章魚', '干貝', '魚丸', '蝦仁'
-    ],
-    'dairy': [
-        '牛奶', '起司', '優格', '奶油', '鮮奶油', '酸奶', '乳酪',
-        '馬茲瑞拉起司', '切達起司', '帕瑪森起司'
-    ],
-    'grains': [
-        '米飯', '麵包', '麵條', '義大利麵', '麥片', '燕麥', '藜麥',
-        '糙米', '白米', '糯米', '冬粉', '米粉', '烏龍麵'
-    ],
-    'others': [
-        '雞蛋', '油', '鹽', '糖', '醬油', '醋', '胡椒', '香料',
-        '香草', '蜂蜜', '果醬', '花生醬', '芝麻', '堅果'
-    ]
-}
+# 啟動時建立一次的唯讀目錄：名稱 → 分類索引、攤平清單、預先序列化的分類回應
+catalog = IngredientCatalog(COMMON_INGREDIENTS)
+
+# 即時搜尋索引（名稱與同義詞的前綴 trie + 字元 bigram 倒排索引）
+typeahead = TypeaheadIndex(catalog.by_name)
+
+# 搜尋結果數上限
+MAX_SEARCH_LIMIT = 50
+
+# 本地營養資料庫（numpy 未安裝時為 None）與批次計算的食譜數上限
+nutrition_table = create_nutrition_table()
+MAX_NUTRITION_RECIPES = 500
 
 @bp.route('/categories', methods=['GET'])
 def get_ingredient_categories():
     """取得食材分類"""
     try:
-        return jsonify({
-            'success': True,
-            'categories': COMMON_INGREDIENTS
-        })
+        response = Response(catalog.categories_payload, mimetype='application/json')
+        response.set_etag(catalog.categories_etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"取得食材分類錯誤: {e}")
         return jsonify({'error': '取得食材分類失敗'}), 500
@@ -55,34 +41,23 @@ def get_ingredient_categories():
 def search_ingredients():
     """搜尋食材"""
     try:
-        query = request.args.get('q', '').lower()
+        query = request.args.get('q', '').strip()
         category = request.args.get('category', '')
         
         if not query:
             return jsonify({'error': '請提供搜尋關鍵字'}), 400
         
-        results = []
-        
-        # 如果指定了分類，只搜尋該分類
-        if category and category in COMMON_INGREDIENTS:
-            ingredients = COMMON_INGREDIENTS[category]
-        else:
-            # 搜尋所有分類
-            ingredients = []
-            for cat_ingredients in COMMON_INGREDIENTS.values():
-                ingredients.extend(cat_ingredients)
-        
-        # 搜尋匹配的食材
-        for ingredient in ingredients:
-            if query in ingredient.lower():
-                results.append({
-                    'name': ingredient,
-                    'category': get_ingredient_category(ingredient)
-                })
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'limit 必須是整數'}), 400
+        
+        # 依 前綴 > 子字串 > 模糊 排序；指定分類時只回傳該分類
+        results = [match._asdict() for match in typeahead.search(query, category, limit)]
         
         return jsonify({
             'success': True,
-            'ingredients': results[:20]  # 限制結果數量
+            'ingredients': results
         })
         
     except Exception as e:
@@ -90,15 +65,13 @@ def search_ingredients():
         return jsonify({'error': '搜尋食材失敗'}), 500
 
 def get_ingredient_category(ingredient):
-    """取得食材所屬分類"""
-    for category, ingredients in COMMON_INGREDIENTS.items():
-        if ingredient in ingredients:
-            return category
-    return 'others'
+    """取得食材所屬分類（先正規化名稱，無法對應時為 others）"""
+    resolution = ingredient_normalizer.resolve(ingredient)
+    return resolution.category if ingredient_normalizer.accepts(resolution) else 'others'
 
 @bp.route('/validate', methods=['POST'])
 def validate_ingredients():
-    """驗證食材清單"""
+    """驗證食材清單（異體字、同義詞、修飾詞與錯字對應到標準名稱）"""
     try:
         data = request.get_json()
         ingredients = data.get('ingredients', [])
@@ -108,14 +81,15 @@ def validate_ingredients():
         
         validated_ingredients = []
         
-        for ingredient in ingredients:
-            # 檢查食材是否存在於資料庫中
-            category = get_ingredient_category(ingredient)
-            
+        for resolution in ingredient_normalizer.resolve_many(ingredients):
+            valid = ingredient_normalizer.accepts(resolution)
             validated_ingredients.append({
-                'name': ingredient,
-                'category': category,
-                'valid': category != 'others' or ingredient in COMMON_INGREDIENTS['others']
+                'name': resolution.name,
+                'canonical': resolution.canonical if valid else None,
+                'category': resolution.category if valid else 'others',
+                'confidence': resolution.confidence,
+                'match': resolution.method,
+                'valid': valid
             })
         
         return jsonify({
@@ -129,7 +103,7 @@ def validate_ingredients():
 
 @bp.route('/suggest', methods=['POST'])
 def suggest_ingredients():
-    """根據現有食材建議額外食材"""
+    """根據現有食材建議額外食材（有食譜共現資料時依 PMI 彙總，否則使用分類規則）"""
     try:
         data = request.get_json()
         current_ingredients = data.get('ingredients', [])
@@ -137,52 +111,72 @@ def suggest_ingredients():
         if not current_ingredients:
             return jsonify({'error': '請提供現有食材清單'}), 400
         
-        # 分析現有食材的分類
-        current_categories = set()
-        for ingredient in current_ingredients:
-            category = get_ingredient_category(ingredient)
-            current_categories.add(category)
-        
-        # 建議互補的食材
-        suggestions = []
-        
-        # 如果沒有蔬菜，建議蔬菜
-        if 'vegetables' not in current_categories:
-            suggestions.extend(COMMON_INGREDIENTS['vegetables'][:3])
-        
-        # 如果沒有蛋白質，建議蛋白質
-        if not any(cat in current_categories for cat in ['meat', 'seafood', 'dairy']):
-            suggestions.extend(COMMON_INGREDIENTS['meat'][:2])
-            suggestions.extend(COMMON_INGREDIENTS['dairy'][:1])
-        
-        # 如果沒有調味料，建議基本調味料
-        if 'others' not in current_categories:
-            suggestions.extend(['鹽', '胡椒', '油'])
+        # 共現建議：預先算好的鄰居分數加總，不在請求中碰矩陣
+        if ingredient_suggester is not None and ingredient_suggester.ready:
+            suggestions = [item.name for item in ingredient_suggester.suggest(current_ingredients, k=10)]
+            if suggestions:
+                return jsonify({
+                    'success': True,
+                    'suggestions': suggestions,
+                    'source': 'cooccurrence'
+                })
         
         return jsonify({
             'success': True,
-            'suggestions': suggestions[:10]  # 限制建議數量
+            'suggestions': rule_suggestions(current_ingredients),
+            'source': 'rules'
         })
         
     except Exception as e:
         logger.error(f"建議食材錯誤: {e}")
         return jsonify({'error': '建議食材失敗'}), 500
 
+def rule_suggestions(current_ingredients):
+    """依現有食材的分類建議互補食材（沒有共現資料時使用）"""
+    # 分析現有食材的分類
+    current_categories = set()
+    for ingredient in current_ingredients:
+        category = get_ingredient_category(ingredient)
+        current_categories.add(category)
+    
+    # 建議互補的食材
+    suggestions = []
+    
+    # 如果沒有蔬菜，建議蔬菜
+    if 'vegetables' not in current_categories:
+        suggestions.extend(COMMON_INGREDIENTS['vegetables'][:3])
+    
+    # 如果沒有蛋白質，建議蛋白質
+    if not any(cat in current_categories for cat in ['meat', 'seafood', 'dairy']):
+        suggestions.extend(COMMON_INGREDIENTS['meat'][:2])
+        suggestions.extend(COMMON_INGREDIENTS['dairy'][:1])
+    
+    # 如果沒有調味料，建議基本調味料
+    if 'others' not in current_categories:
+        suggestions.extend(['鹽', '胡椒', '油'])
+    
+    return suggestions[:10]  # 限制建議數量
+
 @bp.route('/nutrition/<ingredient>', methods=['GET'])
 def get_ingredient_nutrition(ingredient):
-    """取得食材營養資訊"""
+    """取得食材營養資訊（每 100 g，名稱先正規化為標準食材）"""
     try:
-        # 這裡可以整合營養資料庫 API
-        # 目前回傳基本資訊
+        if nutrition_table is None:
+            return jsonify({'error': '營養資料庫未啟用'}), 503
+        
+        resolution = ingredient_normalizer.resolve(ingredient)
+        canonical = resolution.canonical if ingredient_normalizer.accepts(resolution) else ingredient
+        values = nutrition_table.lookup(canonical)
+        if values is None:
+            return jsonify({'error': '找不到此食材的營養資訊'}), 404
+        
         nutrition_info = {
             'name': ingredient,
-            'calories_per_100g': 50,  # 範例數據
-            'protein': 2.0,
-            'carbs': 10.0,
-            'fat': 0.5,
-            'fiber': 2.0,
-            'vitamins': ['維生素C', '維生素A'],
-            'minerals': ['鉀', '鈣']
+            'canonical': canonical,
+            'calories_per_100g': values['calories'],
+            **{nutrient: value for nutrient, value in values.items() if nutrient != 'calories'},
+            'unit_grams': nutrition_table.unit_grams(canonical),
+            'units': NUTRIENT_UNITS
         }
         
         return jsonify({
@@ -193,3 +187,34 @@ def get_ingredient_nutrition(ingredient):
     except Exception as e:
         logger.error(f"取得營養資訊錯誤: {e}")
         return jsonify({'error': '取得營養資訊失敗'}), 500
+
+@bp.route('/nutrition', methods=['POST'])
+def calculate_recipe_nutrition():
+    """批次計算多道食譜的營養總量（食材含 name 與 amount，如「2個」「200g」「1大匙」）"""
+    try:
+        if nutrition_table is None:
+            return jsonify({'error': '營養資料庫未啟用'}), 503
+        
+        data = request.get_json() or {}
+        recipes = data.get('recipes', [])
+        
+        if not recipes or not isinstance(recipes, list):
+            return jsonify({'error': '請提供食譜清單'}), 400
+        if len(recipes) > MAX_NUTRITION_RECIPES:
+            return jsonify({'error': f'一次最多計算 {MAX_NUTRITION_RECIPES} 道食譜'}), 400
+        
+        # 食譜可以是食材清單，或含 ingredients 欄位的食譜物件
+        ingredient_lists = [
+            recipe.get('ingredients', []) if isinstance(recipe, dict) else recipe
+            for recipe in recipes
+        ]
+        
+        return jsonify({
+            'success': True,
+            'nutrition': nutrition_table.recipe_nutrition(ingredient_lists),
+            'units': NUTRIENT_UNITS
+        })
+        
+    except Exception as e:
+        logger.error(f"計算食譜營養錯誤: {e}")
+        return jsonify({'error': '計算食譜營養失敗'}), 500
@@ -1,84 +1,331 @@
 # backend/routes/recipes.py
 
-import os
-import json
+import time
 from flask import Blueprint, request, jsonify, current_app
-from openai import OpenAI
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
+from services import metrics
+from services.cooccurrence import ingredient_suggester
+from services.ingredient_normalizer import ingredient_normalizer
+from services.json_stream import IncrementalArrayParser
+from services.llm_gateway import llm_gateway
+from services.micro_batch import create_micro_batcher
+from services.recipe_generation import (
+    RECIPE_COUNT, canonical_request, complete_recipe_batch, complete_recipes, generate_recipes,
+    recipe_cache, recipe_cache_key, recipe_messages, recipe_router, valid_recipe
+)
+from services.recipe_persist import create_recipe_writer, generated_recipe_id, recipe_public_id
+from services.recipe_store import ScoredRecipe, SearchStats, create_store, retrieve_recipes
+from services.singleflight import create_single_flight
+from services.usage_log import create_usage_log
+from services.streaming import encode_event, stream_format, stream_response
 
 recipes_bp = Blueprint('recipes', __name__, url_prefix='/recipes')
 
-# -------------------------------------------------------------
-# 型別定義（取代舊的 ChatCompletionMessageParam）
-# -------------------------------------------------------------
-Message = Dict[str, str]  # {"role": "user", "content": "..."}
-Messages = List[Message]
+# 相同標準形式的併發請求共用一次生成（熱門組合、重複送出）
+recipe_flight = create_single_flight('recipe', 'RECIPE', default_timeout=90)
+
+# 生成的食譜批次寫回 recipes 表並排入向量化（RECIPE_PERSIST / RECIPE_EMBED），食譜庫隨流量成長
+recipe_writer = create_recipe_writer()
+# 新寫入 recipes 表的食譜在背景增量更新食材共現矩陣（/api/ingredients/suggest）
+if recipe_writer and ingredient_suggester:
+    recipe_writer.add_listener(ingredient_suggester.submit)
+
+# 搜尋請求的標準形式，供離線預熱（jobs/warm_recipe_cache.py）找出熱門組合
+usage_log = create_usage_log()
+
+# 尖峰時短窗口內的獨立請求合併成一次呼叫（RECIPE_BATCH_WINDOW_MS，預設停用）
+recipe_batcher = create_micro_batcher(
+    'recipe', 'RECIPE', complete_recipe_batch, complete_recipes,
+    token_counter=lambda: llm_gateway.token_usage(tier.model for tier in recipe_router.tiers)
+)
+
+
+def _generate_recipes(canonical: Dict[str, Any]) -> List[Dict]:
+    """依模型層級生成食譜（啟用微批次時與其他請求合併）並排入寫回，失敗時拋出例外（不寫入快取）"""
+    recipes = generate_recipes(canonical, recipe_batcher.submit if recipe_batcher else None)
+    _persist(recipes, canonical)
+    return recipes
+
+
+def _persist(recipes: List[Dict], canonical: Dict[str, Any]) -> None:
+    """排入背景寫回（不等待資料庫）"""
+    if recipe_writer and recipes:
+        recipe_writer.submit(recipes, canonical['preferences'])
+
+
+def _iter_generated_recipes(canonical: Dict[str, Any]) -> Iterator[Dict]:
+    """
+    串流版生成：每個食譜物件在 token 串流中一完整就產出
+    快取命中時直接產出快取結果；相同請求生成中時等待並共用其結果；串流完整結束後才寫入快取
+    較快的層級沒有產出任何有效食譜（或在產出前失敗）時升級到下一層；串流已開始送出後不對沖
+    """
+    key = recipe_cache_key(canonical)
+    cached = recipe_cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    call, leader = recipe_flight.acquire(key)
+    if not leader:
+        yield from recipe_flight.wait(call)
+        return
+
+    started = time.perf_counter()
+    recipes: List[Dict] = []
+    stream = None
+    try:
+        for number, tier in enumerate(recipe_router.tiers):
+            last = number == len(recipe_router.tiers) - 1
+            tier_started = time.perf_counter()
+            try:
+                stream = llm_gateway.chat(
+                    tier.model,
+                    recipe_messages(canonical),
+                    response_format={"type": "json_object"},
+                    max_tokens=tier.max_tokens,
+                    stream=True
+                )
+
+                parser = IncrementalArrayParser('recipes')
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    for recipe in parser.feed(delta):
+                        if not valid_recipe(recipe):
+                            continue
+                        recipe['id'] = generated_recipe_id(recipe)
+                        if any(item['id'] == recipe['id'] for item in recipes):
+                            continue
+                        recipes.append(recipe)
+                        yield recipe
+            except Exception:
+                if recipes or last:
+                    recipe_router.record(tier, outcome='errors')
+                    raise
+                recipe_router.record(tier, outcome='escalated_error')
+                continue
+
+            if recipes:
+                recipe_router.record(tier, time.perf_counter() - tier_started)
+                break
+            recipe_router.record(tier, outcome='errors' if last else 'escalated_invalid')
+    except GeneratorExit:
+        # 客戶端中途斷線：釋放上游串流，等待中的請求改為失敗，之後的請求重新生成
+        if stream is not None:
+            stream.close()
+        recipe_flight.finish(key, call, error=RuntimeError('Recipe stream closed before completion'))
+        raise
+    except Exception as e:
+        recipe_flight.finish(key, call, error=e)
+        raise
+
+    recipe_cache.record_computed(time.perf_counter() - started)
+    if recipes:
+        recipe_cache.set(key, recipes)
+        _persist(recipes, canonical)
+    recipe_flight.finish(key, call, recipes)
 
-# -------------------------------------------------------------
-# 初始化 OpenAI 客戶端
-# -------------------------------------------------------------
-try:
-    # 讀取 .env 中的 OPENAI_API_KEY
-    openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-except Exception as e:
-    current_app.logger.error(f"Failed to initialize OpenAI Client for recipes: {e}")
-    openai_client = None
 
 # -------------------------------------------------------------
-# 食譜搜尋 (search) 路由：完全由 LLM 生成 (使用 GPT-4o)
+# 檢索優先：本地食譜庫覆蓋率夠高的食譜直接回傳，不足的部分才由 LLM 補齊
 # -------------------------------------------------------------
-@recipes_bp.route('/search', methods=['POST'])
-def search_recipes():
-    # === 讀取 JSON body ===
+recipe_store = create_store()
+search_stats = SearchStats()
+metrics.register('recipe_search', search_stats.stats)
+
+
+def _format_stored(recipe: Dict[str, Any], missing=()) -> Dict[str, Any]:
+    """本地食譜轉為與 LLM 生成相同的欄位（id 同生成時的 id），並標示使用者缺少的食材"""
+    missing = set(missing)
+    ingredients = [
+        dict(ingredient, available=ingredient_normalizer.canonical(str(ingredient['name'])) not in missing)
+        for ingredient in recipe.get('ingredients', [])
+        if isinstance(ingredient, dict) and str(ingredient.get('name', '')).strip()
+    ]
+    return {
+        'id': recipe_public_id(recipe),
+        'name': recipe.get('name'),
+        'description': recipe.get('description'),
+        'time': recipe.get('cooking_time'),
+        'difficulty': recipe.get('difficulty'),
+        'cuisine': recipe.get('cuisine'),
+        'main_ingredients': [ingredient['name'] for ingredient in ingredients],
+        'ingredients': ingredients,
+        'steps': recipe.get('steps', []),
+    }
+
+
+def _format_retrieved(item: ScoredRecipe) -> Dict[str, Any]:
+    return dict(
+        _format_stored(item.recipe, item.missing),
+        missing_ingredients=item.missing,
+        coverage=round(item.coverage, 4),
+        score=round(item.score, 4),
+        source='retrieval',
+    )
+
+
+def _retrieve(canonical: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """查詢本地食譜庫；失敗時只記錄錯誤，改由 LLM 生成"""
+    if recipe_store is None:
+        return []
+    try:
+        return [
+            _format_retrieved(item)
+            for item in retrieve_recipes(recipe_store, canonical['ingredients'], canonical['preferences'], RECIPE_COUNT)
+        ]
+    except Exception as e:
+        search_stats.record_error()
+        current_app.logger.warning(f"Recipe retrieval failed ({recipe_store.name}): {e}")
+        return []
+
+
+def _read_search_request():
+    """讀取並驗證搜尋請求，回傳 (標準形式, 錯誤回應)"""
     data = request.get_json(silent=True)
     if not data or 'ingredients' not in data:
-        return jsonify({'error': 'Missing ingredients', 'success': False}), 400
+        return None, (jsonify({'error': 'Missing ingredients', 'success': False}), 400)
 
     ingredients_list = data['ingredients']
     if not isinstance(ingredients_list, list):
-        return jsonify({'error': 'Ingredients must be a list', 'success': False}), 400
+        return None, (jsonify({'error': 'Ingredients must be a list', 'success': False}), 400)
 
-    cleaned_ingredients = [i.strip() for i in ingredients_list if i.strip()]
-    if not cleaned_ingredients:
+    canonical = canonical_request(ingredients_list, data.get('preferences'))
+    if canonical['ingredients']:
+        usage_log.record('recipe_search', canonical)
+    return canonical, None
+
+
+def _accept_generated(recipes: List[Dict], recipe: Dict, generated: List[Dict]) -> bool:
+    """補齊數量，略過與檢索結果同名的食譜"""
+    if len(recipes) + len(generated) >= RECIPE_COUNT:
+        return False
+    return recipe.get('name') not in {item['name'] for item in recipes}
+
+
+def _search_result(recipes: List[Dict], generated: List[Dict]) -> Dict[str, Any]:
+    search_stats.record(len(recipes), len(generated))
+    return {
+        'recipes': recipes + generated,
+        'sources': {'retrieval': len(recipes), 'llm': len(generated)},
+        'success': True
+    }
+
+
+# -------------------------------------------------------------
+# 食譜搜尋 (search) 路由：檢索優先，不足時由 LLM 生成 (使用 GPT-4o)
+# 相同食材組合與偏好的生成結果直接回傳快取
+# -------------------------------------------------------------
+@recipes_bp.route('/search', methods=['POST'])
+def search_recipes():
+    canonical, error = _read_search_request()
+    if error:
+        return error
+    if not canonical['ingredients']:
         return jsonify({'recipes': [], 'success': True})
 
-    if not openai_client:
-        return jsonify({'error': 'OpenAI service unavailable', 'success': False}), 500
+    recipes = _retrieve(canonical)
+    generated: List[Dict] = []
 
-    try:
-        ingredients_str = "、".join(cleaned_ingredients)
-        prompt = (
-            f"根據以下食材: {ingredients_str}，推薦 3 道最適合的食譜。 "
-            "每個食譜包含：名稱、描述、時間(分鐘)、難度(簡單/中等/困難)、主要食材。 "
-            "嚴格回傳 JSON: "
-            "{\"recipes\": [{\"name\": \"\", \"description\": \"\", \"time\": 30, \"difficulty\": \"中等\", \"main_ingredients\": []}]}"
-        )
-
-        messages: Messages = [{"role": "user", "content": prompt}]
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            response_format={"type": "json_object"},
-            max_tokens=1000
-        )
-
-        content = response.choices[0].message.content
-        if not content:
-            return jsonify({'recipes': [], 'success': True})
-
-        result = json.loads(content)
-        recipes = result.get('recipes', [])
-
-        # 補上 id（前端需要）
-        for i, recipe in enumerate(recipes):
-            recipe['id'] = str(i + 1)
-
-        return jsonify({
-            'recipes': recipes,
-            'success': True
-        })
+    if len(recipes) < RECIPE_COUNT:
+        if not llm_gateway.available and not recipes:
+            return jsonify({'error': 'OpenAI service unavailable', 'success': False}), 500
+
+        candidates: List[Dict] = []
+        try:
+            if llm_gateway.available:
+                key = recipe_cache_key(canonical)
+                candidates = recipe_cache.get_or_compute(
+                    key,
+                    lambda: recipe_flight.do(key, lambda: _generate_recipes(canonical)),
+                    should_cache=bool  # 空結果不快取
+                )
+        except Exception as e:
+            current_app.logger.error(f"Recipe generation error: {e}")
+            if not recipes:
+                return jsonify({'error': 'Generation failed', 'success': False}), 500
 
+        for recipe in candidates:
+            if _accept_generated(recipes, recipe, generated):
+                generated.append(dict(recipe, source='llm'))
+
+    return jsonify(_search_result(recipes, generated))
+
+
+# -------------------------------------------------------------
+# 串流食譜搜尋：每道食譜完成即送出，最後送出與 /search 相同內容的 summary
+# -------------------------------------------------------------
+@recipes_bp.route('/search/stream', methods=['POST'])
+def search_recipes_stream():
+    """
+    食譜搜尋的串流版本（NDJSON；Accept: text/event-stream 或 ?format=sse 時為 SSE）
+    檢索結果立即送出，LLM 生成的食譜在 token 串流中一完整就送出 recipe 事件
+    """
+    canonical, error = _read_search_request()
+    if error:
+        return error
+
+    app = current_app._get_current_object()
+    fmt = stream_format()
+
+    def generate():
+        started = time.perf_counter()
+        timings: Dict[str, Any] = {'first_recipe_ms': None}
+
+        def recipe_event(recipe):
+            if timings['first_recipe_ms'] is None:
+                timings['first_recipe_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return encode_event('recipe', recipe, fmt)
+
+        if not canonical['ingredients']:
+            yield encode_event('summary', {'recipes': [], 'success': True}, fmt)
+            return
+
+        with app.app_context():
+            recipes = _retrieve(canonical)
+            for recipe in recipes:
+                yield recipe_event(recipe)
+
+            generated: List[Dict] = []
+            failure = None
+            if len(recipes) < RECIPE_COUNT:
+                if not llm_gateway.available:
+                    failure = 'OpenAI service unavailable'
+                else:
+                    try:
+                        # 數量已足夠後仍讀完串流，讓完整結果寫入快取
+                        for recipe in _iter_generated_recipes(canonical):
+                            if _accept_generated(recipes, recipe, generated):
+                                recipe = dict(recipe, source='llm')
+                                generated.append(recipe)
+                                yield recipe_event(recipe)
+                    except Exception as e:
+                        app.logger.error(f"Recipe generation error: {e}")
+                        failure = 'Generation failed'
+
+            if failure and not recipes and not generated:
+                yield encode_event('summary', {'error': failure, 'success': False}, fmt)
+                return
+
+            timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            yield encode_event('summary', dict(_search_result(recipes, generated), timings=timings), fmt)
+
+    return stream_response(generate(), fmt)
+
+
+# -------------------------------------------------------------
+# 單一食譜：以搜尋結果中的 id（gen-<指紋> / db-<id>）重新開啟已存入食譜庫的食譜
+# -------------------------------------------------------------
+@recipes_bp.route('/<recipe_id>', methods=['GET'])
+def get_recipe(recipe_id):
+    if recipe_store is None:
+        return jsonify({'error': 'Recipe store unavailable', 'success': False}), 503
+    try:
+        recipe = recipe_store.get(recipe_id)
     except Exception as e:
-        current_app.logger.error(f"Recipe generation error: {e}")
-        return jsonify({'error': 'Generation failed', 'success': False}), 500
\ No newline at end of file
+        current_app.logger.warning(f"Recipe lookup failed ({recipe_store.name}): {e}")
+        return jsonify({'error': 'Recipe lookup failed', 'success': False}), 500
+    if recipe is None:
+        return jsonify({'error': 'Recipe not found', 'success': False}), 404
+    return jsonify({'recipe': _format_stored(recipe), 'success': True})
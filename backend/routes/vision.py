@@ -1,144 +1,461 @@
 # backend/routes/vision.py
 
 import os
-import json
-import base64
-from typing import List, Dict, TypedDict
+import hashlib
+from typing import Iterator, List, Dict, NamedTuple, Optional
 from flask import Blueprint, request, jsonify, current_app
-from openai import OpenAI
+from services import metrics
+from services.cache import create_tiered_cache
+from services.concurrency import TaskResult, vision_executor
+from services.jobs import QueueFullError, job_manager
+from services.image_dedup import NearDuplicateIndex, dhash, session_dedup
+from services.ingredient_merge import merge_ingredients
+from services.ingredient_normalizer import ingredient_normalizer
+from services.image_preprocess import PREPROCESS_VERSION, PreparedImage, estimate_image_tokens, prepare_image
+from services.recognizers import create_recognizer, image_digest
+from services.singleflight import create_single_flight
+from services.streaming import encode_event, stream_format, stream_response
+from services.uploads import ImageData, read_upload
 
 vision_bp = Blueprint('vision', __name__, url_prefix='/vision')
 
 # -------------------------------------------------------------
-# 型別定義（取代舊的 ChatCompletionMessageParam）
+# 識別後端（VISION_RECOGNIZER：openai / replay / 自訂類別）與結果快取
 # -------------------------------------------------------------
-class ContentPart(TypedDict, total=False):
-    type: str
-    text: str
-    image_url: Dict[str, Dict[str, str]]
+recognizer = create_recognizer()
 
-class Message(TypedDict):
-    role: str
-    content: List[ContentPart]
+# 後端、Prompt、模型或前處理參數變更時版本號跟著改變，舊快取自然失效
+VISION_PROMPT_VERSION = hashlib.sha256(
+    f"{recognizer.name}\n{recognizer.version}\n{PREPROCESS_VERSION}".encode('utf-8')
+).hexdigest()[:12]
 
-# 也可以用 TypeAlias 更簡潔
-Messages = List[Message]
+vision_cache = create_tiered_cache(
+    'vision', 'VISION_CACHE', default_path='/tmp/cache/vision_cache.sqlite3'
+)
+metrics.register('vision_cache', vision_cache.stats)
 
-# -------------------------------------------------------------
-# 初始化 OpenAI 客戶端
-# -------------------------------------------------------------
-try:
-    openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-except Exception as e:
-    current_app.logger.error(f"Failed to initialize OpenAI Client: {e}")
-    openai_client = None
+# 同一張圖片同時上傳多次（重複送出等）時只呼叫一次識別後端
+vision_flight = create_single_flight('vision', 'VISION')
+
+
+def recognition_cache_key(image_bytes: ImageData) -> str:
+    """以圖片內容雜湊 + Prompt/模型版本作為快取鍵"""
+    return f"vision:{VISION_PROMPT_VERSION}:{image_digest(image_bytes)}"
+
+# 批次識別模式：per_image（每張圖片一次呼叫）或 packed（多張圖片打包成一次呼叫）
+VISION_BATCH_MODE = os.environ.get('VISION_BATCH_MODE', 'per_image')
+VISION_PACK_MAX_IMAGES = int(os.environ.get('VISION_PACK_MAX_IMAGES', 6))
+VISION_PACK_MAX_IMAGE_TOKENS = int(os.environ.get('VISION_PACK_MAX_IMAGE_TOKENS', 6000))
+
+# 單一請求最多同時處理幾張圖片（全域上限見 VISION_MAX_CONCURRENCY）
+VISION_REQUEST_CONCURRENCY = int(os.environ.get('VISION_REQUEST_CONCURRENCY', 4))
 
 # -------------------------------------------------------------
-# LLM 多模態識別函式 (使用 GPT-4o Vision)
+# 食材識別函式
 # -------------------------------------------------------------
-def get_ingredients_from_llm_openai(file_path):
+def _prepare(image_bytes: ImageData) -> PreparedImage:
+    """前處理（EXIF 方向、縮圖、重新編碼）"""
+    prepared = prepare_image(image_bytes)
+    current_app.logger.debug(
+        f"Image preprocessed: {prepared.original_bytes} -> {prepared.final_bytes} bytes "
+        f"({prepared.mime_type}, {prepared.seconds * 1000:.1f} ms)"
+    )
+    return prepared
+
+
+def _chunk_prepared(prepared_images: List[PreparedImage], max_images: int, max_tokens: int) -> List[List[int]]:
+    """依圖片數與估計 token 上限將圖片分組（回傳索引）"""
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    tokens = 0
+    for i, prepared in enumerate(prepared_images):
+        cost = estimate_image_tokens(prepared.width, prepared.height)
+        if current and (len(current) >= max_images or tokens + cost > max_tokens):
+            chunks.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def recognize_ingredients(image_bytes: ImageData) -> List[Dict]:
     """
-    使用 OpenAI GPT-4o Vision 進行圖像識別。
+    識別單張圖片的食材（經過快取），失敗時拋出例外（不寫入快取）
     """
-    if not openai_client:
+    if not recognizer.available:
         return []
 
-    try:
-        # 1. 將圖片檔案轉換為 Base64 編碼
-        with open(file_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-        # 2. 定義 Prompt 內容
-        prompt_text = (
-            "你是一位專業的廚師助理。請嚴格忽略圖片中的任何人、臉部或人物，"
-            "只專注於辨識食材。請根據圖片中的食物，識別出所有主要的食材。 "
-            "請嚴格以 JSON 格式回應，不要包含任何額外文字。JSON 格式必須是: "
-            "{\"ingredients\": [{\"name\": \"食材名\", \"category\": \"類別\"}]}"
-        )
+    key = recognition_cache_key(image_bytes)
+    return vision_cache.get_or_compute(
+        key,
+        lambda: vision_flight.do(key, lambda: recognizer.recognize(image_bytes, _prepare(image_bytes)))
+    )
+
 
-        # 3. 構造多模態內容 (圖片 + 文字)
-        messages: Messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ]
-
-        # 4. 呼叫 GPT-4o Vision
-        response = openai_client.chat.completions.create(
-            # model="gpt-4o", # 因OpenAI 的安全機制觸發了「人臉識別」限制，通常不提供辨識圖片
-            model="gpt-4o-mini", # 支援多模態的最新模型
-            messages=messages,
-            response_format={"type": "json_object"}, # 確保 JSON 輸出
-            max_tokens=2000
+def recognize_ingredients_packed(images: List[ImageData], app=None) -> List[TaskResult]:
+    """
+    打包模式識別多張圖片，結果依輸入順序回傳
+    快取命中的圖片不送出；其餘依 VISION_PACK_MAX_IMAGES / VISION_PACK_MAX_IMAGE_TOKENS 分組，
+    各組併發呼叫。打包回應缺少某張圖片或整組失敗時，該圖片改用單張模式重試。
+    """
+    if not recognizer.available:
+        return [TaskResult([], None) for _ in images]
+
+    app = app or current_app._get_current_object()
+    keys = [recognition_cache_key(image) for image in images]
+    results: List[Optional[TaskResult]] = [None] * len(images)
+
+    pending = []
+    for i, key in enumerate(keys):
+        cached = vision_cache.get(key)
+        if cached is not None:
+            results[i] = TaskResult(cached, None)
+        else:
+            pending.append(i)
+
+    prepared = [
+        outcome.value
+        for outcome in vision_executor.map_ordered(
+            prepare_image, [images[i] for i in pending], max_concurrency=VISION_REQUEST_CONCURRENCY
         )
-        current_app.logger.debug(f"OpenAI GPT-4o API Response: {response}")
-
-        # 5. 解析結果
-        content = response.choices[0].message.content
-        current_app.logger.debug(f"OpenAI GPT-4o API content: {content}")
-        if content:
-            llm_result = json.loads(content)
-            final_ingredients = [
-                {
-                    'name': item['name'],
-                    'confidence': 1.0,
-                    'category': item.get('category', 'unknown')
-                }
-                for item in llm_result.get('ingredients', [])
-            ]
-            return final_ingredients
-        return []
+    ]
+    chunks = [
+        [pending[j] for j in chunk]
+        for chunk in _chunk_prepared(prepared, VISION_PACK_MAX_IMAGES, VISION_PACK_MAX_IMAGE_TOKENS)
+    ]
+    prepared_by_index = dict(zip(pending, prepared))
+
+    def run_chunk(chunk: List[int]):
+        with app.app_context():
+            if len(chunk) == 1:
+                return [recognizer.recognize(images[chunk[0]], prepared_by_index[chunk[0]])]
+            return recognizer.recognize_packed(
+                [images[i] for i in chunk], [prepared_by_index[i] for i in chunk]
+            )
+
+    chunk_results = vision_executor.map_ordered(run_chunk, chunks, max_concurrency=VISION_REQUEST_CONCURRENCY)
+
+    fallback = []
+    for chunk, outcome in zip(chunks, chunk_results):
+        if not outcome.ok:
+            app.logger.warning(f"Packed recognition failed, falling back to per-image: {outcome.error}")
+            fallback.extend(chunk)
+            continue
+        for i, ingredients in zip(chunk, outcome.value):
+            if ingredients is None:
+                fallback.append(i)
+            else:
+                vision_cache.set(keys[i], ingredients)
+                results[i] = TaskResult(ingredients, None)
+
+    if fallback:
+        def run_single(i: int):
+            with app.app_context():
+                return recognize_ingredients(images[i])
+
+        for i, outcome in zip(fallback, vision_executor.map_ordered(
+                run_single, fallback, max_concurrency=VISION_REQUEST_CONCURRENCY)):
+            results[i] = outcome
+
+    return results
+
+
+def get_ingredients_from_llm_openai(image):
+    """
+    使用設定的識別後端（預設 OpenAI GPT-4o Vision）進行圖像識別。
+    image 為圖片內容（bytes）；傳入字串時視為檔案路徑（舊介面）。
+    相同圖片（內容雜湊相同）直接回傳快取結果，不再呼叫 LLM。
+    """
+    try:
+        if isinstance(image, str):
+            with open(image, "rb") as image_file:
+                image = image_file.read()
+
+        return recognize_ingredients(image)
 
     except Exception as e:
-        current_app.logger.error(f"OpenAI GPT-4o API Error: {e}")
+        current_app.logger.error(f"Recognizer ({recognizer.name}) Error: {e}")
         return []
 
 # -------------------------------------------------------------
-# 修改您的批次上傳 (batch-upload) 路由，使用 LLM 作為主要識別器
+# 批次上傳 (batch-upload) 路由：每張圖片併發送往 LLM 識別
 # -------------------------------------------------------------
+def _recognize_in_app_context(app, image_bytes):
+    """在工作執行緒中以 app context 執行識別"""
+    with app.app_context():
+        return recognize_ingredients(image_bytes)
+
+
+def _session_id() -> Optional[str]:
+    """
+    跨請求去重使用的 session 識別（前端以 X-Session-Id 或表單欄位 session_id 指定）
+    未指定時回傳 None，只在同一批內去重：經反向代理時所有使用者的來源位址相同，不能用來區分使用者
+    """
+    return request.headers.get('X-Session-Id') or request.form.get('session_id') or None
+
+
+def _find_near_duplicates(hashes, session_id: Optional[str]):
+    """
+    找出近似重複的圖片（session_id 為 None 時不比對先前的上傳）
+    回傳每張圖片的 None（需要識別）、('batch', 代表圖片索引, 距離) 或 ('session', 先前結果, 距離)
+    """
+    batch_index = NearDuplicateIndex(session_dedup.threshold)
+    duplicates = []
+
+    for i, value in enumerate(hashes):
+        if value is None:
+            duplicates.append(None)
+            continue
+
+        match = batch_index.find(value)
+        if match is not None:
+            duplicates.append(('batch', match[1], match[0]))
+            continue
+
+        match = session_dedup.find(session_id, value) if session_id else None
+        if match is not None:
+            duplicates.append(('session', match[1], match[0]))
+            continue
+
+        batch_index.add(value, i)
+        duplicates.append(None)
+
+    return duplicates
+
+
+class BatchItem(NamedTuple):
+    """批次中單張圖片的處理結果"""
+    index: int
+    record: Dict
+    ingredients: List[Dict]
+    merge: bool  # 是否計入合併結果（同批近似照片沿用代表圖片結果，不重複計入）
+
+
+def iter_batch_items(uploads, session_id: Optional[str], app) -> Iterator[BatchItem]:
+    """
+    批次識別流程：近似重複偵測 -> LLM 識別
+    每張圖片一完成就產出結果（不保證上傳順序），供一般回應與串流回應共用
+    """
+    # 感知雜湊：同一批或同一 session 近期的近似照片只識別一次
+    hashes = [
+        result.value if result.ok else None
+        for result in vision_executor.map_ordered(
+            lambda upload: dhash(upload[1]), uploads, max_concurrency=VISION_REQUEST_CONCURRENCY
+        )
+    ]
+    duplicates = _find_near_duplicates(hashes, session_id)
+    leaders = [i for i, duplicate in enumerate(duplicates) if duplicate is None]
+    followers: Dict[int, List] = {i: [] for i in leaders}
+    batch_duplicates = session_duplicates = 0
+
+    for i, duplicate in enumerate(duplicates):
+        if duplicate is None:
+            continue
+        if duplicate[0] == 'batch':
+            followers[duplicate[1]].append((i, duplicate[2]))
+            continue
+
+        # 同一 session 先前上傳過的近似照片：直接沿用先前結果
+        _, previous, distance = duplicate
+        session_duplicates += 1
+        yield BatchItem(i, {
+            'filename': uploads[i][0],
+            'success': True,
+            'ingredient_count': len(previous),
+            'deduplicated': True,
+            'duplicate_of': 'previous_upload',
+            'hamming_distance': distance
+        }, previous, True)
+
+    # 執行 LLM 多模態識別
+    if VISION_BATCH_MODE == 'packed' and len(leaders) > 1:
+        completed = zip(leaders, recognize_ingredients_packed([uploads[i][1] for i in leaders], app))
+    else:
+        completed = (
+            (leaders[j], result)
+            for j, result in vision_executor.iter_completed(
+                lambda i: _recognize_in_app_context(app, uploads[i][1]),
+                leaders,
+                max_concurrency=VISION_REQUEST_CONCURRENCY
+            )
+        )
+
+    for i, result in completed:
+        filename = uploads[i][0]
+        if result.ok:
+            ingredients = result.value
+            if session_id and hashes[i] is not None:
+                session_dedup.add(session_id, hashes[i], ingredients)
+            yield BatchItem(i, {
+                'filename': filename,
+                'success': True,
+                'ingredient_count': len(ingredients),
+                'deduplicated': False
+            }, ingredients, True)
+        else:
+            ingredients = []
+            app.logger.error(f"Recognition failed for {filename}: {result.error}")
+            yield BatchItem(i, {'filename': filename, 'success': False, 'error': 'Recognition failed'}, [], False)
+
+        # 同一批的近似照片：沿用代表圖片的結果，不重複計入食材
+        for j, distance in followers[i]:
+            batch_duplicates += 1
+            yield BatchItem(j, {
+                'filename': uploads[j][0],
+                'success': result.ok,
+                'ingredient_count': len(ingredients),
+                'deduplicated': True,
+                'duplicate_of': filename,
+                'hamming_distance': distance
+            }, ingredients, False)
+
+    session_dedup.record(
+        checked=len(uploads), batch_duplicates=batch_duplicates, session_duplicates=session_duplicates
+    )
+
+
+def analyze_batch(uploads, session_id: Optional[str], app=None) -> Dict:
+    """
+    批次識別並合併結果（依上傳順序）
+    uploads 為 [(檔名, 圖片內容)]；可在請求外（背景工作）呼叫，此時需傳入 app
+    """
+    app = app or current_app._get_current_object()
+    items = sorted(iter_batch_items(uploads, session_id, app), key=lambda item: item.index)
+
+    # 合併各圖片結果：同義詞與重複項目收斂為一筆，累計出現次數
+    return {
+        'ingredients': merge_ingredients([item.ingredients for item in items if item.merge], ingredient_normalizer),
+        'images': [item.record for item in items]
+    }
+
+
+def _read_uploads(field: str = 'files'):
+    """直接從上傳串流取得內容，不落地暫存檔"""
+    return [
+        (file.filename, read_upload(file))
+        for file in request.files.getlist(field)
+        if file.filename != ''
+    ]
+
+
 @vision_bp.route('/batch-upload', methods=['POST'])
 def batch_upload():
     if 'files' not in request.files:
         return jsonify({'error': 'No file part', 'success': False}), 400
 
-    all_ingredients = []
-    
-    for file in request.files.getlist('files'):
-        if file.filename == '':
-            continue
-        
-        # ⚠️ 這裡需要您的檔案儲存邏輯 ⚠️
-        # 為了簡化，假設您已經有將檔案存到 temporary 並且獲取 file_path 的邏輯
-        try:
-            # 假設檔案被存儲在一個臨時路徑
-            filename = file.filename # 您應該使用更安全的儲存方式
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename) 
-            file.save(file_path)
-        except Exception as e:
-            current_app.logger.error(f"File saving error: {e}")
-            continue
+    result = analyze_batch(_read_uploads(), _session_id())
 
-        # 執行 LLM 多模態識別
-        ingredients_from_llm = get_ingredients_from_llm_openai(file_path)
-        all_ingredients.extend(ingredients_from_llm)
-        
-        # 檔案清理 (請確保您的程式碼有清理機制)
-        if os.path.exists(file_path):
-             os.remove(file_path)
+    return jsonify({
+        'success': True,
+        'ingredients': result['ingredients'],
+        'images': result['images'],
+        'total_images': len(request.files.getlist('files'))
+    })
 
-    # ... (去重/整理邏輯，如果需要) ...
+# -------------------------------------------------------------
+# 串流批次上傳：每張圖片完成即送出一筆，最後送出合併結果
+# -------------------------------------------------------------
+@vision_bp.route('/batch-upload/stream', methods=['POST'])
+def batch_upload_stream():
+    """
+    批次上傳的串流版本（NDJSON；Accept: text/event-stream 或 ?format=sse 時為 SSE）
+    每張圖片完成即送出 image 事件，全部完成後送出 summary 事件（內容同 /batch-upload）
+    """
+    if 'files' not in request.files:
+        return jsonify({'error': 'No file part', 'success': False}), 400
+
+    app = current_app._get_current_object()
+    # 串流開始前先讀完上傳內容，產生器中不再存取 request
+    uploads = _read_uploads()
+    session_id = _session_id()
+    total_images = len(request.files.getlist('files'))
+    fmt = stream_format()
+
+    def generate():
+        items = []
+        with app.app_context():
+            for item in iter_batch_items(uploads, session_id, app):
+                items.append(item)
+                yield encode_event('image', dict(
+                    item.record, index=item.index, ingredients=item.ingredients
+                ), fmt)
+
+            items.sort(key=lambda item: item.index)
+            yield encode_event('summary', {
+                'success': True,
+                'ingredients': merge_ingredients([item.ingredients for item in items if item.merge], ingredient_normalizer),
+                'images': [item.record for item in items],
+                'total_images': total_images
+            }, fmt)
+
+    return stream_response(generate(), fmt)
+
+
+# -------------------------------------------------------------
+# 非同步工作：POST 立即回傳 job id，背景執行識別
+# -------------------------------------------------------------
+ANALYZE_JOB_KIND = 'vision.analyze'
+JOB_MAX_WAIT_SECONDS = 30
+
+
+@vision_bp.record_once
+def _register_job_handler(state):
+    """藍圖註冊時綁定 app，讓背景執行緒能建立 app context"""
+    app = state.app
+
+    def run_analyze_job(payload):
+        uploads = [(upload['filename'], upload['data']) for upload in payload['uploads']]
+        with app.app_context():
+            result = analyze_batch(uploads, payload['session_id'], app)
+        result['total_images'] = len(uploads)
+        return result
+
+    job_manager.register_handler(ANALYZE_JOB_KIND, run_analyze_job)
+    # 共用後端時，每個節點都要能取出其他節點排入的工作
+    job_manager.start()
+
+
+@vision_bp.route('/jobs', methods=['POST'])
+def create_analyze_job():
+    """排入影像識別工作（欄位 files 或 image），立即回傳 job id"""
+    uploads = _read_uploads('files') + _read_uploads('image')
+    if not uploads:
+        return jsonify({'error': 'No file part', 'success': False}), 400
+
+    payload = {
+        'uploads': [{'filename': filename, 'data': data} for filename, data in uploads],
+        'session_id': _session_id()
+    }
+    try:
+        job = job_manager.submit(ANALYZE_JOB_KIND, payload)
+    except QueueFullError:
+        response = jsonify({'error': 'Job queue is full', 'success': False})
+        response.headers['Retry-After'] = '5'
+        return response, 503
 
     return jsonify({
         'success': True,
-        'ingredients': all_ingredients,
-        'total_images': len(request.files.getlist('files'))
-    })
\ No newline at end of file
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"{request.script_root}{request.path.rstrip('/')}/{job['id']}"
+    }), 202
+
+
+@vision_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_analyze_job(job_id):
+    """查詢工作狀態；?wait=秒數 可長輪詢直到完成"""
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT_SECONDS)
+    job = job_manager.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'success': False}), 404
+
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+        'timings': job['timings']
+    })
@@ -0,0 +1,82 @@
+# backend/services/batch_worker.py
+
+"""
+背景批次處理
+請求只把項目排入有上限的佇列，由背景執行緒累積成批後處理（寫入資料庫、附加記錄檔、更新統計模型等）
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorker:
+    """
+    背景批次處理：累積到 batch_size 筆或等待 interval 秒後呼叫 handle(批次)
+    佇列滿時丟棄新項目（不阻塞請求）；handle 失敗時整批記為失敗，不重試
+    """
+
+    def __init__(self, name: str, handle: Callable[[List[Any]], Any], batch_size: int = 50,
+                 interval: float = 2.0, max_queue: int = 1000):
+        self.name = name
+        self.handle = handle
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'dropped': 0, 'processed': 0, 'batches': 0, 'failed_batches': 0, 'failed_items': 0}
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name=f'{name}-writer', daemon=True)
+        self._thread.start()
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for field, amount in amounts.items():
+                self._stats[field] += amount
+
+    def put(self, item: Any) -> bool:
+        with self._lock:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._pending -= 1
+                self._stats['dropped'] += 1
+            return False
+        self._count(queued=1)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.interval))
+            except queue.Empty:
+                pass
+
+            try:
+                self.handle(batch)
+                self._count(processed=len(batch), batches=1)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(batch)} failed: {e}")
+                self._count(failed_batches=1, failed_items=len(batch))
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待目前佇列中的項目處理完（測試與程式結束前使用）"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
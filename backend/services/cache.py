@@ -0,0 +1,301 @@
+# backend/services/cache.py
+
+"""
+結果快取
+兩層快取：行程內 LRU（記憶體）+ SQLite 持久層（磁碟），皆支援 TTL
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """執行緒安全的 LRU 快取，依筆數上限淘汰，支援 TTL"""
+
+    def __init__(self, max_entries: int = 512, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at and expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    SQLite 持久快取
+    以 TTL 淘汰過期資料，總容量超過 max_bytes 時依最久未使用淘汰
+    """
+
+    # 每寫入幾次檢查一次容量，避免每次寫入都做 SUM
+    EVICT_EVERY = 32
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每個執行緒使用自己的連線"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """初始化快取表格"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries(accessed_at)')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at and expires_at < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return default
+        conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (key, payload, len(payload.encode('utf-8')), now + ttl if ttl else 0.0, now)
+        )
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        self._connect().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def evict(self) -> int:
+        """清除過期資料，並在超過容量時淘汰最久未使用的資料"""
+        conn = self._connect()
+        removed = conn.execute(
+            'DELETE FROM cache_entries WHERE expires_at > 0 AND expires_at < ?', (time.time(),)
+        ).rowcount
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return removed
+
+        # 淘汰到容量的 90%，避免每次寫入都觸發淘汰
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute('SELECT key, size FROM cache_entries ORDER BY accessed_at ASC')
+        victims = []
+        for key, size in rows:
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM cache_entries WHERE key = ?', victims)
+        return removed + len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+class TieredCache:
+    """
+    兩層快取：先查記憶體 LRU，再查 SQLite
+    磁碟命中時回填記憶體；統計命中率與節省的計算時間
+    """
+
+    def __init__(self, name: str, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.name = name
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'computed': 0,
+            'compute_seconds': 0.0,
+        }
+
+    def _count(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[field] += amount
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('memory_hits')
+            return value
+
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key, _MISSING)
+            except sqlite3.Error:
+                value = _MISSING
+            if value is not _MISSING:
+                self._count('disk_hits')
+                self.memory.set(key, value)
+                return value
+
+        self._count('misses')
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                # 磁碟層失敗不影響主要流程
+                pass
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            try:
+                self.disk.delete(key)
+            except sqlite3.Error:
+                pass
+
+    def record_computed(self, seconds: float) -> None:
+        """記錄一次快取外的計算（自行計算後再 set 時使用）"""
+        self._count('computed')
+        self._count('compute_seconds', seconds)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """查詢快取，未命中時執行 compute 並寫回快取"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        started = time.perf_counter()
+        value = compute()
+        self.record_computed(time.perf_counter() - started)
+
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        avg_compute = stats['compute_seconds'] / stats['computed'] if stats['computed'] else 0.0
+
+        stats.update({
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'avg_compute_seconds': round(avg_compute, 4),
+            # 以平均計算時間估計命中所節省的時間
+            'estimated_saved_seconds': round(hits * avg_compute, 2),
+            'memory_entries': len(self.memory),
+        })
+        stats['compute_seconds'] = round(stats['compute_seconds'], 4)
+        if self.disk is not None:
+            try:
+                stats['disk'] = self.disk.stats()
+            except sqlite3.Error as e:
+                stats['disk'] = {'error': str(e)}
+        return stats
+
+
+def create_tiered_cache(name: str, env_prefix: str, default_path: str,
+                        default_ttl: float = 7 * 24 * 3600) -> TieredCache:
+    """
+    依環境變數建立兩層快取
+    {PREFIX}_TTL / {PREFIX}_MEMORY_ENTRIES / {PREFIX}_PATH / {PREFIX}_MAX_BYTES
+    {PREFIX}_PATH 設為空字串時停用磁碟層
+    """
+    ttl = float(os.environ.get(f'{env_prefix}_TTL', default_ttl))
+    memory = LRUCache(
+        max_entries=int(os.environ.get(f'{env_prefix}_MEMORY_ENTRIES', 512)),
+        ttl=ttl
+    )
+
+    disk = None
+    path = os.environ.get(f'{env_prefix}_PATH', default_path)
+    if path:
+        try:
+            disk = SQLiteCache(
+                path,
+                ttl=ttl,
+                max_bytes=int(os.environ.get(f'{env_prefix}_MAX_BYTES', 64 * 1024 * 1024))
+            )
+        except (sqlite3.Error, OSError):
+            disk = None
+
+    return TieredCache(name, memory, disk)
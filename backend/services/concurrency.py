@@ -0,0 +1,105 @@
+# backend/services/concurrency.py
+
+"""
+有界併發執行
+全域共用一個執行緒池（全域上限），每次呼叫再以 semaphore 限制單一請求的併發數
+"""
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from services import metrics
+
+
+class TaskResult(NamedTuple):
+    """單一工作的結果：成功時 error 為 None"""
+    value: Any
+    error: Optional[BaseException]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BoundedExecutor:
+    """全域有界執行緒池"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'in_flight': 0}
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._stats['in_flight'] -= 1
+            self._stats['completed' if future.exception() is None else 'failed'] += 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['in_flight'] += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def map_ordered(self, fn: Callable[[Any], Any], items: Iterable[Any],
+                    max_concurrency: Optional[int] = None) -> List[TaskResult]:
+        """
+        併發執行 fn(item)，結果依輸入順序回傳
+        單一項目失敗只會記錄在該項目的 TaskResult，不影響其他項目
+        """
+        items = list(items)
+        limit = max(1, min(max_concurrency or self.max_workers, self.max_workers))
+        slots = threading.BoundedSemaphore(limit)
+        futures: List[Future] = []
+
+        for item in items:
+            slots.acquire()
+            future = self.submit(fn, item)
+            future.add_done_callback(lambda _f: slots.release())
+            futures.append(future)
+
+        results = []
+        for future in futures:
+            error = future.exception()
+            results.append(TaskResult(None if error else future.result(), error))
+        return results
+
+    def iter_completed(self, fn: Callable[[Any], Any], items: Iterable[Any],
+                       max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, TaskResult]]:
+        """
+        併發執行 fn(item)，每完成一項就產出 (輸入索引, TaskResult)
+        同時執行的數量不超過 max_concurrency
+        """
+        items = list(items)
+        limit = max(1, min(max_concurrency or self.max_workers, self.max_workers))
+        pending: Dict[Future, int] = {}
+        next_index = 0
+
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < limit:
+                pending[self.submit(fn, items[next_index])] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                yield index, TaskResult(None if error else future.result(), error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_workers'] = self.max_workers
+        return stats
+
+
+# 所有影像識別請求共用的執行緒池，VISION_MAX_CONCURRENCY 為全域上限
+vision_executor = BoundedExecutor(
+    'vision', int(os.environ.get('VISION_MAX_CONCURRENCY', 16))
+)
+metrics.register('vision_executor', vision_executor.stats)
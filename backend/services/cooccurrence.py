@@ -0,0 +1,275 @@
+# backend/services/cooccurrence.py
+
+"""
+食材共現建議引擎
+從 recipes.ingredients 統計食材共同出現的次數（稀疏矩陣：食材 -> {共現食材: 次數}），以 PMI / lift 評分：
+    PMI(a, b) = log( c(a, b) · N / (df(a) · df(b)) )，lift = exp(PMI)
+- 每種食材預先保存分數最高的前 k 個鄰居；鄰居分數只存與 N 無關的部分，查詢時再加上 log N
+- /suggest 只需把使用者現有食材的鄰居分數加總（數十次 dict 操作），不碰矩陣
+- 新食譜由背景執行緒批次累加計數，只重算受影響食材（新食譜的食材與其共現食材）的鄰居列，
+  再整份替換唯讀快照；查詢端不需要鎖
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from services import metrics
+from services.batch_worker import BatchWorker
+from services.ingredient_normalizer import IngredientNormalizer, ingredient_normalizer
+
+logger = logging.getLogger(__name__)
+
+# 共現資料來源：none / postgres / snapshot（食譜 JSON 陣列，與 RECIPE_INDEX_SNAPSHOT 相同格式）
+INGREDIENT_SUGGEST_SOURCE = os.environ.get('INGREDIENT_SUGGEST_SOURCE', 'none')
+INGREDIENT_SUGGEST_SNAPSHOT = (
+    os.environ.get('INGREDIENT_SUGGEST_SNAPSHOT') or os.environ.get('RECIPE_INDEX_SNAPSHOT', '')
+)
+# 每種食材保存的鄰居數、計入的最少共現次數、彙總方式 (pmi / lift)
+INGREDIENT_SUGGEST_NEIGHBORS = int(os.environ.get('INGREDIENT_SUGGEST_NEIGHBORS', 20))
+INGREDIENT_SUGGEST_MIN_SUPPORT = int(os.environ.get('INGREDIENT_SUGGEST_MIN_SUPPORT', 2))
+INGREDIENT_SUGGEST_SCORE = os.environ.get('INGREDIENT_SUGGEST_SCORE', 'pmi')
+
+SCORES = ('pmi', 'lift')
+
+# 初始建立時每批累加的食譜數
+LOAD_BATCH = 5000
+
+
+class Suggestion(NamedTuple):
+    """建議食材"""
+    name: str
+    score: float   # 各現有食材的 PMI（或 lift）加總
+    support: int   # 有幾個現有食材把它列為鄰居
+
+
+class _Snapshot(NamedTuple):
+    """查詢用唯讀快照；neighbors 的分數為 log c(a, b) - log df(a) - log df(b)"""
+    neighbors: Mapping[str, Tuple[Tuple[str, float], ...]]
+    recipes: int
+    log_recipes: float
+
+
+def recipe_ingredient_names(recipe: Dict[str, Any], canonical) -> Set[str]:
+    """食譜的標準食材名稱集合（ingredients 可為 [{name, amount}] 或名稱清單）"""
+    names = set()
+    for item in recipe.get('ingredients') or []:
+        name = str(item.get('name', '') if isinstance(item, dict) else item).strip()
+        if name:
+            names.add(canonical(name))
+    return names
+
+
+class CooccurrenceModel:
+    """
+    共現矩陣與鄰居快照
+    計數只在寫入端（背景執行緒、初始載入）以鎖保護；查詢只讀取 self._snapshot
+    """
+
+    def __init__(self, neighbors: int = INGREDIENT_SUGGEST_NEIGHBORS,
+                 min_support: int = INGREDIENT_SUGGEST_MIN_SUPPORT,
+                 score: str = INGREDIENT_SUGGEST_SCORE,
+                 normalizer: IngredientNormalizer = ingredient_normalizer):
+        if score not in SCORES:
+            raise ValueError(f"Unknown suggestion score {score!r}, expected one of {SCORES}")
+        self.neighbors = neighbors
+        self.min_support = min_support
+        self.score = score
+        self.normalizer = normalizer
+
+        self._lock = threading.Lock()
+        self._recipes = 0
+        self._df: Counter = Counter()
+        self._pairs: Dict[str, Counter] = {}
+        self._dirty: Set[str] = set()
+        self._snapshot = _Snapshot(MappingProxyType({}), 0, 0.0)
+        self._worker: Optional[BatchWorker] = None
+        self._stats = {'rebuilds': 0, 'rows_rebuilt': 0, 'last_rebuild_ms': 0.0}
+
+    @property
+    def ready(self) -> bool:
+        """快照中已有資料"""
+        return self._snapshot.recipes > 0
+
+    # ---------------------------------------------------------
+    # 寫入端
+    # ---------------------------------------------------------
+    def add_recipes(self, recipes: Iterable[Dict[str, Any]]) -> int:
+        """累加計數並標記受影響的食材（不更新快照），回傳計入的食譜數"""
+        canonical = self.normalizer.canonical
+        baskets = [names for names in (recipe_ingredient_names(recipe, canonical) for recipe in recipes) if names]
+        with self._lock:
+            for names in baskets:
+                self._recipes += 1
+                for name in names:
+                    self._df[name] += 1
+                    partners = self._pairs.get(name)
+                    if partners is None:
+                        partners = self._pairs[name] = Counter()
+                    for partner in names:
+                        if partner != name:
+                            partners[partner] += 1
+                self._dirty.update(names)
+        return len(baskets)
+
+    def _row(self, name: str) -> Tuple[Tuple[str, float], ...]:
+        """name 的前 k 個鄰居（與 N 無關的分數部分）"""
+        log_df = math.log(self._df[name])
+        scored = [
+            (math.log(count) - log_df - math.log(self._df[partner]), partner)
+            for partner, count in self._pairs.get(name, {}).items()
+            if count >= self.min_support
+        ]
+        top = heapq.nlargest(self.neighbors, scored)
+        return tuple((partner, round(score, 6)) for score, partner in top)
+
+    def rebuild(self, full: bool = False) -> int:
+        """
+        重算受影響食材的鄰居列後替換快照，回傳重算的列數
+        df(b) 改變會影響所有與 b 共現的食材，因此重算 新食譜的食材 ∪ 它們的共現食材
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if full:
+                rows = set(self._pairs)
+            else:
+                rows = set(self._dirty)
+                for name in self._dirty:
+                    rows.update(self._pairs.get(name, ()))
+            self._dirty.clear()
+            neighbors = dict(self._snapshot.neighbors) if not full else {}
+            for name in rows:
+                neighbors[name] = self._row(name)
+            recipes = self._recipes
+            # 在鎖內替換，初始載入與背景更新同時重算時不會以舊結果覆蓋新結果
+            self._snapshot = _Snapshot(MappingProxyType(neighbors), recipes, math.log(recipes) if recipes else 0.0)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats['rebuilds'] += 1
+            self._stats['rows_rebuilt'] += len(rows)
+            self._stats['last_rebuild_ms'] = round(elapsed_ms, 3)
+        return len(rows)
+
+    def load(self, recipes: Iterable[Dict[str, Any]], batch_size: int = LOAD_BATCH) -> int:
+        """初始建立：分批累加後整份重算"""
+        total = 0
+        batch: List[Dict[str, Any]] = []
+        for recipe in recipes:
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                total += self.add_recipes(batch)
+                batch = []
+        total += self.add_recipes(batch)
+        self.rebuild(full=True)
+        return total
+
+    def _apply(self, recipes: List[Dict[str, Any]]) -> None:
+        if self.add_recipes(recipes):
+            self.rebuild()
+
+    def submit(self, recipes: Iterable[Dict[str, Any]]) -> None:
+        """排入背景增量更新（不阻塞呼叫端；RecipeWriter 寫入新食譜後呼叫）"""
+        with self._lock:
+            if self._worker is None:
+                self._worker = BatchWorker('ingredient_suggest', self._apply)
+        for recipe in recipes:
+            self._worker.put(recipe)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self._worker.flush(timeout) if self._worker else True
+
+    # ---------------------------------------------------------
+    # 查詢端
+    # ---------------------------------------------------------
+    def suggest(self, ingredients: Sequence[str], k: int = 10) -> List[Suggestion]:
+        """彙總現有食材的鄰居分數，取前 k 個（不含現有食材；只計入 PMI > 0 的鄰居）"""
+        snapshot = self._snapshot
+        canonical = self.normalizer.canonical
+        present = {canonical(str(name)) for name in ingredients if str(name).strip()}
+        offset = snapshot.log_recipes
+        lift = self.score == 'lift'
+
+        scores: Dict[str, float] = {}
+        support: Dict[str, int] = {}
+        for name in present:
+            for partner, base in snapshot.neighbors.get(name, ()):
+                pmi = base + offset
+                if pmi <= 0 or partner in present:
+                    continue
+                scores[partner] = scores.get(partner, 0.0) + (math.exp(pmi) if lift else pmi)
+                support[partner] = support.get(partner, 0) + 1
+
+        top = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [Suggestion(name, round(score, 4), support[name]) for name, score in top]
+
+    def neighbors_of(self, name: str) -> List[Tuple[str, float]]:
+        """單一食材的鄰居與目前的 PMI"""
+        snapshot = self._snapshot
+        return [
+            (partner, round(base + snapshot.log_recipes, 4))
+            for partner, base in snapshot.neighbors.get(self.normalizer.canonical(name), ())
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_rows'] = len(self._dirty)
+            stats['pairs'] = sum(len(partners) for partners in self._pairs.values()) // 2
+        stats.update({'recipes': snapshot.recipes, 'ingredients': len(snapshot.neighbors)})
+        if self._worker:
+            stats['worker'] = self._worker.stats()
+        return stats
+
+
+def _iter_snapshot(path: str):
+    with open(path, encoding='utf-8') as f:
+        yield from json.load(f)
+
+
+def _load_in_background(model: CooccurrenceModel, source: str, snapshot: str) -> None:
+    def run():
+        started = time.perf_counter()
+        try:
+            if source == 'postgres':
+                from services.recipe_index import iter_postgres_recipes
+                recipes = iter_postgres_recipes()
+            else:
+                recipes = _iter_snapshot(snapshot)
+            count = model.load(recipes)
+            logger.info(f"Ingredient co-occurrence built: {count} recipes in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to build ingredient co-occurrence from {source}: {e}")
+
+    threading.Thread(target=run, name='ingredient-suggest-load', daemon=True).start()
+
+
+def create_suggestion_engine(source: str = INGREDIENT_SUGGEST_SOURCE,
+                             snapshot: str = INGREDIENT_SUGGEST_SNAPSHOT) -> Optional[CooccurrenceModel]:
+    """
+    依設定建立共現建議引擎並註冊統計；none 或設定錯誤時回傳 None（/suggest 使用規則建議）
+    初始建立在背景執行緒進行，完成前 ready 為 False
+    """
+    if source in ('', 'none'):
+        return None
+    if source not in ('postgres', 'snapshot') or (source == 'snapshot' and not snapshot):
+        logger.error(f"Invalid ingredient suggestion source {source!r} (snapshot={snapshot!r})")
+        return None
+    try:
+        model = CooccurrenceModel()
+    except ValueError as e:
+        logger.error(str(e))
+        return None
+    metrics.register('ingredient_suggest', model.stats)
+    _load_in_background(model, source, snapshot)
+    return model
+
+
+ingredient_suggester = create_suggestion_engine()
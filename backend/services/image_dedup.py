@@ -0,0 +1,192 @@
+# backend/services/image_dedup.py
+
+"""
+近似重複圖片偵測
+以 dHash 感知雜湊比對圖片，Hamming 距離在門檻內視為同一張照片，重用識別結果
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 未安裝時不做近似比對
+    Image = None
+    ImageOps = None
+
+from services import metrics
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+# Hamming 距離門檻（64 bits 中允許幾個 bit 不同），設為負數停用
+VISION_DEDUP_THRESHOLD = int(os.environ.get('VISION_DEDUP_THRESHOLD', 6))
+# 跨請求比對：每個 session 保留最近幾張圖片、保留多久
+VISION_DEDUP_SESSION_SIZE = int(os.environ.get('VISION_DEDUP_SESSION_SIZE', 32))
+VISION_DEDUP_SESSION_TTL = float(os.environ.get('VISION_DEDUP_SESSION_TTL', 1800))
+
+
+def dhash(data, hash_size: int = 8) -> Optional[int]:
+    """計算 dHash；無法解碼時回傳 None"""
+    if Image is None:
+        return None
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == 'JPEG':
+            image.draft('L', (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    except Exception as e:
+        logger.debug(f"dHash skipped: {e}")
+        return None
+
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex:
+    """
+    Hamming 距離索引（multi-index hashing）
+    將 64 bits 切成 threshold + 1 段；距離不超過 threshold 的兩個雜湊必有一段完全相同，
+    因此只需比對共用任一段的候選，不必逐一掃描
+    超過 max_entries 或 ttl 秒的項目依加入順序移除（最舊的先移除），索引大小不會持續成長
+    """
+
+    def __init__(self, threshold: int = VISION_DEDUP_THRESHOLD, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        bands = max(1, min(threshold + 1, HASH_BITS))
+        width = HASH_BITS // bands
+        self._bands = [
+            (i * width, HASH_BITS - i * width if i == bands - 1 else width)
+            for i in range(bands)
+        ]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        # entry_id -> (雜湊, payload, 加入時間)；_order 為加入順序
+        self._entries: Dict[int, Tuple[int, Any, float]] = {}
+        self._order: Deque[int] = deque()
+        self._next_id = 0
+
+    def _keys(self, value: int):
+        for shift, width in self._bands:
+            yield (value >> shift) & ((1 << width) - 1)
+
+    def _prune(self) -> None:
+        """移除過期的項目"""
+        if self.ttl is None:
+            return
+        cutoff = self._clock() - self.ttl
+        while self._order and self._entries[self._order[0]][2] <= cutoff:
+            self._remove(self._order.popleft())
+
+    def find(self, value: int) -> Optional[Tuple[int, Any]]:
+        """找出距離最近且在門檻內的項目，回傳 (距離, payload)"""
+        if self.threshold < 0:
+            return None
+
+        self._prune()
+        best = None
+        seen = set()
+        for buckets, key in zip(self._buckets, self._keys(value)):
+            for entry_id in buckets.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                stored, payload, _ = self._entries[entry_id]
+                distance = hamming_distance(value, stored)
+                if distance <= self.threshold and (best is None or distance < best[0]):
+                    best = (distance, payload)
+        return best
+
+    def add(self, value: int, payload: Any) -> None:
+        self._prune()
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (value, payload, self._clock())
+        self._order.append(entry_id)
+        for buckets, key in zip(self._buckets, self._keys(value)):
+            buckets.setdefault(key, []).append(entry_id)
+
+        # 超過上限時移除最舊的項目
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._remove(self._order.popleft())
+
+    def _remove(self, entry_id: int) -> None:
+        value, _, _ = self._entries.pop(entry_id)
+        for buckets, key in zip(self._buckets, self._keys(value)):
+            bucket = buckets.get(key)
+            if bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SessionDedupStore:
+    """每個 session 最近上傳圖片的索引（跨請求比對用）"""
+
+    def __init__(self, threshold: int = VISION_DEDUP_THRESHOLD,
+                 size: int = VISION_DEDUP_SESSION_SIZE, ttl: float = VISION_DEDUP_SESSION_TTL,
+                 max_sessions: int = 2048):
+        self.threshold = threshold
+        self.size = size
+        self.ttl = ttl
+        self._sessions = LRUCache(max_entries=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'batch_duplicates': 0, 'session_duplicates': 0}
+
+    def _index(self, session_id: str) -> NearDuplicateIndex:
+        index = self._sessions.get(session_id)
+        if index is None:
+            index = NearDuplicateIndex(self.threshold, max_entries=self.size, ttl=self.ttl)
+        # 重新寫入以延長 TTL
+        self._sessions.set(session_id, index)
+        return index
+
+    def find(self, session_id: str, value: int) -> Optional[Tuple[int, Any]]:
+        with self._lock:
+            return self._index(session_id).find(value)
+
+    def add(self, session_id: str, value: int, payload: Any) -> None:
+        with self._lock:
+            self._index(session_id).add(value, payload)
+
+    def record(self, checked: int = 0, batch_duplicates: int = 0, session_duplicates: int = 0) -> None:
+        with self._lock:
+            self._stats['checked'] += checked
+            self._stats['batch_duplicates'] += batch_duplicates
+            self._stats['session_duplicates'] += session_duplicates
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['threshold'] = self.threshold
+        stats['sessions'] = len(self._sessions)
+        return stats
+
+
+session_dedup = SessionDedupStore()
+metrics.register('vision_dedup', session_dedup.stats)
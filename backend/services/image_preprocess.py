@@ -0,0 +1,179 @@
+# backend/services/image_preprocess.py
+
+"""
+影像前處理
+送往 Vision LLM 前：辨識實際格式、套用 EXIF 方向、縮小到長邊上限並重新編碼
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 未安裝時直接送原圖
+    Image = None
+    ImageOps = None
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# 長邊上限；OpenAI 在伺服器端也會縮圖，送更大的圖只會增加傳輸量
+VISION_MAX_EDGE = int(os.environ.get('VISION_MAX_EDGE', 1536))
+VISION_JPEG_QUALITY = int(os.environ.get('VISION_JPEG_QUALITY', 85))
+
+# 前處理參數，納入識別快取的版本號
+PREPROCESS_VERSION = f"edge={VISION_MAX_EDGE};q={VISION_JPEG_QUALITY}"
+
+_MAGIC_NUMBERS = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+_PIL_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+# EXIF 方向標籤
+_EXIF_ORIENTATION = 0x0112
+
+
+class PreparedImage(NamedTuple):
+    """前處理後的圖片與統計"""
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    final_bytes: int
+    seconds: float
+    reencoded: bool
+    width: int = 0
+    height: int = 0
+
+
+def sniff_mime_type(data) -> Optional[str]:
+    """依檔頭判斷圖片格式"""
+    head = bytes(data[:16])
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1'):
+        return 'image/heic'
+    return None
+
+
+class PreprocessStats:
+    """前處理累計統計（位元組數與耗時）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'images': 0,
+            'reencoded': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'seconds': 0.0,
+        }
+
+    def record(self, prepared: PreparedImage) -> None:
+        with self._lock:
+            self._stats['images'] += 1
+            self._stats['reencoded'] += int(prepared.reencoded)
+            self._stats['bytes_before'] += prepared.original_bytes
+            self._stats['bytes_after'] += prepared.final_bytes
+            self._stats['seconds'] += prepared.seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        before = stats['bytes_before']
+        stats['size_ratio'] = round(stats['bytes_after'] / before, 4) if before else 1.0
+        stats['avg_ms'] = round(stats['seconds'] * 1000 / stats['images'], 2) if stats['images'] else 0.0
+        stats['seconds'] = round(stats['seconds'], 4)
+        return stats
+
+
+preprocess_stats = PreprocessStats()
+metrics.register('vision_preprocess', preprocess_stats.stats)
+
+
+def _passthrough(data, mime_type: Optional[str], started: float, size=(0, 0)) -> PreparedImage:
+    data = bytes(data)
+    return PreparedImage(
+        data, mime_type or 'image/jpeg', len(data), len(data),
+        time.perf_counter() - started, False, size[0], size[1]
+    )
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    估計 OpenAI high detail 模式下一張圖片的 token 數
+    （縮到 2048 內、短邊 768，再以 512px 方塊計算；尺寸未知時以 2x2 方塊估計）
+    """
+    if not width or not height:
+        return 85 + 170 * 4
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = -(-int(width) // 512) * -(-int(height) // 512)
+    return 85 + 170 * tiles
+
+
+def prepare_image(data, max_edge: int = VISION_MAX_EDGE, quality: int = VISION_JPEG_QUALITY) -> PreparedImage:
+    """
+    前處理單張圖片
+    已經夠小且方向正確的圖片原封不動送出，只修正 MIME 類型；
+    無法解碼（格式不支援、檔案損毀）時同樣送原圖
+    """
+    started = time.perf_counter()
+    mime_type = sniff_mime_type(data)
+
+    if Image is None:
+        prepared = _passthrough(data, mime_type, started)
+        preprocess_stats.record(prepared)
+        return prepared
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        mime_type = _PIL_MIME_TYPES.get(image.format, mime_type)
+        orientation = image.getexif().get(_EXIF_ORIENTATION, 1)
+        oversized = max(image.size) > max_edge
+
+        if not oversized and orientation == 1 and mime_type in _PIL_MIME_TYPES.values():
+            prepared = _passthrough(data, mime_type, started, image.size)
+        else:
+            if image.format == 'JPEG':
+                # JPEG 解碼時直接以 1/2、1/4、1/8 縮小，省下完整解碼的時間與記憶體
+                image.draft('RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) > max_edge:
+                image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=quality)
+            encoded = buffer.getvalue()
+            prepared = PreparedImage(
+                encoded, 'image/jpeg', len(data), len(encoded),
+                time.perf_counter() - started, True, image.width, image.height
+            )
+
+    except Exception as e:
+        logger.warning(f"Image preprocessing skipped: {e}")
+        prepared = _passthrough(data, mime_type, started)
+
+    preprocess_stats.record(prepared)
+    return prepared
@@ -0,0 +1,101 @@
+# backend/services/ingredient_catalog.py
+
+"""
+食材目錄
+啟動時由分類 → 食材清單建立一次，之後唯讀：
+- 名稱 → 分類的雜湊索引（O(1) 查詢，取代逐一掃描各分類清單）
+- 攤平的食材清單（含預先轉小寫的名稱，供搜尋使用）
+- 預先序列化的 /categories 回應內容與 ETag
+"""
+
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, NamedTuple, Tuple
+
+DEFAULT_CATEGORY = 'others'
+
+# 常見食材資料庫
+COMMON_INGREDIENTS = {
+    'vegetables': [
+        '番茄', '洋蔥', '大蒜', '胡蘿蔔', '馬鈴薯', '高麗菜', '菠菜',
+        '花椰菜', '蘑菇', '青椒', '紅椒', '黃椒', '小黃瓜', '芹菜',
+        '韭菜', '蔥', '薑', '蒜苗', '白蘿蔔', '紅蘿蔔', '玉米', '豌豆'
+    ],
+    'fruits': [
+        '蘋果', '香蕉', '橘子', '檸檬', '萊姆', '葡萄', '草莓', '藍莓',
+        '奇異果', '鳳梨', '芒果', '西瓜', '哈密瓜', '梨子', '桃子', '櫻桃'
+    ],
+    'meat': [
+        '雞肉', '牛肉', '豬肉', '羊肉', '火雞肉', '雞胸肉', '雞腿肉',
+        '牛絞肉', '豬絞肉', '培根', '火腿', '香腸', '臘肉'
+    ],
+    'seafood': [
+        '魚', '鮭魚', '鮪魚', '蝦子', '螃蟹', '龍蝦', '蛤蜊', '牡蠣',
+        '花枝', '章魚', '干貝', '魚丸', '蝦仁'
+    ],
+    'dairy': [
+        '牛奶', '起司', '優格', '奶油', '鮮奶油', '酸奶', '乳酪',
+        '馬茲瑞拉起司', '切達起司', '帕瑪森起司'
+    ],
+    'grains': [
+        '米飯', '麵包', '麵條', '義大利麵', '麥片', '燕麥', '藜麥',
+        '糙米', '白米', '糯米', '冬粉', '米粉', '烏龍麵'
+    ],
+    'others': [
+        '雞蛋', '油', '鹽', '糖', '醬油', '醋', '胡椒', '香料',
+        '香草', '蜂蜜', '果醬', '花生醬', '芝麻', '堅果'
+    ]
+}
+
+
+class CatalogEntry(NamedTuple):
+    """攤平清單中的一筆食材"""
+    name: str
+    lowered: str
+    category: str
+
+
+class IngredientCatalog:
+    """唯讀食材目錄；同一食材出現在多個分類時以第一個分類為準"""
+
+    __slots__ = ('categories', 'by_name', 'entries', 'by_category', 'categories_payload', 'categories_etag')
+
+    def __init__(self, categories: Mapping[str, Iterable[str]]):
+        frozen = {category: tuple(names) for category, names in categories.items()}
+        by_name: Dict[str, str] = {}
+        for category, names in frozen.items():
+            for name in names:
+                by_name.setdefault(name, category)
+
+        by_category = {
+            category: tuple(CatalogEntry(name, name.lower(), by_name[name]) for name in names)
+            for category, names in frozen.items()
+        }
+        entries = tuple(entry for category_entries in by_category.values() for entry in category_entries)
+        payload = json.dumps({'success': True, 'categories': frozen}, ensure_ascii=False).encode('utf-8')
+
+        set_field = object.__setattr__
+        set_field(self, 'categories', MappingProxyType(frozen))
+        set_field(self, 'by_name', MappingProxyType(by_name))
+        set_field(self, 'entries', entries)
+        set_field(self, 'by_category', MappingProxyType(by_category))
+        set_field(self, 'categories_payload', payload)
+        set_field(self, 'categories_etag', hashlib.sha256(payload).hexdigest()[:16])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('IngredientCatalog is immutable')
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.by_name
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def category(self, name: str, default: str = DEFAULT_CATEGORY) -> str:
+        """食材所屬分類；不在目錄中時回傳 default"""
+        return self.by_name.get(name, default)
+
+    def entries_for(self, category: str = '') -> Tuple[CatalogEntry, ...]:
+        """指定分類的食材；分類為空或不存在時回傳全部"""
+        return self.by_category.get(category, self.entries) if category else self.entries
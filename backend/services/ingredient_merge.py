@@ -0,0 +1,121 @@
+# backend/services/ingredient_merge.py
+
+"""
+食材合併與去重
+多張圖片的識別結果依正規化名稱與同義詞對應到標準名稱，合併數量、分類與信心度
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List
+
+# 標準名稱 -> 常見同義詞／異體字
+INGREDIENT_SYNONYMS: Dict[str, List[str]] = {
+    '番茄': ['蕃茄', '西紅柿', '小番茄', '聖女番茄', 'tomato', 'tomatoes'],
+    '雞蛋': ['蛋', '雞卵', '土雞蛋', 'egg', 'eggs'],
+    '米飯': ['白飯', '飯', '白米飯', 'rice'],
+    '雞胸肉': ['雞胸', '雞里肌', 'chicken breast'],
+    '雞腿肉': ['雞腿', '去骨雞腿', 'chicken thigh'],
+    '雞肉': ['chicken'],
+    '豬肉': ['pork'],
+    '牛肉': ['beef'],
+    '馬鈴薯': ['土豆', '洋芋', 'potato', 'potatoes'],
+    '高麗菜': ['甘藍', '包心菜', '捲心菜', 'cabbage'],
+    '洋蔥': ['onion', 'onions'],
+    '大蒜': ['蒜頭', '蒜', 'garlic'],
+    '蔥': ['青蔥', '蔥花', 'green onion', 'scallion'],
+    '紅蘿蔔': ['胡蘿蔔', 'carrot', 'carrots'],
+    '青椒': ['green pepper'],
+    '蘑菇': ['洋菇', 'mushroom', 'mushrooms'],
+    '起司': ['芝士', '起士', 'cheese'],
+    '牛奶': ['鮮奶', 'milk'],
+    '小黃瓜': ['黃瓜', '胡瓜', 'cucumber'],
+    '豆腐': ['板豆腐', 'tofu'],
+    '蝦仁': ['蝦肉'],
+    '蝦子': ['蝦', '鮮蝦', '草蝦', 'shrimp', 'prawn'],
+    '鮭魚': ['三文魚', 'salmon'],
+}
+
+_PUNCTUATION = re.compile(r'[\s\-_·・,，.。()（）\[\]【】]+')
+
+
+def normalize_name(name: str) -> str:
+    """正規化食材名稱：全半形統一、去空白與標點、英文小寫"""
+    return _PUNCTUATION.sub('', unicodedata.normalize('NFKC', name)).casefold()
+
+
+class CanonicalNameIndex:
+    """正規化名稱 -> 標準名稱的雜湊索引"""
+
+    def __init__(self, synonyms: Dict[str, List[str]] = INGREDIENT_SYNONYMS):
+        self._index: Dict[str, str] = {}
+        for canonical, aliases in synonyms.items():
+            self._index[normalize_name(canonical)] = canonical
+            for alias in aliases:
+                self._index.setdefault(normalize_name(alias), canonical)
+
+    def canonical(self, name: str) -> str:
+        """取得標準名稱；不在索引中的名稱回傳去除前後空白後的原名"""
+        return self._index.get(normalize_name(name), name.strip())
+
+
+canonical_names = CanonicalNameIndex()
+
+
+def merge_ingredients(per_image: Iterable[List[Dict]], index: CanonicalNameIndex = canonical_names) -> List[Dict]:
+    """
+    合併多張圖片的食材清單（總長度的線性時間）
+    - count：出現在幾張圖片中
+    - category：各圖片中最常見的已知分類
+    - confidence：各次識別的信心度以 1 - Π(1 - c) 合併
+    - aliases：被合併進來的其他寫法
+    結果依第一次出現的順序排列
+    """
+    merged: Dict[str, Dict] = {}
+
+    for image_index, ingredients in enumerate(per_image):
+        for item in ingredients:
+            name = str(item.get('name', '')).strip()
+            if not name:
+                continue
+            canonical = index.canonical(name)
+
+            entry = merged.get(canonical)
+            if entry is None:
+                entry = merged[canonical] = {
+                    'name': canonical,
+                    'images': set(),
+                    'categories': Counter(),
+                    'miss': 1.0,
+                    'aliases': set(),
+                }
+
+            entry['images'].add(image_index)
+            category = item.get('category')
+            if category and category != 'unknown':
+                entry['categories'][category] += 1
+            entry['miss'] *= 1.0 - min(max(float(item.get('confidence', 1.0)), 0.0), 1.0)
+            for alias in (name, item.get('original')):
+                if alias and alias != canonical:
+                    entry['aliases'].add(alias)
+
+    results = []
+    for entry in merged.values():
+        categories = entry['categories']
+        results.append({
+            'name': entry['name'],
+            'category': categories.most_common(1)[0][0] if categories else 'unknown',
+            'confidence': round(1.0 - entry['miss'], 4),
+            'count': len(entry['images']),
+            'aliases': sorted(entry['aliases']),
+        })
+    return results
+
+
+def canonical_ingredient_set(names: Iterable[str], index: CanonicalNameIndex = canonical_names) -> List[str]:
+    """
+    食材組合的標準形式：對應到標準名稱、去重後排序
+    寫法或順序不同的相同組合（蕃茄+蛋、雞蛋+番茄）得到相同結果
+    """
+    return sorted({index.canonical(str(name)) for name in names if str(name).strip()})
@@ -0,0 +1,289 @@
+# backend/services/ingredient_normalizer.py
+
+"""
+食材名稱正規化引擎
+把使用者輸入與 LLM 識別結果的自由寫法對應到標準食材 id（即標準名稱），並附上信心度：
+1. exact / synonym：normalize_name 後查雜湊表（標準名稱與同義詞表，信心度 1.0）
+2. modifier：去掉常見修飾詞（新鮮、冷凍、切丁…）後再查表（信心度 0.9）
+3. edit：SymSpell 式刪除索引找編輯距離內的候選（Damerau 距離；信心度 1 - 距離 / 長度）
+   中文單字差異常是不同食材（雞肉／鴨肉、雞胸肉／鴨胸肉、花生醬／花生油），三個字以內不做模糊比對；
+   英文短字改一個字母常是另一個常用字（beer／beef、fork／pork、rice／mice），五個字母以內不做模糊比對；
+   且最佳候選必須唯一
+modifier / edit 只是推測：識別結果只在 exact / synonym 時改寫（Resolution.exact）
+canonical() 只採用查表結果（exact / synonym / modifier，Resolution.table），請求快取鍵、食譜索引與評分都用它，
+錯字比對只用在 /validate 等顯示建議的地方
+批次介面先去重並使用 LRU 快取，LLM 輸出與使用者輸入的重複率很高
+"""
+
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from services import metrics
+from services.ingredient_catalog import COMMON_INGREDIENTS, DEFAULT_CATEGORY
+from services.ingredient_merge import INGREDIENT_SYNONYMS, normalize_name
+
+# 低於此信心度的結果不套用（canonical() 回傳原名）
+INGREDIENT_MIN_CONFIDENCE = float(os.environ.get('INGREDIENT_MIN_CONFIDENCE', 0.6))
+# 解析結果 LRU 快取筆數（0 表示停用）
+INGREDIENT_NORMALIZE_CACHE = int(os.environ.get('INGREDIENT_NORMALIZE_CACHE', 50000))
+
+EXACT = 'exact'
+SYNONYM = 'synonym'
+MODIFIER = 'modifier'
+EDIT = 'edit'
+AMBIGUOUS = 'ambiguous'
+UNKNOWN = 'unknown'
+METHODS = (EXACT, SYNONYM, MODIFIER, EDIT, AMBIGUOUS, UNKNOWN)
+
+MODIFIER_CONFIDENCE = 0.9
+
+# 常見修飾詞（正規化後的寫法；英文已去空白並轉小寫）
+PREFIX_MODIFIERS = (
+    '新鮮', '冷凍', '冷藏', '有機', '進口', '國產', '台灣', '生', '熟', '去皮', '去骨', '切片',
+    'fresh', 'frozen', 'organic', 'raw', 'sliced', 'diced', 'chopped', 'minced',
+)
+# 「片」不列入：洋芋片、蝦片是不同的食品
+SUFFIX_MODIFIERS = ('丁', '絲', '塊', '末', '泥', '碎', '段', '條')
+
+
+class Resolution(NamedTuple):
+    """單一名稱的解析結果；無法解析時 canonical 為 None"""
+    name: str
+    canonical: Optional[str]
+    category: str
+    confidence: float
+    method: str
+
+    @property
+    def resolved(self) -> bool:
+        return self.canonical is not None
+
+    @property
+    def exact(self) -> bool:
+        """標準名稱或同義詞表中的寫法（不是推測）"""
+        return self.method in (EXACT, SYNONYM)
+
+    @property
+    def table(self) -> bool:
+        """查表得到的結果（含去掉修飾詞），不含錯字比對"""
+        return self.method in (EXACT, SYNONYM, MODIFIER)
+
+
+def max_edit_distance(key: str) -> int:
+    """
+    依正規化寫法允許的編輯距離
+    英文（ASCII）：五個字母以內 0，九個以內 1，其餘 2；其他（中文）：三字以內 0，五字以內 1，其餘 2
+    """
+    if key.isascii():
+        return 0 if len(key) <= 5 else 1 if len(key) <= 9 else 2
+    if len(key) <= 3:
+        return 0
+    return 1 if len(key) <= 5 else 2
+
+
+def _deletes(key: str, distance: int) -> Set[str]:
+    """刪除至多 distance 個字元的所有變體（含原字串）"""
+    variants = {key}
+    frontier = {key}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau（OSA）編輯距離；超過 limit 時提早回傳 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class IngredientNormalizer:
+    """
+    自由寫法 -> 標準食材 id
+    vocabulary: 標準名稱 -> 分類；synonyms: 標準名稱 -> 其他寫法（標準名稱不在 vocabulary 時以預設分類加入）
+    canonical() 與 CanonicalNameIndex 介面相同，可直接傳給 merge_ingredients / canonical_ingredient_set / RecipeIndex
+    """
+
+    def __init__(self, vocabulary: Mapping[str, str],
+                 synonyms: Mapping[str, Iterable[str]] = INGREDIENT_SYNONYMS,
+                 min_confidence: float = INGREDIENT_MIN_CONFIDENCE,
+                 cache_size: int = INGREDIENT_NORMALIZE_CACHE):
+        self.min_confidence = min_confidence
+        self._categories: Dict[str, str] = dict(vocabulary)
+        for canonical in synonyms:
+            self._categories.setdefault(canonical, DEFAULT_CATEGORY)
+
+        # 正規化寫法 -> (標準名稱, method)
+        self._exact: Dict[str, Tuple[str, str]] = {}
+        for canonical in self._categories:
+            self._exact.setdefault(normalize_name(canonical), (canonical, EXACT))
+        for canonical, aliases in synonyms.items():
+            for alias in aliases:
+                self._exact.setdefault(normalize_name(alias), (canonical, SYNONYM))
+        self._exact.pop('', None)
+
+        # SymSpell 刪除索引：刪除變體 -> 正規化寫法
+        deletes: Dict[str, List[str]] = {}
+        for key in self._exact:
+            for variant in _deletes(key, max_edit_distance(key)):
+                deletes.setdefault(variant, []).append(key)
+        self._deletes: Dict[str, Tuple[str, ...]] = {variant: tuple(keys) for variant, keys in deletes.items()}
+
+        self._cache_size = cache_size
+        self._cache: 'OrderedDict[str, Resolution]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._cache_hits = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._categories
+
+    @property
+    def vocabulary(self) -> Mapping[str, str]:
+        """標準名稱 -> 分類"""
+        return self._categories
+
+    def _resolution(self, name: str, canonical: str, confidence: float, method: str) -> Resolution:
+        return Resolution(name, canonical, self._categories[canonical], round(confidence, 4), method)
+
+    def _lookup(self, name: str) -> Resolution:
+        key = normalize_name(name)
+        if not key:
+            return Resolution(name, None, DEFAULT_CATEGORY, 0.0, UNKNOWN)
+
+        hit = self._exact.get(key)
+        if hit:
+            return self._resolution(name, hit[0], 1.0, hit[1])
+
+        stripped = self._strip_modifiers(key)
+        if stripped:
+            return self._resolution(name, stripped, MODIFIER_CONFIDENCE, MODIFIER)
+
+        return self._nearest(name, key)
+
+    def _strip_modifiers(self, key: str) -> Optional[str]:
+        """去掉一個前綴和／或一個後綴修飾詞後能查到時回傳標準名稱；去掉後綴後至少要剩兩個字（蝦條不是蝦）"""
+        prefixed = [key[len(prefix):] for prefix in PREFIX_MODIFIERS if key.startswith(prefix)]
+        for core in prefixed + [key]:
+            if core != key and core in self._exact:
+                return self._exact[core][0]
+            for suffix in SUFFIX_MODIFIERS:
+                if core.endswith(suffix) and len(core) - len(suffix) >= 2 and core[:-len(suffix)] in self._exact:
+                    return self._exact[core[:-len(suffix)]][0]
+        return None
+
+    def _nearest(self, name: str, key: str) -> Resolution:
+        """刪除索引找候選後計算實際距離；最佳距離的候選對應到多個標準名稱時視為無法判斷"""
+        limit = max_edit_distance(key)
+        if not limit:
+            return Resolution(name, None, DEFAULT_CATEGORY, 0.0, UNKNOWN)
+
+        best = limit + 1
+        best_keys: List[str] = []
+        checked = set()
+        for variant in _deletes(key, limit):
+            for candidate in self._deletes.get(variant, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                allowed = min(limit, max_edit_distance(candidate))
+                distance = edit_distance(key, candidate, allowed)
+                if distance > allowed:
+                    continue
+                if distance < best:
+                    best, best_keys = distance, [candidate]
+                elif distance == best:
+                    best_keys.append(candidate)
+
+        canonicals = {self._exact[candidate][0] for candidate in best_keys}
+        if not canonicals:
+            return Resolution(name, None, DEFAULT_CATEGORY, 0.0, UNKNOWN)
+        if len(canonicals) > 1:
+            return Resolution(name, None, DEFAULT_CATEGORY, 0.0, AMBIGUOUS)
+        confidence = 1.0 - best / max(len(key), max(len(candidate) for candidate in best_keys))
+        return self._resolution(name, canonicals.pop(), confidence, EDIT)
+
+    def resolve(self, name: str) -> Resolution:
+        """解析單一名稱（經過 LRU 快取）"""
+        if self._cache_size:
+            with self._lock:
+                cached = self._cache.get(name)
+                if cached is not None:
+                    self._cache.move_to_end(name)
+                    self._cache_hits += 1
+                    self._counts[cached.method] += 1
+                    return cached
+
+        resolution = self._lookup(name)
+
+        with self._lock:
+            self._counts[resolution.method] += 1
+            if self._cache_size:
+                self._cache[name] = resolution
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return resolution
+
+    def resolve_many(self, names: Iterable[str]) -> List[Resolution]:
+        """批次解析（相同寫法只解析一次），結果與輸入順序一致"""
+        names = [str(name) for name in names]
+        unique = {name: None for name in names}
+        for name in unique:
+            unique[name] = self.resolve(name)
+        return [unique[name] for name in names]
+
+    def accepts(self, resolution: Resolution) -> bool:
+        """解析結果是否達到套用門檻"""
+        return resolution.resolved and resolution.confidence >= self.min_confidence
+
+    def canonical(self, name: str) -> str:
+        """標準名稱（只採用查表結果）；錯字比對、信心度不足或無法解析時回傳去除前後空白後的原名"""
+        resolution = self.resolve(name)
+        return resolution.canonical if resolution.table and self.accepts(resolution) else name.strip()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                'resolved': total,
+                'cache_hits': self._cache_hits,
+                'cache_hit_rate': self._cache_hits / total if total else 0.0,
+                'cache_entries': len(self._cache),
+                'vocabulary': len(self._categories),
+                'terms': len(self._exact),
+                **{f'method_{method}': self._counts[method] for method in METHODS},
+            }
+
+
+def _catalog_vocabulary() -> Dict[str, str]:
+    vocabulary: Dict[str, str] = {}
+    for category, names in COMMON_INGREDIENTS.items():
+        for name in names:
+            vocabulary.setdefault(name, category)
+    return vocabulary
+
+
+def create_ingredient_normalizer(vocabulary: Optional[Mapping[str, str]] = None) -> IngredientNormalizer:
+    """以食材目錄與同義詞表建立正規化引擎並註冊統計"""
+    normalizer = IngredientNormalizer(_catalog_vocabulary() if vocabulary is None else vocabulary)
+    metrics.register('ingredient_normalizer', normalizer.stats)
+    return normalizer
+
+
+ingredient_normalizer = create_ingredient_normalizer()
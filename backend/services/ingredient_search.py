@@ -0,0 +1,207 @@
+# backend/services/ingredient_search.py
+
+"""
+食材即時搜尋（typeahead）索引
+啟動時建立一次，之後唯讀；名稱與同義詞都以 normalize_name 正規化後建索引：
+- 前綴 trie：每個節點保存其下所有詞條，預先依（長度, 目錄順序）排序，前綴查詢直接取前 k 筆
+- 字元 bigram 倒排索引：查詢的所有 bigram 取交集得到子字串候選（單字查詢用單字索引），再驗證位置
+- 模糊比對：以頭尾補位的 bigram 計算 Dice 相似度（打錯字、多打或少打一字）；
+  只由較少見的 bigram 產生候選（「冷凍」這類出現在大量名稱中的 bigram 只計分、不產生候選），
+  每次按鍵的成本取決於少見 bigram 的 posting 長度，而不是目錄大小
+排序為 前綴 > 子字串 > 模糊；同一食材的多個寫法只回傳一次
+中文沒有空白分詞，以字元 n-gram 處理；英文同義詞同樣適用
+"""
+
+from functools import reduce
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from services.ingredient_merge import INGREDIENT_SYNONYMS, normalize_name
+
+DEFAULT_LIMIT = 20
+
+# 模糊比對的最低 Dice 相似度（「番加」對「番茄」為 0.33）
+MIN_SIMILARITY = 0.3
+
+# 出現在超過此比例詞條中的 bigram 不產生模糊候選
+COMMON_GRAM_RATIO = 0.02
+MIN_COMMON_GRAM_POSTING = 32
+
+# 頭尾補位字元，讓開頭與結尾的字也形成 bigram
+_BOUNDARY = '\x02'
+_END = '\x03'
+
+PREFIX = 'prefix'
+SUBSTRING = 'substring'
+FUZZY = 'fuzzy'
+
+
+class TypeaheadMatch(NamedTuple):
+    """搜尋結果"""
+    name: str
+    category: str
+    match: str        # prefix / substring / fuzzy
+    score: float      # 前綴與子字串為 1.0，模糊比對為 Dice 相似度
+
+
+class _TrieNode:
+    __slots__ = ('children', 'terms')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.terms = []
+
+
+def _bigrams(text: str) -> List[str]:
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def _padded_bigrams(text: str) -> FrozenSet[str]:
+    return frozenset(_bigrams(_BOUNDARY + text + _END))
+
+
+class TypeaheadIndex:
+    """
+    唯讀 typeahead 索引
+    names: 食材名稱 -> 分類（依目錄順序）；aliases: 食材名稱 -> 其他寫法（只收錄名稱在目錄中的）
+    """
+
+    def __init__(self, names: Mapping[str, str],
+                 aliases: Optional[Mapping[str, Iterable[str]]] = INGREDIENT_SYNONYMS):
+        self._entries: Tuple[Tuple[str, str], ...] = tuple(names.items())
+        self._categories = frozenset(names.values())
+        position = {name: i for i, (name, _) in enumerate(self._entries)}
+
+        # 詞條 = (正規化寫法, 食材位置)；同一寫法對應多個食材時保留第一個
+        term_entry: Dict[str, int] = {}
+        for name, entry in position.items():
+            term_entry.setdefault(normalize_name(name), entry)
+        for name, others in (aliases or {}).items():
+            if name in position:
+                for alias in others:
+                    term_entry.setdefault(normalize_name(alias), position[name])
+        term_entry.pop('', None)
+
+        # 詞條編號依（長度, 目錄順序）排序，trie 節點與倒排索引都沿用此順序
+        ordered = sorted(term_entry.items(), key=lambda item: (len(item[0]), item[1]))
+        self._keys: Tuple[str, ...] = tuple(key for key, _ in ordered)
+        self._term_entry: Tuple[int, ...] = tuple(entry for _, entry in ordered)
+
+        self._root = _TrieNode()
+        chars: Dict[str, set] = {}
+        grams: Dict[str, set] = {}
+        term_grams = []
+        for term, key in enumerate(self._keys):
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+                node.terms.append(term)
+                chars.setdefault(char, set()).add(term)
+            padded = _padded_bigrams(key)
+            term_grams.append(padded)
+            for gram in padded:
+                grams.setdefault(gram, set()).add(term)
+
+        self._freeze(self._root)
+        self._chars: Dict[str, FrozenSet[int]] = {char: frozenset(terms) for char, terms in chars.items()}
+        self._grams: Dict[str, FrozenSet[int]] = {gram: frozenset(terms) for gram, terms in grams.items()}
+        self._term_grams: Tuple[FrozenSet[str], ...] = tuple(term_grams)
+        self._common_posting = max(MIN_COMMON_GRAM_POSTING, int(len(self._keys) * COMMON_GRAM_RATIO))
+
+    @staticmethod
+    def _freeze(root: _TrieNode) -> None:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.terms = tuple(node.terms)
+            stack.extend(node.children.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def term_count(self) -> int:
+        """索引中的寫法數（名稱 + 同義詞）"""
+        return len(self._keys)
+
+    def search(self, query: str, category: str = '', limit: int = DEFAULT_LIMIT,
+               fuzzy: bool = True) -> List[TypeaheadMatch]:
+        """
+        依 前綴 > 子字串 > 模糊 取前 limit 筆
+        category 為空或不存在時搜尋全部分類（與 IngredientCatalog.entries_for 一致）
+        """
+        key = normalize_name(query)
+        if not key or limit <= 0:
+            return []
+        wanted = category if category in self._categories else ''
+
+        results: List[TypeaheadMatch] = []
+        seen = set()
+
+        def take(term: int, kind: str, score: float) -> bool:
+            entry = self._term_entry[term]
+            if entry in seen:
+                return False
+            name, entry_category = self._entries[entry]
+            if wanted and entry_category != wanted:
+                return False
+            seen.add(entry)
+            results.append(TypeaheadMatch(name, entry_category, kind, score))
+            return len(results) >= limit
+
+        # 1. 前綴：trie 節點的詞條已依長度排序，較短（較接近完整名稱）的先出現
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            for term in node.terms:
+                if take(term, PREFIX, 1.0):
+                    return results
+
+        # 2. 子字串：bigram 交集後驗證，依出現位置越前越好
+        candidates = self._substring_candidates(key)
+        hits = []
+        for term in candidates:
+            at = self._keys[term].find(key)
+            if at > 0:
+                hits.append((at, term))
+        hits.sort()
+        for _, term in hits:
+            if take(term, SUBSTRING, 1.0):
+                return results
+
+        # 3. 模糊：共享的補位 bigram 數 -> Dice 相似度
+        if fuzzy and len(key) >= 2:
+            query_grams = _padded_bigrams(key)
+            scored = []
+            for term in self._fuzzy_candidates(query_grams) - candidates:
+                grams = self._term_grams[term]
+                score = 2.0 * len(query_grams & grams) / (len(query_grams) + len(grams))
+                if score >= MIN_SIMILARITY:
+                    scored.append((-score, term))
+            scored.sort()
+            for negative, term in scored:
+                if take(term, FUZZY, round(-negative, 4)):
+                    return results
+
+        return results
+
+    def _fuzzy_candidates(self, query_grams: FrozenSet[str]) -> set:
+        """少見 bigram 的 posting 聯集；全部都是常見 bigram 時只用最少見的一個"""
+        postings = sorted((self._grams.get(gram, frozenset()) for gram in query_grams), key=len)
+        found = set(postings[0]) if postings else set()
+        for posting in postings[1:]:
+            if len(posting) > self._common_posting:
+                break
+            found.update(posting)
+        return found
+
+    def _substring_candidates(self, key: str) -> FrozenSet[int]:
+        if len(key) == 1:
+            return self._chars.get(key, frozenset())
+        postings = [self._grams.get(gram) for gram in set(_bigrams(key))]
+        if not all(postings):
+            return frozenset()
+        postings.sort(key=len)
+        return reduce(frozenset.intersection, postings)
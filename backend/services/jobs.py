@@ -0,0 +1,362 @@
+# backend/services/jobs.py
+
+"""
+非同步工作佇列
+POST 只負責排入佇列並回傳 job id，由背景工作執行緒處理；客戶端輪詢或長輪詢等待結果
+預設使用行程內佇列，可透過 JOB_BACKEND 換成 Redis 或自訂後端讓多個節點共用
+"""
+
+import base64
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKEND = os.environ.get('JOB_BACKEND', 'memory')
+JOB_QUEUE_DEPTH = int(os.environ.get('JOB_QUEUE_DEPTH', 100))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_TTL = float(os.environ.get('JOB_TTL', 3600))
+
+# 工作狀態
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+EXPIRED = 'expired'
+FINISHED_STATES = (SUCCEEDED, FAILED, EXPIRED)
+
+
+class QueueFullError(Exception):
+    """佇列已滿"""
+
+
+class JobBackend:
+    """
+    工作後端介面
+    job 為 dict：id / kind / status / created_at / started_at / finished_at / result / error
+    """
+
+    def enqueue(self, job: Dict[str, Any], payload: Any) -> None:
+        """排入佇列；佇列已滿時拋出 QueueFullError"""
+        raise NotImplementedError
+
+    def dequeue(self, timeout: float) -> Optional[Tuple[Dict[str, Any], Any]]:
+        """取出下一個工作 (job, payload)；逾時回傳 None"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """等待工作完成或逾時，回傳最新狀態"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] in FINISHED_STATES or time.time() >= deadline:
+                return job
+            time.sleep(0.2)
+
+    def depth(self) -> int:
+        raise NotImplementedError
+
+
+class InProcessJobBackend(JobBackend):
+    """行程內後端（單一行程；gunicorn 需使用單一 worker 多執行緒）"""
+
+    def __init__(self, max_depth: int = JOB_QUEUE_DEPTH, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max_depth)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._changed = threading.Condition()
+
+    def _expire(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in FINISHED_STATES and job['finished_at'] + self.ttl < now
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def enqueue(self, job, payload) -> None:
+        with self._changed:
+            self._expire()
+            try:
+                self._queue.put_nowait((job['id'], payload))
+            except queue.Full:
+                raise QueueFullError()
+            self._jobs[job['id']] = dict(job)
+
+    def dequeue(self, timeout):
+        try:
+            job_id, payload = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return self.get(job_id), payload
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields) -> None:
+        with self._changed:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+            self._changed.notify_all()
+
+    def wait(self, job_id, timeout):
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.time()
+                if job is None or job['status'] in FINISHED_STATES or remaining <= 0:
+                    return dict(job) if job else None
+                self._changed.wait(remaining)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+def _encode(value: Any) -> Any:
+    """JSON 編碼時保留 bytes"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {'__bytes__'}:
+            return base64.b64decode(value['__bytes__'])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+# 檢查佇列長度、寫入工作與排入佇列在 Redis 端一次完成，多個節點同時排入也不會超過上限
+_REDIS_ENQUEUE = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[4])
+redis.call('SET', KEYS[3], ARGV[3], 'EX', ARGV[4])
+redis.call('RPUSH', KEYS[1], ARGV[5])
+return 1
+"""
+
+
+class RedisJobBackend(JobBackend):
+    """Redis 後端：多個節點共用同一個佇列與工作狀態（需安裝 redis 套件）"""
+
+    def __init__(self, url: Optional[str] = None, max_depth: int = JOB_QUEUE_DEPTH,
+                 ttl: float = JOB_TTL, prefix: str = 'fridge:jobs'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url or os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+        self.max_depth = max_depth
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._enqueue = self._redis.register_script(_REDIS_ENQUEUE)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _payload_key(self, job_id: str) -> str:
+        return f"{self.prefix}:payload:{job_id}"
+
+    @property
+    def _queue_key(self) -> str:
+        return f"{self.prefix}:queue"
+
+    def enqueue(self, job, payload) -> None:
+        accepted = self._enqueue(
+            keys=[self._queue_key, self._job_key(job['id']), self._payload_key(job['id'])],
+            args=[self.max_depth, json.dumps(job), json.dumps(_encode(payload)), self.ttl, job['id']],
+        )
+        if not accepted:
+            raise QueueFullError()
+
+    def dequeue(self, timeout):
+        item = self._redis.blpop([self._queue_key], timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job_id = item[1].decode('utf-8')
+        raw = self._redis.get(self._payload_key(job_id))
+        job = self.get(job_id)
+        if raw is None or job is None:
+            return None
+        self._redis.delete(self._payload_key(job_id))
+        return job, _decode(json.loads(raw))
+
+    def get(self, job_id):
+        raw = self._redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id, **fields) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self._redis.set(self._job_key(job_id), json.dumps(job), ex=self.ttl)
+
+    def depth(self) -> int:
+        return int(self._redis.llen(self._queue_key))
+
+
+def create_backend(name: str = JOB_BACKEND) -> JobBackend:
+    """依設定建立後端：memory、redis，或 'package.module:ClassName'"""
+    if name == 'memory':
+        return InProcessJobBackend()
+    if name == 'redis':
+        return RedisJobBackend()
+
+    module_name, _, class_name = name.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class JobManager:
+    """工作管理：依 kind 分派處理函式，背景執行緒從後端取出工作執行"""
+
+    def __init__(self, backend: JobBackend, workers: int = JOB_WORKERS, ttl: float = JOB_TTL):
+        self.backend = backend
+        self.workers = workers
+        self.ttl = ttl
+        self._handlers: Dict[str, Callable[[Any], Any]] = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'expired': 0,
+            'queue_seconds': 0.0, 'run_seconds': 0.0,
+        }
+
+    def register_handler(self, kind: str, handler: Callable[[Any], Any]) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """啟動背景執行緒（重複呼叫無作用）"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind: str, payload: Any) -> Dict[str, Any]:
+        """排入工作；佇列已滿時拋出 QueueFullError"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        self.start()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': QUEUED,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+        try:
+            self.backend.enqueue(job, payload)
+        except QueueFullError:
+            self._count('rejected')
+            raise
+        self._count('submitted')
+        return job
+
+    def get(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """取得工作狀態；wait > 0 時最多等待該秒數直到完成"""
+        job = self.backend.wait(job_id, wait) if wait > 0 else self.backend.get(job_id)
+        return _with_timings(job) if job else None
+
+    def _count(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[field] += amount
+
+    def _worker_loop(self) -> None:
+        while True:
+            try:
+                item = self.backend.dequeue(timeout=5)
+            except Exception as e:
+                logger.error(f"Job dequeue error: {e}")
+                time.sleep(1)
+                continue
+            if item is None:
+                continue
+            self._run(*item)
+
+    def _run(self, job: Dict[str, Any], payload: Any) -> None:
+        started = time.time()
+        if started - job['created_at'] > self.ttl:
+            # 排隊過久，客戶端多半已放棄輪詢
+            self.backend.update(job['id'], status=EXPIRED, error='Job expired in queue', finished_at=started)
+            self._count('expired')
+            return
+
+        self.backend.update(job['id'], status=RUNNING, started_at=started)
+        self._count('queue_seconds', started - job['created_at'])
+
+        try:
+            result = self._handlers[job['kind']](payload)
+            self.backend.update(job['id'], status=SUCCEEDED, result=result, finished_at=time.time())
+            self._count('succeeded')
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            self.backend.update(job['id'], status=FAILED, error=str(e), finished_at=time.time())
+            self._count('failed')
+        self._count('run_seconds', time.time() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats['succeeded'] + stats['failed']
+        stats['avg_queue_seconds'] = round(stats['queue_seconds'] / finished, 4) if finished else 0.0
+        stats['avg_run_seconds'] = round(stats['run_seconds'] / finished, 4) if finished else 0.0
+        stats['queue_seconds'] = round(stats['queue_seconds'], 4)
+        stats['run_seconds'] = round(stats['run_seconds'], 4)
+        try:
+            stats['queue_depth'] = self.backend.depth()
+        except Exception as e:
+            stats['queue_depth'] = None
+            stats['backend_error'] = str(e)
+        stats['workers'] = self.workers
+        return stats
+
+
+def _with_timings(job: Dict[str, Any]) -> Dict[str, Any]:
+    """加上排隊與執行時間（毫秒）"""
+    job = dict(job)
+    now = time.time()
+    started = job.get('started_at')
+    finished = job.get('finished_at')
+    job['timings'] = {
+        'queued_ms': round(((started or now) - job['created_at']) * 1000, 1),
+        'run_ms': round(((finished or now) - started) * 1000, 1) if started else None,
+        'total_ms': round(((finished or now) - job['created_at']) * 1000, 1),
+    }
+    return job
+
+
+job_manager = JobManager(create_backend())
+metrics.register('jobs', job_manager.stats)
@@ -0,0 +1,79 @@
+# backend/services/json_stream.py
+
+"""
+增量 JSON 解析
+LLM 串流輸出時逐段餵入文字，頂層物件中指定陣列（例如 recipes）的每個元素一完整就解析產出，
+不必等待整份 JSON 結束
+"""
+
+import json
+from typing import Any, List, Optional
+
+
+class IncrementalArrayParser:
+    """
+    從串流文字中取出 {"<key>": [ {...}, {...} ]} 陣列中的物件
+    只追蹤字串、跳脫字元與括號深度，每個字元只掃描一次
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._buffer = ''
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.count = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """餵入新的文字片段，回傳這次完成的陣列元素"""
+        self._buffer += text
+        items: List[Any] = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # 頂層物件中的字串（可能是鍵）
+                        self._last_string = buffer[self._string_start + 1:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                if (char == '[' and self._array_depth is None and self._stack == ['{']
+                        and self._last_string == self.key):
+                    self._array_depth = len(self._stack) + 1
+                elif char == '{' and self._array_depth is not None and len(self._stack) == self._array_depth:
+                    self._item_start = i
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if (char == '}' and self._item_start is not None
+                        and len(self._stack) == self._array_depth):
+                    items.append(json.loads(buffer[self._item_start:i + 1]))
+                    self._item_start = None
+                    self.count += 1
+                elif char == ']' and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                    self._array_depth = None
+
+        self._pos = len(buffer)
+        # 不在物件中時丟棄已處理的文字，避免緩衝區持續成長
+        if self._item_start is None and not self._in_string:
+            self._buffer = ''
+            self._pos = 0
+        return items
@@ -0,0 +1,433 @@
+# backend/services/llm_gateway.py
+
+"""
+共用 LLM 閘道
+所有 OpenAI 呼叫都經過這裡：
+- 共用一個 client 與 HTTP 連線池（keep-alive）
+- 每次呼叫有截止時間（含重試與排隊等待）
+- 429 / 5xx / 逾時 / 連線錯誤以指數退避加抖動重試，優先遵守 Retry-After
+- 自適應併發上限（AIMD）：延遲低於目標時逐步放寬，延遲過高或遇到 429 時收緊
+- 斷路器：連續失敗達門檻後一段時間內直接失敗，之後放行單一探測請求
+- 依模型統計延遲直方圖、token 用量與錯誤數（/api/metrics 的 llm_gateway）
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+import openai
+from openai import OpenAI
+
+from services import metrics
+from services.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))
+LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 8))
+LLM_POOL_CONNECTIONS = int(os.environ.get('LLM_POOL_CONNECTIONS', 64))
+LLM_MIN_CONCURRENCY = int(os.environ.get('LLM_MIN_CONCURRENCY', 2))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 32))
+LLM_TARGET_LATENCY = float(os.environ.get('LLM_TARGET_LATENCY', 20))
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', 30))
+
+
+class GatewayError(Exception):
+    """閘道本身拒絕或放棄的呼叫"""
+
+
+class CircuitOpenError(GatewayError):
+    """斷路器開啟中，直接失敗"""
+
+
+class GatewayTimeout(GatewayError, TimeoutError):
+    """超過呼叫截止時間（排隊或重試中）"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429、5xx、逾時與連線錯誤可重試；其他 4xx 為請求本身的問題"""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """連續失敗達門檻即開啟；冷卻後進入半開，只放行一個探測請求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """放行的請求沒有送達上游或沒有結果（排隊逾時、串流提前關閉）：不改變狀態，讓下一個請求重新探測"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 併發上限
+    成功且延遲低於目標：上限 +1/上限（約每輪加 1）；延遲過高：×0.9；429：×0.5
+    """
+
+    def __init__(self, minimum: int = LLM_MIN_CONCURRENCY, maximum: int = LLM_MAX_CONCURRENCY,
+                 target_latency: float = LLM_TARGET_LATENCY):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target_latency = target_latency
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._changed = threading.Condition()
+        self._waiters: Deque[object] = deque()
+
+    def acquire(self, timeout: float) -> bool:
+        """依到達順序（FIFO）取得名額，避免新請求插隊造成排隊中的請求長尾延遲"""
+        deadline = time.monotonic() + timeout
+        ticket = object()
+        with self._changed:
+            self._waiters.append(ticket)
+            try:
+                while self._waiters[0] is not ticket or self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._changed.wait(remaining)
+                self.in_flight += 1
+                return True
+            finally:
+                self._waiters.remove(ticket)
+                self._changed.notify_all()
+
+    def release(self) -> None:
+        with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._changed:
+            if latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit * 0.9)
+            self._changed.notify_all()
+
+    def on_overload(self) -> None:
+        with self._changed:
+            self.limit = max(self.minimum, self.limit * 0.5)
+
+
+class ModelStats:
+    """單一模型的延遲、token 與錯誤統計"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.counts = {
+            'calls': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'rate_limited': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0,
+        }
+
+    def add(self, **amounts) -> None:
+        with self._lock:
+            for field, amount in amounts.items():
+                self.counts[field] += amount
+
+    def record_usage(self, usage) -> None:
+        if usage is not None:
+            self.add(
+                prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counts)
+        stats['latency'] = self.latency.snapshot()
+        return stats
+
+
+class GatewayStream:
+    """
+    串流回應包裝：期間持續佔用一個併發名額，讀完、出錯或 close() 時釋放（只釋放一次）
+    提前關閉不計入上游失敗；close() 可由其他執行緒呼叫以取消進行中的串流
+    """
+
+    def __init__(self, gateway: 'LLMGateway', stats: ModelStats, response, started: float):
+        self._gateway = gateway
+        self._stats = stats
+        self._response = response
+        self._iterator = iter(response)
+        self._started = started
+        self._released = False
+        self._lock = threading.Lock()
+
+    def _release(self) -> bool:
+        """標記為已釋放；已被釋放過（例如被其他執行緒關閉）時回傳 False"""
+        with self._lock:
+            if self._released:
+                return False
+            self._released = True
+            return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._released:
+            raise StopIteration
+        try:
+            chunk = next(self._iterator)
+        except StopIteration:
+            if self._release():
+                self._gateway._finish(self._stats, self._started)
+            raise
+        except Exception:
+            # 被 close() 取消時讀取端也會出錯，不計入上游失敗
+            if self._release():
+                self._gateway.limiter.release()
+                self._gateway.breaker.record_failure()
+                self._stats.add(failed=1)
+            raise
+        self._stats.record_usage(getattr(chunk, 'usage', None))
+        return chunk
+
+    def close(self) -> None:
+        if not self._release():
+            return
+        self._gateway.limiter.release()
+        # 提前關閉或被取消（對沖）沒有上游結果，半開時需釋放探測名額
+        self._gateway.breaker.release_probe()
+        close = getattr(self._response, 'close', None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMGateway:
+    """共用 LLM 閘道（執行緒安全）"""
+
+    def __init__(self, client=None, timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 limiter: Optional[AdaptiveLimiter] = None, breaker: Optional[CircuitBreaker] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.client = client if client is not None else self._create_client(timeout)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._models: Dict[str, ModelStats] = {}
+        self._rejected = {'circuit_open': 0, 'queue_timeout': 0}
+
+    @staticmethod
+    def _create_client(timeout: float):
+        """單一 client 共用 HTTP 連線池；重試由閘道處理，關閉 SDK 內建重試"""
+        options: Dict[str, Any] = {'timeout': timeout}
+        try:
+            import httpx
+
+            options = {
+                'timeout': httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT),
+                'http_client': httpx.Client(limits=httpx.Limits(
+                    max_connections=LLM_POOL_CONNECTIONS,
+                    max_keepalive_connections=LLM_POOL_CONNECTIONS
+                )),
+            }
+        except ImportError:
+            logger.warning("httpx not installed, using the OpenAI SDK default connection pool")
+
+        try:
+            return OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0, **options)
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI Client: {e}")
+            return None
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def _model(self, model: str) -> ModelStats:
+        with self._lock:
+            stats = self._models.get(model)
+            if stats is None:
+                stats = self._models[model] = ModelStats()
+            return stats
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """full jitter：0 ~ min(上限, base × 2^attempt)；有 Retry-After 時以其為準"""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def chat(self, model: str, messages, timeout: Optional[float] = None, stream: bool = False, **kwargs):
+        """
+        呼叫 chat.completions.create
+        timeout 為整體截止時間（含排隊與重試）；stream=True 時回傳逐塊產出的迭代器，
+        串流期間持續佔用一個併發名額，讀完或關閉時釋放
+        """
+        if self.client is None:
+            raise GatewayError('OpenAI client is not configured')
+
+        stats = self._model(model)
+        deadline = time.monotonic() + (timeout or self.timeout)
+        if stream:
+            kwargs.setdefault('stream_options', {'include_usage': True})
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow():
+                with self._lock:
+                    self._rejected['circuit_open'] += 1
+                raise CircuitOpenError(f'Circuit open for LLM upstream ({model})')
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.limiter.acquire(remaining):
+                self.breaker.release_probe()
+                with self._lock:
+                    self._rejected['queue_timeout'] += 1
+                raise GatewayTimeout(f'LLM call deadline exceeded ({model})')
+
+            stats.add(calls=1)
+            started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model, messages=messages, stream=stream,
+                    timeout=max(0.1, deadline - started), **kwargs
+                )
+            except Exception as e:
+                self.limiter.release()
+                retryable = is_retryable(e)
+                if getattr(e, 'status_code', None) == 429:
+                    stats.add(rate_limited=1)
+                    self.limiter.on_overload()
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # 請求本身的錯誤（4xx）代表上游正常
+                    self.breaker.record_success()
+
+                delay = self._backoff(attempt, e) if retryable else 0
+                if not retryable or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    stats.add(failed=1)
+                    raise
+                attempt += 1
+                stats.add(retries=1)
+                logger.warning(f"LLM call failed ({model}), retry {attempt} in {delay:.2f}s: {e}")
+                self._sleep(delay)
+                continue
+
+            if stream:
+                return GatewayStream(self, stats, response, started)
+
+            self._finish(stats, started)
+            stats.record_usage(getattr(response, 'usage', None))
+            return response
+
+    def _finish(self, stats: ModelStats, started: float) -> None:
+        latency = time.monotonic() - started
+        self.limiter.release()
+        self.limiter.on_success(latency)
+        self.breaker.record_success()
+        stats.latency.observe(latency)
+        stats.add(succeeded=1)
+
+    def call_count(self) -> int:
+        """送往上游的呼叫總數（含重試，各模型合計）"""
+        with self._lock:
+            selected = list(self._models.values())
+        total = 0
+        for stats in selected:
+            with stats._lock:
+                total += stats.counts['calls']
+        return total
+
+    def token_usage(self, models) -> int:
+        """指定模型累計的 prompt + completion token 數"""
+        with self._lock:
+            selected = [self._models[model] for model in models if model in self._models]
+        total = 0
+        for stats in selected:
+            with stats._lock:
+                total += stats.counts['prompt_tokens'] + stats.counts['completion_tokens']
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = dict(self._models)
+            rejected = dict(self._rejected)
+        return {
+            'available': self.available,
+            'circuit': self.breaker.state,
+            'circuit_trips': self.breaker.trips,
+            'concurrency_limit': round(self.limiter.limit, 2),
+            'in_flight': self.limiter.in_flight,
+            'rejected': rejected,
+            'models': {model: model_stats.snapshot() for model, model_stats in models.items()},
+        }
+
+
+llm_gateway = LLMGateway()
+metrics.register('llm_gateway', llm_gateway.stats)
@@ -0,0 +1,94 @@
+# backend/services/metrics.py
+
+"""
+服務指標註冊表
+各模組註冊自己的統計函式，由 /api/metrics 統一輸出
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+MetricsProvider = Callable[[], Dict[str, Any]]
+
+_providers: Dict[str, MetricsProvider] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, provider: MetricsProvider) -> None:
+    """註冊指標提供者（同名會覆蓋）"""
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Any]:
+    """取得所有已註冊指標的快照"""
+    with _lock:
+        providers = dict(_providers)
+
+    result: Dict[str, Any] = {}
+    for name, provider in providers.items():
+        try:
+            result[name] = provider()
+        except Exception as e:
+            result[name] = {'error': str(e)}
+    return result
+
+
+# 延遲直方圖預設區間上限（秒）
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+class LatencyHistogram:
+    """固定區間的延遲直方圖，百分位數以區間上限估計"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._total = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._total += 1
+            self._sum += seconds
+
+    @property
+    def count(self) -> int:
+        return self._total
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """百分位數所在區間的上限；落在最後一個區間（超過最大上限）時回傳 None"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._total
+        if not total:
+            return 0.0
+        rank = fraction * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._total
+            seconds = self._sum
+        labels = [f"le_{bound}" for bound in self.buckets] + ['le_inf']
+        return {
+            'count': total,
+            'avg_seconds': round(seconds / total, 4) if total else 0.0,
+            'p50_seconds': self.percentile(0.5),
+            'p95_seconds': self.percentile(0.95),
+            'p99_seconds': self.percentile(0.99),
+            'buckets': dict(zip(labels, counts)),
+        }
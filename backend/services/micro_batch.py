@@ -0,0 +1,164 @@
+# backend/services/micro_batch.py
+
+"""
+微批次（micro-batching）
+在短時間窗口內收集獨立請求，合併成一次上游呼叫，再把結果分回各個等待中的請求
+- 窗口從第一個請求進入時起算，滿 max_batch 筆立即送出
+- 批次呼叫失敗，或某個請求的結果缺漏 / 格式錯誤時，該請求在自己的執行緒中改為單獨呼叫
+- 統計吞吐量、批次大小、排隊延遲與每個請求平均使用的 token 數
+以 {PREFIX}_BATCH_WINDOW_MS（0 為停用）與 {PREFIX}_BATCH_MAX 設定
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from services import metrics
+from services.metrics import LatencyHistogram
+
+# 排隊延遲以毫秒級區間統計
+QUEUE_DELAY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1)
+
+# 批次結果中表示「改為單獨呼叫」
+FALLBACK = object()
+
+
+class _Pending:
+    __slots__ = ('item', 'future', 'enqueued')
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    run_batch(items) 回傳與 items 等長的結果列表，None 表示該項需要單獨呼叫
+    run_single(item) 為單獨呼叫（批次只有一筆時也直接使用）
+    token_counter 回傳上游累計 token 數，用於計算每個請求的平均 token 數
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[Any]], List[Optional[Any]]],
+                 run_single: Callable[[Any], Any], window: float, max_batch: int,
+                 token_counter: Optional[Callable[[], int]] = None, max_workers: int = 16):
+        self.name = name
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.window = window
+        self.max_batch = max_batch
+        self.token_counter = token_counter
+        self.queue_delay = LatencyHistogram(QUEUE_DELAY_BUCKETS)
+        self._items: List[_Pending] = []
+        self._changed = threading.Condition()
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0, 'completed': 0, 'batches': 0, 'batched_requests': 0, 'singles': 0,
+            'fallbacks': 0, 'batch_errors': 0,
+        }
+        self._first_request: Optional[float] = None
+        self._tokens_at_start = token_counter() if token_counter else 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}-batch')
+        self._collector = threading.Thread(target=self._collect, name=f'{name}-batcher', daemon=True)
+        self._collector.start()
+
+    def _count(self, **amounts) -> None:
+        with self._lock:
+            for field, amount in amounts.items():
+                self._stats[field] += amount
+
+    def submit(self, item: Any) -> Any:
+        """加入目前的窗口並等待結果；需要時改為單獨呼叫"""
+        with self._lock:
+            self._stats['requests'] += 1
+            if self._first_request is None:
+                self._first_request = time.monotonic()
+
+        pending = _Pending(item)
+        with self._changed:
+            self._items.append(pending)
+            self._changed.notify()
+
+        result = pending.future.result()
+        if result is FALLBACK:
+            result = self.run_single(item)
+        self._count(completed=1)
+        return result
+
+    def _collect(self) -> None:
+        while True:
+            with self._changed:
+                while not self._items:
+                    self._changed.wait()
+                deadline = self._items[0].enqueued + self.window
+                while len(self._items) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                batch = self._items[:self.max_batch]
+                del self._items[:self.max_batch]
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        now = time.monotonic()
+        for pending in batch:
+            self.queue_delay.observe(now - pending.enqueued)
+
+        if len(batch) == 1:
+            self._count(singles=1)
+            batch[0].future.set_result(FALLBACK)
+            return
+
+        self._count(batches=1, batched_requests=len(batch))
+        try:
+            results = list(self.run_batch([pending.item for pending in batch]))
+        except Exception:
+            self._count(batch_errors=1)
+            results = []
+
+        fallbacks = 0
+        for number, pending in enumerate(batch):
+            result = results[number] if number < len(results) else None
+            if result is None:
+                fallbacks += 1
+                pending.future.set_result(FALLBACK)
+            else:
+                pending.future.set_result(result)
+        self._count(fallbacks=fallbacks)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            first = self._first_request
+        elapsed = time.monotonic() - first if first else 0.0
+        stats['window_ms'] = round(self.window * 1000, 1)
+        stats['max_batch'] = self.max_batch
+        stats['avg_batch_size'] = round(stats['batched_requests'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['fallback_rate'] = (
+            round(stats['fallbacks'] / stats['batched_requests'], 4) if stats['batched_requests'] else 0.0
+        )
+        stats['requests_per_second'] = round(stats['completed'] / elapsed, 3) if elapsed > 0 else 0.0
+        if self.token_counter:
+            tokens = self.token_counter() - self._tokens_at_start
+            stats['tokens_per_request'] = round(tokens / stats['completed'], 1) if stats['completed'] else 0.0
+        stats['queue_delay'] = self.queue_delay.snapshot()
+        return stats
+
+
+def create_micro_batcher(name: str, env_prefix: str, run_batch: Callable[[List[Any]], List[Optional[Any]]],
+                         run_single: Callable[[Any], Any], default_max_batch: int = 8,
+                         token_counter: Optional[Callable[[], int]] = None) -> Optional[MicroBatcher]:
+    """
+    依環境變數 {PREFIX}_BATCH_WINDOW_MS、{PREFIX}_BATCH_MAX 建立並註冊指標 {name}_batcher；
+    窗口為 0 或批次上限小於 2 時回傳 None（不批次）
+    """
+    window_ms = float(os.environ.get(f'{env_prefix}_BATCH_WINDOW_MS', 0))
+    max_batch = int(os.environ.get(f'{env_prefix}_BATCH_MAX', default_max_batch))
+    if window_ms <= 0 or max_batch < 2:
+        return None
+    batcher = MicroBatcher(name, run_batch, run_single, window_ms / 1000, max_batch, token_counter)
+    metrics.register(f'{name}_batcher', batcher.stats)
+    return batcher
@@ -0,0 +1,245 @@
+# backend/services/model_router.py
+
+"""
+分層模型路由
+- 先以較快的模型層級生成，輸出未通過驗證（或呼叫失敗）才升級到下一層
+- 對沖（hedging）：同一層級的請求超過觀察到的 p95 延遲仍未完成時，再送出一個相同請求，
+  取先完成者，並關閉另一個請求的串流（取消上游生成）
+- 各層級的 p50 / p99 延遲、升級率與對沖次數輸出到 /api/metrics
+以 {PREFIX}_MODEL_TIERS 設定層級（'gpt-4o-mini,gpt-4o:1200'，冒號後為 max_tokens），
+{PREFIX}_HEDGE 設定對沖：off（預設）/ p95 / 固定秒數；對沖會重複送出付費的 LLM 請求，需明確啟用
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from services import metrics
+from services.llm_gateway import LLMGateway, llm_gateway
+from services.metrics import LatencyHistogram
+
+# 層級延遲用較細的區間，對沖門檻才不會被區間上限放大太多
+ROUTER_LATENCY_BUCKETS = (0.25, 0.5, 0.75, 1, 1.5, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 60, 90)
+
+# 單次呼叫輸出 token 上限
+MAX_OUTPUT_TOKENS = 16000
+
+
+class Tier(NamedTuple):
+    """模型層級"""
+    model: str
+    max_tokens: int
+
+
+def parse_tiers(spec: str, default_max_tokens: int) -> List[Tier]:
+    """'gpt-4o-mini,gpt-4o:1200' → 依序的層級；未指定 max_tokens 時使用預設值"""
+    tiers = []
+    for item in spec.split(','):
+        model, _, max_tokens = item.strip().partition(':')
+        if model:
+            tiers.append(Tier(model, int(max_tokens) if max_tokens else default_max_tokens))
+    if not tiers:
+        raise ValueError(f"No model tiers in {spec!r}")
+    return tiers
+
+
+class StreamCancelled(Exception):
+    """對沖中落敗的請求被取消"""
+
+
+class HedgePolicy:
+    """
+    何時送出對沖請求
+    mode：off（不對沖）、p95（該層級觀察到的 p95，樣本不足時不對沖）或固定秒數
+    """
+
+    def __init__(self, mode: str = 'off', min_samples: int = 20, min_delay: float = 1.0):
+        self.mode = mode.strip().lower() or 'off'
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        if self.mode not in ('off', 'p95'):
+            float(self.mode)  # 格式錯誤時在建立時就拋出 ValueError
+
+    def delay(self, latency: LatencyHistogram) -> Optional[float]:
+        """對沖前等待的秒數；None 表示不對沖"""
+        if self.mode == 'off':
+            return None
+        if self.mode != 'p95':
+            return max(self.min_delay, float(self.mode))
+        if latency.count < self.min_samples:
+            return None
+        p95 = latency.percentile(0.95)
+        # 超過最大區間時無法估計，不對沖
+        return None if p95 is None else max(self.min_delay, p95)
+
+
+class TierStats:
+    """單一層級的路由統計"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram(ROUTER_LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self.counts = {
+            'calls': 0, 'served': 0, 'escalated_invalid': 0, 'escalated_error': 0,
+            'errors': 0, 'hedged': 0, 'hedge_wins': 0, 'cancelled': 0,
+        }
+
+    def add(self, **amounts) -> None:
+        with self._lock:
+            for field, amount in amounts.items():
+                self.counts[field] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counts)
+        escalated = stats['escalated_invalid'] + stats['escalated_error']
+        stats['escalation_rate'] = round(escalated / stats['calls'], 4) if stats['calls'] else 0.0
+        stats['hedge_rate'] = round(stats['hedged'] / stats['calls'], 4) if stats['calls'] else 0.0
+        stats['p50_seconds'] = self.latency.percentile(0.5)
+        stats['p99_seconds'] = self.latency.percentile(0.99)
+        stats['latency'] = self.latency.snapshot()
+        return stats
+
+
+class ModelRouter:
+    """依層級生成並驗證，必要時對沖或升級"""
+
+    def __init__(self, tiers: List[Tier], hedge: HedgePolicy, gateway: LLMGateway = llm_gateway,
+                 max_workers: int = 32):
+        self.tiers = tiers
+        self.hedge = hedge
+        self.gateway = gateway
+        self.tier_stats = {tier.model: TierStats() for tier in tiers}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-router')
+
+    def complete(self, messages, parse: Callable[[str], Any], token_scale: float = 1.0,
+                 **kwargs) -> Tuple[Any, Tier]:
+        """
+        依序嘗試各層級，回傳 (parse 後的結果, 提供結果的層級)
+        parse 拋出 ValueError 視為驗證失敗；最後一層仍失敗時拋出該例外
+        token_scale 放大各層級的 max_tokens（一次請求包含多組查詢時使用）
+        """
+        for number, tier in enumerate(self.tiers):
+            stats = self.tier_stats[tier.model]
+            last = number == len(self.tiers) - 1
+            stats.add(calls=1)
+            call_kwargs = dict(kwargs, max_tokens=min(MAX_OUTPUT_TOKENS, int(tier.max_tokens * token_scale)))
+            try:
+                content = self._hedged(tier, stats, messages, call_kwargs)
+            except Exception:
+                stats.add(errors=1)
+                if last:
+                    raise
+                stats.add(escalated_error=1)
+                continue
+
+            try:
+                value = parse(content)
+            except ValueError:
+                if last:
+                    raise
+                stats.add(escalated_invalid=1)
+                continue
+            stats.add(served=1)
+            return value, tier
+        raise RuntimeError('unreachable')
+
+    def record(self, tier: Tier, seconds: Optional[float] = None, outcome: str = 'served') -> None:
+        """由呼叫端自行串流時回報結果（outcome：served / escalated_invalid / escalated_error / errors）"""
+        stats = self.tier_stats[tier.model]
+        stats.add(calls=1)
+        stats.add(**{outcome: 1})
+        if outcome == 'escalated_error':
+            stats.add(errors=1)
+        if seconds is not None:
+            stats.latency.observe(seconds)
+
+    def _attempt(self, tier: Tier, messages, kwargs: Dict[str, Any], streams: List, cancelled: threading.Event) -> str:
+        """以串流呼叫一次並組合完整內容；串流放進 streams 讓對沖的另一方可以關閉它"""
+        stream = self.gateway.chat(tier.model, messages, stream=True, **kwargs)
+        streams.append(stream)
+        parts = []
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    raise StreamCancelled()
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+        except Exception:
+            if cancelled.is_set():
+                raise StreamCancelled()
+            raise
+        finally:
+            stream.close()
+        return ''.join(parts)
+
+    def _hedged(self, tier: Tier, stats: TierStats, messages, kwargs: Dict[str, Any]) -> str:
+        started = time.monotonic()
+        delay = self.hedge.delay(stats.latency)
+        if delay is None:
+            content = self._attempt(tier, messages, kwargs, [], threading.Event())
+            stats.latency.observe(time.monotonic() - started)
+            return content
+
+        attempts = []
+
+        def launch():
+            streams: List = []
+            cancelled = threading.Event()
+            future = self._executor.submit(self._attempt, tier, messages, kwargs, streams, cancelled)
+            attempts.append((future, streams, cancelled))
+            return future
+
+        primary = launch()
+        done, _ = wait([primary], timeout=delay)
+        if not done:
+            stats.add(hedged=1)
+            launch()
+
+        pending = {future for future, _, _ in attempts}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                # 取消落敗者：設定旗標並關閉其串流，上游停止生成
+                for other, streams, cancelled in attempts:
+                    if other is not future and not other.done():
+                        cancelled.set()
+                        for stream in streams:
+                            stream.close()
+                        stats.add(cancelled=1)
+                if future is not primary:
+                    stats.add(hedge_wins=1)
+                stats.latency.observe(time.monotonic() - started)
+                return future.result()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'tiers': [tier.model for tier in self.tiers],
+            'hedge': self.hedge.mode,
+            'by_tier': {model: stats.snapshot() for model, stats in self.tier_stats.items()},
+        }
+
+
+def create_router(name: str, env_prefix: str, default_tiers: str, default_max_tokens: int) -> ModelRouter:
+    """
+    依環境變數 {PREFIX}_MODEL_TIERS、{PREFIX}_HEDGE、{PREFIX}_HEDGE_MIN_SAMPLES、{PREFIX}_HEDGE_MIN_DELAY 建立，
+    並註冊指標 {name}_router
+    """
+    router = ModelRouter(
+        parse_tiers(os.environ.get(f'{env_prefix}_MODEL_TIERS', default_tiers), default_max_tokens),
+        HedgePolicy(
+            os.environ.get(f'{env_prefix}_HEDGE', 'off'),
+            min_samples=int(os.environ.get(f'{env_prefix}_HEDGE_MIN_SAMPLES', 20)),
+            min_delay=float(os.environ.get(f'{env_prefix}_HEDGE_MIN_DELAY', 1.0)),
+        )
+    )
+    metrics.register(f'{name}_router', router.stats)
+    return router
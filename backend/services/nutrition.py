@@ -0,0 +1,266 @@
+# backend/services/nutrition.py
+
+"""
+本地營養資料庫
+- 資料來源：隨程式發佈的 data/nutrition.csv（每 100 g 可食部分的約略值，unit_grams 為一個計數單位的重量）
+- 欄式儲存：營養素 × 食材 的 float32 矩陣，每種營養素是一段連續記憶體
+  第一次載入時轉成 .npy（檔名含 CSV 雜湊），之後以 mmap 開啟，多個 worker 共用作業系統的 page cache
+- 以標準食材 id（標準名稱）查詢為 O(1)（名稱 -> 欄位位置的雜湊表）
+- 批次計算：多道食譜的食材攤平成 (食譜, 食材欄位, 克數) 三個陣列，每種營養素一次 bincount 乘加
+numpy 未安裝時不啟用（create_nutrition_table 回傳 None）
+"""
+
+import csv
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 未安裝時不提供營養資料
+    np = None
+
+from services import metrics
+from services.ingredient_normalizer import IngredientNormalizer, ingredient_normalizer
+
+logger = logging.getLogger(__name__)
+
+NUTRITION_CSV_PATH = os.environ.get('NUTRITION_CSV_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'nutrition.csv'
+)
+# 轉換後 .npy 的存放目錄（需可寫入；多個 worker 共用同一個檔案）
+NUTRITION_CACHE_DIR = os.environ.get('NUTRITION_CACHE_DIR', '') or tempfile.gettempdir()
+
+# 營養素欄位與單位（每 100 g）
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sodium')
+NUTRIENT_UNITS = {'calories': 'kcal', 'protein': 'g', 'carbs': 'g', 'fat': 'g', 'fiber': 'g', 'sodium': 'mg'}
+UNIT_GRAMS_ROW = len(NUTRIENTS)
+
+# 重量／容量單位 -> 克（液體以密度 1 估算）
+WEIGHT_UNITS = {
+    'g': 1.0, '克': 1.0, '公克': 1.0, 'kg': 1000.0, '公斤': 1000.0, '斤': 600.0, '兩': 37.5,
+    'ml': 1.0, 'cc': 1.0, '毫升': 1.0, 'l': 1000.0, '公升': 1000.0,
+    '大匙': 15.0, '湯匙': 15.0, '茶匙': 5.0, '小匙': 5.0, '杯': 240.0, '碗': 200.0,
+}
+# 計數單位：克數 = 數量 × 該食材的 unit_grams；沒有單位的純數字（含 JSON 數值）無法判斷是克還是個數，不計入
+COUNT_UNITS = frozenset(['個', '顆', '根', '瓣', '片', '條', '隻', '塊', '把', '粒', '份', '尾', '朵', '株', '包'])
+
+_CHINESE_NUMBERS = {'半': 0.5, '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+_AMOUNT = re.compile(
+    r'^(?P<number>\d+(?:\.\d+)?(?:/\d+)?|[半一二兩三四五六七八九十])'
+    r'(?:[-~～](?P<upper>\d+(?:\.\d+)?))?(?P<unit>[^\d]*)$'
+)
+
+
+class Amount(NamedTuple):
+    """解析後的份量；unit_grams 為 None 表示計數單位（需乘上食材的 unit_grams）"""
+    quantity: float
+    unit_grams: Optional[float]
+
+
+@lru_cache(maxsize=4096)
+def parse_amount(text: str) -> Optional[Amount]:
+    """
+    解析「2個」「200g」「1/4顆」「2-3大匙」「半碗」等份量；「適量」「少許」、沒有單位或無法辨識的單位回傳 None
+    範圍取中間值
+    """
+    match = _AMOUNT.match(re.sub(r'\s+', '', str(text or '')).lower())
+    if not match:
+        return None
+    number = match.group('number')
+    if number in _CHINESE_NUMBERS:
+        quantity = float(_CHINESE_NUMBERS[number])
+    elif '/' in number:
+        numerator, denominator = number.split('/')
+        if not float(denominator):
+            return None
+        quantity = float(numerator) / float(denominator)
+    else:
+        quantity = float(number)
+    if match.group('upper'):
+        quantity = (quantity + float(match.group('upper'))) / 2
+
+    unit = match.group('unit')
+    if unit in WEIGHT_UNITS:
+        return Amount(quantity, WEIGHT_UNITS[unit])
+    if unit in COUNT_UNITS:
+        return Amount(quantity, None)
+    return None
+
+
+def _read_csv(path: str) -> Tuple[List[str], List[List[float]], str]:
+    """讀取 CSV：名稱、數值列與內容雜湊"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    reader = csv.DictReader(raw.decode('utf-8-sig').splitlines())
+    names: List[str] = []
+    rows: List[List[float]] = []
+    for record in reader:
+        name = (record.get('name') or '').strip()
+        if not name:
+            continue
+        names.append(name)
+        rows.append([float(record.get(column) or 0) for column in NUTRIENTS + ('unit_grams',)])
+    return names, rows, hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _load_columns(rows: List[List[float]], digest: str, cache_dir: str) -> Tuple[Any, bool]:
+    """
+    取得欄式矩陣（營養素 × 食材）；.npy 不存在時先寫入暫存檔再改名（多個 worker 同時啟動也不會讀到半個檔案）
+    無法寫入時改用記憶體中的陣列
+    """
+    path = os.path.join(cache_dir, f'nutrition-{digest}.npy')
+    if not os.path.exists(path):
+        columns = np.ascontiguousarray(np.asarray(rows, dtype=np.float32).T)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, columns)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"營養資料無法寫入 {cache_dir}，改用記憶體中的陣列: {e}")
+            return columns, False
+    return np.load(path, mmap_mode='r'), True
+
+
+class NutritionTable:
+    """
+    唯讀營養資料表
+    columns: shape (len(NUTRIENTS) + 1, 食材數)，最後一列為 unit_grams
+    """
+
+    def __init__(self, names: Sequence[str], columns, mapped: bool = False,
+                 normalizer: IngredientNormalizer = ingredient_normalizer):
+        self.names: Tuple[str, ...] = tuple(names)
+        self.columns = columns
+        self.mapped = mapped
+        self.normalizer = normalizer
+        self._index: Dict[str, int] = {}
+        for position, name in enumerate(self.names):
+            self._index.setdefault(name, position)
+
+    @classmethod
+    def from_csv(cls, path: str = NUTRITION_CSV_PATH, cache_dir: str = NUTRITION_CACHE_DIR,
+                 normalizer: IngredientNormalizer = ingredient_normalizer) -> 'NutritionTable':
+        names, rows, digest = _read_csv(path)
+        columns, mapped = _load_columns(rows, digest, cache_dir)
+        return cls(names, columns, mapped, normalizer)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, ingredient_id: str) -> bool:
+        return ingredient_id in self._index
+
+    def position(self, ingredient_id: str) -> int:
+        """標準食材 id 的欄位位置，不存在時為 -1"""
+        return self._index.get(ingredient_id, -1)
+
+    def lookup(self, ingredient_id: str) -> Optional[Dict[str, float]]:
+        """每 100 g 的營養素（O(1)）；不存在時回傳 None"""
+        position = self._index.get(ingredient_id)
+        if position is None:
+            return None
+        values = self.columns[:, position]
+        return {nutrient: round(float(values[i]), 2) for i, nutrient in enumerate(NUTRIENTS)}
+
+    def unit_grams(self, ingredient_id: str) -> Optional[float]:
+        position = self._index.get(ingredient_id)
+        return None if position is None else float(self.columns[UNIT_GRAMS_ROW, position])
+
+    def totals(self, recipe_ids, positions, grams, count: int):
+        """
+        向量化乘加：第 i 筆食材（屬於 recipe_ids[i]，欄位 positions[i]，grams[i] 克）累加到所屬食譜
+        回傳 shape (count, len(NUTRIENTS)) 的 float64 陣列
+        """
+        factors = np.asarray(grams, dtype=np.float64) / 100.0
+        positions = np.asarray(positions, dtype=np.intp)
+        result = np.empty((count, len(NUTRIENTS)))
+        for i in range(len(NUTRIENTS)):
+            result[:, i] = np.bincount(recipe_ids, weights=self.columns[i, positions] * factors, minlength=count)
+        return result
+
+    def recipe_nutrition(self, recipes: Sequence[Iterable[Any]]) -> List[Dict[str, Any]]:
+        """
+        批次計算多道食譜的營養總量
+        每道食譜是食材清單，食材為 {'name', 'amount'} 或字串（無份量）
+        名稱經正規化引擎對應到標準 id，只採用標準名稱與同義詞（修飾詞與錯字比對是推測，可能算成別的食材）
+        無法對應的名稱或無法解析的份量（適量、少許）不計入，matched / ingredients 表示計入比例
+        """
+        recipe_ids: List[int] = []
+        names: List[str] = []
+        amounts: List[Any] = []
+        for recipe_id, ingredients in enumerate(recipes):
+            if not isinstance(ingredients, (list, tuple)):
+                continue
+            for item in ingredients:
+                if isinstance(item, Mapping):
+                    name, amount = str(item.get('name', '')), item.get('amount')
+                else:
+                    name, amount = str(item), None
+                recipe_ids.append(recipe_id)
+                names.append(name)
+                amounts.append(amount)
+
+        count = len(recipes)
+        recipe_array = np.asarray(recipe_ids, dtype=np.intp)
+
+        # 名稱與份量的重複率很高：只解析不重複的寫法，再依對照表展開成陣列
+        unique_names = list(dict.fromkeys(names))
+        position_of = {
+            name: self.position(resolution.canonical) if resolution.exact else -1
+            for name, resolution in zip(unique_names, self.normalizer.resolve_many(unique_names))
+        }
+        amount_of = {}
+        for amount in amounts:
+            key = str(amount) if amount else ''
+            if key not in amount_of:
+                parsed = parse_amount(key) if key else None
+                amount_of[key] = (
+                    (parsed.quantity, np.nan if parsed.unit_grams is None else parsed.unit_grams) if parsed
+                    else (0.0, np.nan)
+                )
+        positions = np.fromiter((position_of[name] for name in names), dtype=np.intp, count=len(names))
+        parsed_amounts = np.array([amount_of[str(amount) if amount else ''] for amount in amounts],
+                                  dtype=np.float64).reshape(-1, 2)
+        quantity = parsed_amounts[:, 0]
+        unit = parsed_amounts[:, 1].copy()
+
+        known = positions >= 0
+        counted = np.isnan(unit)
+        unit[counted & known] = self.columns[UNIT_GRAMS_ROW, positions[counted & known]]
+        grams = quantity * unit
+        valid = known & (grams > 0)
+
+        totals = self.totals(recipe_array[valid], positions[valid], grams[valid], count)
+        matched = np.bincount(recipe_array[valid], minlength=count)
+        sizes = np.bincount(recipe_array, minlength=count)
+        return [
+            {
+                **{nutrient: round(float(totals[i, j]), 1) for j, nutrient in enumerate(NUTRIENTS)},
+                'matched': int(matched[i]),
+                'ingredients': int(sizes[i]),
+            }
+            for i in range(count)
+        ]
+
+    def stats(self) -> Dict[str, float]:
+        return {'ingredients': len(self.names), 'mapped': int(self.mapped)}
+
+
+def create_nutrition_table(path: str = NUTRITION_CSV_PATH, cache_dir: str = NUTRITION_CACHE_DIR) -> Optional[NutritionTable]:
+    """載入營養資料表並註冊統計；numpy 未安裝或 CSV 不存在時回傳 None"""
+    if np is None:
+        logger.warning("numpy 未安裝，營養資料庫停用")
+        return None
+    if not os.path.exists(path):
+        logger.warning(f"找不到營養資料 {path}，營養資料庫停用")
+        return None
+    table = NutritionTable.from_csv(path, cache_dir)
+    metrics.register('nutrition', table.stats)
+    return table
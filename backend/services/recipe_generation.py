@@ -0,0 +1,191 @@
+# backend/services/recipe_generation.py
+
+"""
+LLM 食譜生成
+請求標準形式與快取鍵、Prompt、模型層級與輸出驗證；API 路由（routes/recipes.py）與離線預熱工作
+（jobs/warm_recipe_cache.py）共用，兩者的快取鍵與生成結果一致
+只建立生成所需的物件（模型路由、結果快取），不含檢索、寫回、微批次等 API 伺服器的狀態
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from services import metrics
+from services.cache import create_tiered_cache
+from services.ingredient_merge import canonical_ingredient_set
+from services.ingredient_normalizer import ingredient_normalizer
+from services.model_router import create_router
+from services.recipe_persist import generated_recipe_id
+
+# -------------------------------------------------------------
+# 型別定義（取代舊的 ChatCompletionMessageParam）
+# -------------------------------------------------------------
+Message = Dict[str, str]  # {"role": "user", "content": "..."}
+Messages = List[Message]
+
+# -------------------------------------------------------------
+# 生成設定與結果快取
+# -------------------------------------------------------------
+# 先用較快的模型，輸出未通過驗證才升級；慢請求以對沖降低尾端延遲（RECIPE_MODEL_TIERS / RECIPE_HEDGE）
+recipe_router = create_router('recipe', 'RECIPE', default_tiers='gpt-4o-mini,gpt-4o', default_max_tokens=1000)
+
+RECIPE_PROMPT = (
+    "根據以下食材: {ingredients}，推薦 3 道最適合的食譜。{preferences}"
+    "每個食譜包含：名稱、描述、時間(分鐘)、難度(簡單/中等/困難)、主要食材。 "
+    "嚴格回傳 JSON: "
+    "{{\"recipes\": [{{\"name\": \"\", \"description\": \"\", \"time\": 30, \"difficulty\": \"中等\", \"main_ingredients\": []}}]}}"
+)
+
+# 微批次：多組獨立請求合併成一則訊息（見 complete_recipe_batch）
+RECIPE_BATCH_PROMPT = (
+    "以下共有 {count} 組彼此獨立的食材請求，依序編號為 1 到 {count}。"
+    "請分別為每一組推薦 3 道最適合的食譜，只使用該組的食材與偏好，不要混用不同組的內容。"
+    "每個食譜包含：名稱、描述、時間(分鐘)、難度(簡單/中等/困難)、主要食材。 "
+    "嚴格回傳 JSON: "
+    "{{\"results\": [{{\"index\": 1, \"recipes\": [{{\"name\": \"\", \"description\": \"\", \"time\": 30, "
+    "\"difficulty\": \"中等\", \"main_ingredients\": []}}]}}]}}"
+)
+
+# Prompt 或模型變更時版本號跟著改變，舊快取自然失效
+RECIPE_PROMPT_VERSION = hashlib.sha256(
+    f"{','.join(tier.model for tier in recipe_router.tiers)}\n{RECIPE_PROMPT}\n{RECIPE_BATCH_PROMPT}".encode('utf-8')
+).hexdigest()[:12]
+
+# 每次搜尋回傳的食譜數
+RECIPE_COUNT = 3
+
+# 影響生成結果的偏好欄位
+PREFERENCE_FIELDS = ('cooking_time', 'difficulty', 'cuisine')
+
+recipe_cache = create_tiered_cache(
+    'recipes', 'RECIPE_CACHE', default_path='/tmp/cache/recipe_cache.sqlite3',
+    default_ttl=24 * 3600
+)
+metrics.register('recipe_cache', recipe_cache.stats)
+
+
+def canonical_request(ingredients: List[str], preferences: Any) -> Dict[str, Any]:
+    """
+    請求的標準形式：食材經正規化引擎對應標準名稱（異體字、修飾詞、錯字）、去重排序；偏好只保留已知欄位並去除空值
+    食材寫法、順序或重複不同的請求得到相同結果
+    """
+    if not isinstance(preferences, dict):
+        preferences = {}
+    values = {field: str(preferences.get(field) or '').strip() for field in PREFERENCE_FIELDS}
+    return {
+        'ingredients': canonical_ingredient_set(ingredients, ingredient_normalizer),
+        'preferences': {field: value for field, value in values.items() if value}
+    }
+
+
+def recipe_cache_key(canonical: Dict[str, Any]) -> str:
+    """以標準形式雜湊 + Prompt/模型版本作為快取鍵"""
+    digest = hashlib.sha256(
+        json.dumps(canonical, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return f"recipes:{RECIPE_PROMPT_VERSION}:{digest}"
+
+
+def preferences_text(preferences: Dict[str, str]) -> str:
+    parts = []
+    if 'cooking_time' in preferences:
+        parts.append(f"烹飪時間 {preferences['cooking_time']} 分鐘以內")
+    if 'difficulty' in preferences:
+        parts.append(f"難度 {preferences['difficulty']}")
+    if 'cuisine' in preferences:
+        parts.append(f"菜系 {preferences['cuisine']}")
+    return f"偏好：{'、'.join(parts)}。 " if parts else " "
+
+
+def recipe_messages(canonical: Dict[str, Any]) -> Messages:
+    prompt = RECIPE_PROMPT.format(
+        ingredients="、".join(canonical['ingredients']),
+        preferences=preferences_text(canonical['preferences'])
+    )
+    return [{"role": "user", "content": prompt}]
+
+
+def valid_recipe(recipe: Any) -> bool:
+    return isinstance(recipe, dict) and isinstance(recipe.get('name'), str) and bool(recipe['name'].strip())
+
+
+def parse_recipes(content: Optional[str]) -> List[Dict]:
+    """解析並驗證模型輸出；JSON 格式錯誤或沒有任何有效食譜時拋出 ValueError（升級到下一層模型）"""
+    if not content:
+        raise ValueError('Empty recipe response')
+    data = json.loads(content)
+    recipes = data.get('recipes') if isinstance(data, dict) else None
+    valid = [recipe for recipe in recipes or [] if valid_recipe(recipe)] if isinstance(recipes, list) else []
+    if not valid:
+        raise ValueError('No valid recipes in response')
+    return valid
+
+
+def complete_recipes(canonical: Dict[str, Any]) -> List[Dict]:
+    """單一請求：依模型層級生成並驗證"""
+    recipes, _ = recipe_router.complete(
+        recipe_messages(canonical),
+        parse_recipes,
+        response_format={"type": "json_object"}
+    )
+    return recipes
+
+
+def parse_recipe_batch(count: int):
+    """
+    批次輸出的解析函式：回傳每組的食譜列表，缺漏或無效的組為 None（改為單獨呼叫）
+    整份輸出格式錯誤或沒有任何有效的組時拋出 ValueError（升級到下一層模型）
+    """
+    def parse(content: Optional[str]) -> List[Optional[List[Dict]]]:
+        data = json.loads(content or '')
+        entries = data.get('results') if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError('Missing results in batched response')
+
+        results: List[Optional[List[Dict]]] = [None] * count
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get('index', 0)) - 1
+            except (TypeError, ValueError):
+                continue
+            recipes = entry.get('recipes')
+            valid = [recipe for recipe in recipes if valid_recipe(recipe)] if isinstance(recipes, list) else []
+            if 0 <= index < count and valid and results[index] is None:
+                results[index] = valid
+        if not any(results):
+            raise ValueError('No valid results in batched response')
+        return results
+    return parse
+
+
+def complete_recipe_batch(canonicals: List[Dict[str, Any]]) -> List[Optional[List[Dict]]]:
+    """多組請求合併成一則訊息生成"""
+    lines = [RECIPE_BATCH_PROMPT.format(count=len(canonicals))]
+    for number, canonical in enumerate(canonicals, start=1):
+        lines.append(
+            f"請求 {number}: 食材: {'、'.join(canonical['ingredients'])}。{preferences_text(canonical['preferences'])}"
+        )
+    results, _ = recipe_router.complete(
+        [{"role": "user", "content": "\n".join(lines)}],
+        parse_recipe_batch(len(canonicals)),
+        token_scale=len(canonicals),
+        response_format={"type": "json_object"}
+    )
+    return results
+
+
+def generate_recipes(canonical: Dict[str, Any],
+                     complete: Optional[Callable[[Dict[str, Any]], List[Dict]]] = None) -> List[Dict]:
+    """
+    依模型層級生成食譜（complete 可換成微批次等其他呼叫方式），失敗時拋出例外（不寫入快取）
+    以內容指紋作為穩定 id（前端需要），同一道菜只保留一次
+    """
+    recipes = (complete or complete_recipes)(canonical)
+    unique: Dict[str, Dict] = {}
+    for recipe in recipes:
+        recipe['id'] = generated_recipe_id(recipe)
+        unique.setdefault(recipe['id'], recipe)
+    return list(unique.values())
@@ -0,0 +1,410 @@
+# backend/services/recognizers.py
+
+"""
+食材識別後端
+- openai：GPT-4o-mini Vision
+- replay：依圖片雜湊重播錄製好的回應，可設定延遲分佈，用於離線壓測與效能評估
+以 VISION_RECOGNIZER 切換；VISION_RECORD_PATH 設定時會把實際回應錄製下來供 replay 使用
+錄製檔為 JSONL（每行 {"digest", "ingredients"}，同一雜湊以最後一行為準），也接受舊版整份 {雜湊: 結果} 的 JSON
+"""
+
+import hashlib
+import importlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, TypedDict
+
+from services import metrics
+from services.image_preprocess import PreparedImage, prepare_image
+from services.ingredient_normalizer import IngredientNormalizer, ingredient_normalizer
+from services.llm_gateway import LLMGateway, llm_gateway
+from services.uploads import ImageData, image_data_url
+
+logger = logging.getLogger(__name__)
+
+VISION_RECOGNIZER = os.environ.get('VISION_RECOGNIZER', 'openai')
+VISION_RECORD_PATH = os.environ.get('VISION_RECORD_PATH', '')
+VISION_REPLAY_PATH = os.environ.get('VISION_REPLAY_PATH', 'recordings/vision.json')
+VISION_REPLAY_LATENCY = os.environ.get('VISION_REPLAY_LATENCY', 'none')
+VISION_REPLAY_SEED = os.environ.get('VISION_REPLAY_SEED') or None
+
+
+# -------------------------------------------------------------
+# 型別定義（取代舊的 ChatCompletionMessageParam）
+# -------------------------------------------------------------
+class ContentPart(TypedDict, total=False):
+    type: str
+    text: str
+    image_url: Dict[str, Dict[str, str]]
+
+class Message(TypedDict):
+    role: str
+    content: List[ContentPart]
+
+Messages = List[Message]
+
+Ingredients = List[Dict]
+
+
+def image_digest(image: ImageData) -> str:
+    """圖片內容雜湊（快取與錄製共用）"""
+    return hashlib.sha256(image).hexdigest()
+
+
+def parse_ingredients(items, normalizer: IngredientNormalizer = ingredient_normalizer) -> Ingredients:
+    """
+    解析模型回傳的食材清單，名稱對應到標準名稱（原寫法保留在 original）
+    模型未給分類時使用標準名稱的分類；只在標準名稱或同義詞相符時改寫，修飾詞與錯字比對只是推測
+    """
+    items = [item for item in items or [] if isinstance(item, dict) and item.get('name')]
+    parsed = []
+    for item, resolution in zip(items, normalizer.resolve_many(item['name'] for item in items)):
+        ingredient = {
+            'name': item['name'],
+            'confidence': 1.0,
+            'category': item.get('category', 'unknown')
+        }
+        if resolution.exact:
+            if resolution.canonical != item['name']:
+                ingredient['name'] = resolution.canonical
+                ingredient['original'] = item['name']
+            if ingredient['category'] == 'unknown':
+                ingredient['category'] = resolution.category
+        parsed.append(ingredient)
+    return parsed
+
+
+class Recognizer:
+    """識別後端介面"""
+
+    name = 'base'
+    # 影響識別結果的設定（模型、Prompt 等），納入快取鍵
+    version = ''
+    supports_packed = False
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def recognize(self, image: ImageData, prepared: Optional[PreparedImage] = None) -> Ingredients:
+        """識別單張圖片，失敗時拋出例外"""
+        raise NotImplementedError
+
+    def recognize_packed(self, images: List[ImageData],
+                         prepared: List[PreparedImage]) -> List[Optional[Ingredients]]:
+        """一次識別多張圖片；無法對應到的圖片為 None"""
+        return [self.recognize(image, item) for image, item in zip(images, prepared)]
+
+
+class UsageStats:
+    """各模式的呼叫次數、圖片數、token 用量與耗時"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, mode: str, images: int, response, seconds: float) -> None:
+        usage = getattr(response, 'usage', None)
+        with self._lock:
+            stats = self._stats.setdefault(mode, {
+                'calls': 0, 'images': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'seconds': 0.0
+            })
+            stats['calls'] += 1
+            stats['images'] += images
+            stats['prompt_tokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+            stats['completion_tokens'] += getattr(usage, 'completion_tokens', 0) or 0
+            stats['seconds'] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {mode: dict(stats) for mode, stats in self._stats.items()}
+
+
+# -------------------------------------------------------------
+# OpenAI GPT-4o Vision
+# -------------------------------------------------------------
+VISION_MODEL = "gpt-4o-mini"  # 因 gpt-4o 的安全機制觸發了「人臉識別」限制，通常不提供辨識圖片
+
+VISION_PROMPT = (
+    "你是一位專業的廚師助理。請嚴格忽略圖片中的任何人、臉部或人物，"
+    "只專注於辨識食材。請根據圖片中的食物，識別出所有主要的食材。 "
+    "請嚴格以 JSON 格式回應，不要包含任何額外文字。JSON 格式必須是: "
+    "{\"ingredients\": [{\"name\": \"食材名\", \"category\": \"類別\"}]}"
+)
+
+VISION_PACKED_PROMPT = (
+    "你是一位專業的廚師助理。以下共有 {count} 張圖片，依出現順序編號為 1 到 {count}。"
+    "請嚴格忽略圖片中的任何人、臉部或人物，只專注於辨識食材。"
+    "請分別識別每張圖片中的所有主要食材，不要合併不同圖片的結果。 "
+    "請嚴格以 JSON 格式回應，不要包含任何額外文字。JSON 格式必須是: "
+    "{{\"images\": [{{\"index\": 1, \"ingredients\": [{{\"name\": \"食材名\", \"category\": \"類別\"}}]}}]}}"
+)
+
+
+def _image_part(prepared: PreparedImage) -> ContentPart:
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": image_data_url(prepared.data, prepared.mime_type)
+        }
+    }
+
+
+class OpenAIRecognizer(Recognizer):
+    """GPT-4o-mini Vision 識別"""
+
+    name = 'openai'
+    supports_packed = True
+
+    def __init__(self, model: str = VISION_MODEL, gateway: LLMGateway = llm_gateway):
+        self.model = model
+        self.version = f"{model}\n{VISION_PROMPT}"
+        self.usage = UsageStats()
+        self.gateway = gateway
+
+    @property
+    def available(self) -> bool:
+        return self.gateway.available
+
+    def recognize(self, image, prepared=None):
+        # 1. 前處理（EXIF 方向、縮圖、重新編碼）後編碼為 data URL
+        prepared = prepared or prepare_image(image)
+
+        # 2. 構造多模態內容 (圖片 + 文字)
+        messages: Messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": VISION_PROMPT},
+                    _image_part(prepared)
+                ]
+            }
+        ]
+
+        # 3. 呼叫 GPT-4o Vision
+        started = time.perf_counter()
+        response = self.gateway.chat(
+            self.model,
+            messages,
+            response_format={"type": "json_object"}, # 確保 JSON 輸出
+            max_tokens=2000
+        )
+        self.usage.record('per_image', 1, response, time.perf_counter() - started)
+
+        # 4. 解析結果
+        content = response.choices[0].message.content
+        logger.debug(f"OpenAI GPT-4o API content: {content}")
+        if not content:
+            return []
+        return parse_ingredients(json.loads(content).get('ingredients', []))
+
+    def recognize_packed(self, images, prepared):
+        """將多張圖片打包成一則訊息呼叫 LLM"""
+        content: List[ContentPart] = [
+            {"type": "text", "text": VISION_PACKED_PROMPT.format(count=len(prepared))}
+        ]
+        for number, item in enumerate(prepared, start=1):
+            content.append({"type": "text", "text": f"圖片 {number}:"})
+            content.append(_image_part(item))
+
+        started = time.perf_counter()
+        response = self.gateway.chat(
+            self.model,
+            [{"role": "user", "content": content}],
+            response_format={"type": "json_object"},
+            max_tokens=min(4000, 1000 + 500 * len(prepared))
+        )
+        self.usage.record('packed', len(prepared), response, time.perf_counter() - started)
+
+        results: List[Optional[Ingredients]] = [None] * len(prepared)
+        raw = response.choices[0].message.content
+        if not raw:
+            return results
+
+        for entry in json.loads(raw).get('images', []):
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get('index', 0)) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(results):
+                results[index] = parse_ingredients(entry.get('ingredients', []))
+        return results
+
+
+# -------------------------------------------------------------
+# 錄製／重播
+# -------------------------------------------------------------
+class LatencyModel:
+    """
+    延遲分佈設定
+    none | fixed:秒 | uniform:最小,最大 | normal:平均,標準差 | lognormal:中位數,sigma
+    """
+
+    def __init__(self, spec: str = 'none', seed: Optional[str] = None):
+        self.spec = spec
+        kind, _, args = spec.partition(':')
+        self.kind = kind
+        self.args = [float(arg) for arg in args.split(',') if arg]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == 'fixed':
+                return self.args[0]
+            if self.kind == 'uniform':
+                return self._random.uniform(self.args[0], self.args[1])
+            if self.kind == 'normal':
+                return max(0.0, self._random.gauss(self.args[0], self.args[1]))
+            if self.kind == 'lognormal':
+                return self._random.lognormvariate(math.log(self.args[0]), self.args[1])
+            return 0.0
+
+
+def load_recordings(path: str) -> Dict[str, Ingredients]:
+    """讀取錄製檔；略過無法解析的行（例如寫入中途中斷留下的殘行）"""
+    recordings: Dict[str, Ingredients] = {}
+    if not path or not os.path.exists(path):
+        return recordings
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed recording {path}:{number}")
+                continue
+            if not isinstance(entry, dict):
+                continue
+            if 'digest' in entry:
+                recordings[entry['digest']] = entry.get('ingredients') or []
+            else:
+                recordings.update(entry)
+    return recordings
+
+
+class ReplayRecognizer(Recognizer):
+    """
+    依圖片雜湊重播錄製好的回應（決定性），不呼叫任何外部服務
+    沒有錄製過的圖片回傳 default 結果（預設空清單）
+    """
+
+    name = 'replay'
+    supports_packed = True
+
+    def __init__(self, path: str = VISION_REPLAY_PATH, latency: str = VISION_REPLAY_LATENCY,
+                 seed: Optional[str] = VISION_REPLAY_SEED, default: Optional[Ingredients] = None):
+        self.path = path
+        self.latency = LatencyModel(latency, seed)
+        self.default = default or []
+        self.recordings = load_recordings(path)
+        self.version = f"replay:{path}"
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'hits': 0, 'misses': 0}
+
+    def _lookup(self, image: ImageData) -> Ingredients:
+        result = self.recordings.get(image_digest(image))
+        with self._lock:
+            self._stats['hits' if result is not None else 'misses'] += 1
+        return [dict(item) for item in (result if result is not None else self.default)]
+
+    def _sleep(self) -> None:
+        with self._lock:
+            self._stats['calls'] += 1
+        delay = self.latency.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+    def recognize(self, image, prepared=None):
+        self._sleep()
+        return self._lookup(image)
+
+    def recognize_packed(self, images, prepared):
+        # 一次呼叫只模擬一次延遲
+        self._sleep()
+        return [self._lookup(image) for image in images]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['recordings'] = len(self.recordings)
+        stats['latency'] = self.latency.spec
+        return stats
+
+
+class RecordingRecognizer(Recognizer):
+    """包裝其他後端，將結果依圖片雜湊逐行附加到錄製檔（結果未變的圖片不重複寫入）"""
+
+    def __init__(self, inner: Recognizer, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = inner.name
+        self.version = inner.version
+        self.supports_packed = inner.supports_packed
+        self._lock = threading.Lock()
+        self.recordings = load_recordings(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 上次中斷留下沒有換行的殘行時先補換行，避免新記錄接在殘行後面
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+
+    @property
+    def available(self) -> bool:
+        return self.inner.available
+
+    def _save(self, image: ImageData, result: Optional[Ingredients]) -> None:
+        if result is None:
+            return
+        digest = image_digest(image)
+        line = json.dumps({'digest': digest, 'ingredients': result}, ensure_ascii=False)
+        with self._lock:
+            if self.recordings.get(digest) == result:
+                return
+            self.recordings[digest] = result
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def recognize(self, image, prepared=None):
+        result = self.inner.recognize(image, prepared)
+        self._save(image, result)
+        return result
+
+    def recognize_packed(self, images, prepared):
+        results = self.inner.recognize_packed(images, prepared)
+        for image, result in zip(images, results):
+            self._save(image, result)
+        return results
+
+
+def create_recognizer(name: str = VISION_RECOGNIZER, record_path: str = VISION_RECORD_PATH) -> Recognizer:
+    """依設定建立識別後端：openai、replay，或 'package.module:ClassName'"""
+    if name == 'openai':
+        recognizer: Recognizer = OpenAIRecognizer()
+    elif name == 'replay':
+        recognizer = ReplayRecognizer()
+    else:
+        module_name, _, class_name = name.partition(':')
+        recognizer = getattr(importlib.import_module(module_name), class_name)()
+
+    if isinstance(recognizer, OpenAIRecognizer):
+        metrics.register('vision_llm', recognizer.usage.stats)
+    if isinstance(recognizer, ReplayRecognizer):
+        metrics.register('vision_replay', recognizer.stats)
+
+    if record_path:
+        recognizer = RecordingRecognizer(recognizer, record_path)
+    return recognizer
@@ -0,0 +1,119 @@
+# backend/services/singleflight.py
+
+"""
+相同請求合併（single-flight）
+同一個鍵同時只有一個上游呼叫在執行，其他併發請求等待並共用它的結果（包含例外）
+等待超過逾時時間的請求拋出 SingleFlightTimeout，不影響進行中的呼叫
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services import metrics
+
+
+class SingleFlightTimeout(TimeoutError):
+    """等待進行中的呼叫逾時"""
+
+
+class Call:
+    """進行中的上游呼叫"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self, timeout: Optional[float]) -> Any:
+        """等待結果；呼叫失敗時拋出同一個例外"""
+        if not self._done.wait(timeout):
+            raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for in-flight call")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """依鍵合併併發呼叫"""
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Call] = {}
+        self._stats = {'calls': 0, 'upstream': 0, 'coalesced': 0, 'errors': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+
+    def _count(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[field] += amount
+
+    def acquire(self, key: str) -> Tuple[Call, bool]:
+        """
+        取得鍵對應的呼叫，回傳 (call, 是否為 leader)
+        leader 必須執行上游呼叫並以 finish() 回報結果；其他請求以 wait() 等待
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                return call, False
+            call = self._calls[key] = Call()
+            self._stats['upstream'] += 1
+            return call, True
+
+    def finish(self, key: str, call: Call, value: Any = None, error: Optional[BaseException] = None) -> None:
+        """leader 回報結果並喚醒等待中的請求；之後的請求會重新呼叫上游"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if error is not None:
+                self._stats['errors'] += 1
+        call.value = value
+        call.error = error
+        call._done.set()
+
+    def wait(self, call: Call, timeout: Optional[float] = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return call.wait(self.timeout if timeout is None else timeout)
+        except SingleFlightTimeout:
+            self._count('timeouts')
+            raise
+        finally:
+            self._count('wait_seconds', time.perf_counter() - started)
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """執行 fn（或等待進行中的相同呼叫）並回傳結果"""
+        call, leader = self.acquire(key)
+        if not leader:
+            return self.wait(call, timeout)
+
+        try:
+            value = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        # coalesced 即省下的上游呼叫數
+        stats['coalesced_rate'] = round(stats['coalesced'] / stats['calls'], 4) if stats['calls'] else 0.0
+        stats['wait_seconds'] = round(stats['wait_seconds'], 4)
+        stats['timeout'] = self.timeout
+        return stats
+
+
+def create_single_flight(name: str, env_prefix: str, default_timeout: float = 60) -> SingleFlight:
+    """
+    依環境變數 {PREFIX}_COALESCE_TIMEOUT 建立，並註冊指標 {name}_singleflight
+    """
+    flight = SingleFlight(name, float(os.environ.get(f'{env_prefix}_COALESCE_TIMEOUT', default_timeout)))
+    metrics.register(f'{name}_singleflight', flight.stats)
+    return flight
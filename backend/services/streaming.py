@@ -0,0 +1,34 @@
+# backend/services/streaming.py
+
+"""
+串流回應
+NDJSON（預設）或 SSE（Accept: text/event-stream 或 ?format=sse），每個事件帶 type 欄位
+"""
+
+import json
+from typing import Dict, Iterable
+
+from flask import Response, request
+
+
+def stream_format() -> str:
+    """依請求決定串流格式：sse 或 ndjson"""
+    if request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', ''):
+        return 'sse'
+    return 'ndjson'
+
+
+def encode_event(event: str, data: Dict, fmt: str) -> str:
+    payload = json.dumps(dict(data, type=event), ensure_ascii=False)
+    if fmt == 'sse':
+        return f"event: {event}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+def stream_response(events: Iterable[str], fmt: str) -> Response:
+    """包裝成不經緩衝的串流回應"""
+    mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    response = Response(events, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 關閉 nginx 緩衝，事件才會即時送達
+    return response
@@ -0,0 +1,66 @@
+# backend/services/uploads.py
+
+"""
+上傳檔案處理
+請求大小已知且不超過門檻時，上傳內容直接寫入 BytesIO，全程留在記憶體；
+超過門檻或大小未知（chunked）時使用 SpooledTemporaryFile，超過門檻才落地
+"""
+
+import binascii
+import io
+import os
+import tempfile
+from typing import Optional, Union
+
+from flask import Request
+
+# 超過此大小的上傳才寫入磁碟（預設 8MB，足以涵蓋一般手機照片）
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+
+ImageData = Union[bytes, bytearray, memoryview]
+
+
+class SpooledUploadRequest(Request):
+    """
+    以門檻值決定上傳內容放在記憶體或磁碟的 Request
+    （werkzeug 預設在 500KB 以上就改用暫存檔）
+    """
+
+    spool_max_bytes = UPLOAD_SPOOL_MAX_BYTES
+    spool_dir: Optional[str] = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # 整個請求都在門檻內時，每個檔案也一定在門檻內
+        if total_content_length is not None and total_content_length <= self.spool_max_bytes:
+            return io.BytesIO()
+        return tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes, dir=self.spool_dir)
+
+
+def read_upload(file) -> bytes:
+    """
+    取得上傳檔案的內容
+    BytesIO（一般大小的請求）透過 getvalue() 共用底層緩衝區，不會再複製一份；
+    其他來源（大型或大小未知的上傳）從頭讀取一次，落地的檔案也會整份讀回記憶體（識別需要完整內容）
+    """
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getvalue()
+
+    stream.seek(0)
+    return stream.read()
+
+
+# 3 的倍數，分段編碼的結果可直接串接
+_ENCODE_CHUNK = 3 * 256 * 1024
+
+
+def image_data_url(data: ImageData, mime_type: str = 'image/jpeg') -> str:
+    """
+    將圖片編碼為 data URL
+    分段編碼寫入同一個 bytearray，不產生完整大小的中間 base64 字串，最後只轉成 str 一次
+    """
+    view = memoryview(data).cast('B')
+    out = bytearray(f'data:{mime_type};base64,'.encode('ascii'))
+    for start in range(0, len(view), _ENCODE_CHUNK):
+        out += binascii.b2a_base64(view[start:start + _ENCODE_CHUNK], newline=False)
+    return out.decode('ascii')
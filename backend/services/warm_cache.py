@@ -0,0 +1,213 @@
+# backend/services/warm_cache.py
+
+"""
+離線預熱食譜快取
+從使用記錄找出最常見的標準食材組合，在呼叫額度內預先生成並寫入食譜快取
+- 中斷後以檢查點續跑，已完成的組合不重複生成
+- 以下一段時間的實際流量量測預熱結果的覆蓋率
+命令列入口見 jobs/warm_recipe_cache.py
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Canonicalize = Callable[[List[str], Any], Dict[str, Any]]
+KeyFunction = Callable[[Dict[str, Any]], str]
+
+
+class Combination(NamedTuple):
+    """一組標準請求與它在記錄中出現的次數"""
+    key: str
+    canonical: Dict[str, Any]
+    count: int
+
+
+def _request_keys(records: Iterable[Dict[str, Any]], canonicalize: Canonicalize,
+                  key_fn: KeyFunction) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    for details in records:
+        ingredients = details.get('ingredients')
+        if not isinstance(ingredients, list):
+            continue
+        canonical = canonicalize(ingredients, details.get('preferences'))
+        if canonical['ingredients']:
+            yield key_fn(canonical), canonical
+
+
+def top_combinations(records: Iterable[Dict[str, Any]], canonicalize: Canonicalize, key_fn: KeyFunction,
+                     limit: int, min_count: int = 2) -> Tuple[List[Combination], int]:
+    """回傳 (出現次數最多的前 limit 組, 請求總數)；只出現不到 min_count 次的組合不值得預熱"""
+    counts: Counter = Counter()
+    canonicals: Dict[str, Dict[str, Any]] = {}
+    for key, canonical in _request_keys(records, canonicalize, key_fn):
+        counts[key] += 1
+        canonicals.setdefault(key, canonical)
+
+    top = [
+        Combination(key, canonicals[key], count)
+        for key, count in counts.most_common(limit)
+        if count >= min_count
+    ]
+    return top, sum(counts.values())
+
+
+def traffic_coverage(records: Iterable[Dict[str, Any]], canonicalize: Canonicalize, key_fn: KeyFunction,
+                     warmed: Set[str]) -> Dict[str, Any]:
+    """這段流量中有多少請求（與不同組合）落在已預熱的鍵上"""
+    requests = covered = 0
+    unique: Set[str] = set()
+    for key, _ in _request_keys(records, canonicalize, key_fn):
+        requests += 1
+        unique.add(key)
+        if key in warmed:
+            covered += 1
+    return {
+        'requests': requests,
+        'covered_requests': covered,
+        'coverage': round(covered / requests, 4) if requests else 0.0,
+        'unique_combinations': len(unique),
+        'covered_combinations': len(unique & warmed),
+    }
+
+
+class RateBudget:
+    """
+    每分鐘 LLM 呼叫數上限（平均間隔）與本次執行的總呼叫數上限
+    acquire() 在每次生成前預留一次呼叫；生成實際用到更多呼叫（重試、升級層級、對沖）時以 charge() 補記，
+    之後的呼叫依補記的數量延後。總額在生成前檢查，最後一次生成可能略微超出
+    """
+
+    def __init__(self, per_minute: float, max_calls: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.max_calls = max_calls
+        self.used = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._next = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """等到下一個呼叫時段；總額用完時回傳 False"""
+        with self._lock:
+            if self.max_calls is not None and self.used >= self.max_calls:
+                return False
+            self.used += 1
+            wait = self._next - self._clock()
+            self._next = max(self._next, self._clock()) + self.interval
+        if wait > 0:
+            self._sleep(wait)
+        return True
+
+    def charge(self, calls: int) -> None:
+        """補記 acquire() 之外多用掉的呼叫數"""
+        if calls <= 0:
+            return
+        with self._lock:
+            self.used += calls
+            self._next += calls * self.interval
+
+
+class Checkpoint:
+    """
+    續跑檢查點（JSON）：本次執行的識別字串、已完成與失敗的鍵
+    識別字串不同（時間範圍或 Prompt 版本改變）時從頭開始
+    """
+
+    def __init__(self, path: str, run_id: str):
+        self.path = path
+        self.run_id = run_id
+        self.done: Dict[str, int] = {}
+        self.failed: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('run_id') == run_id:
+                self.done = state.get('done', {})
+                self.failed = state.get('failed', {})
+            else:
+                logger.info(f"Checkpoint {path} belongs to another run, starting over")
+
+    def mark_done(self, key: str, recipes: int) -> None:
+        self.done[key] = recipes
+        self.failed.pop(key, None)
+        self.save()
+
+    def mark_failed(self, key: str, error: str) -> None:
+        self.failed[key] = error
+        self.save()
+
+    def save(self) -> None:
+        """先寫暫存檔再取代，中斷時不會留下半份檢查點"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'run_id': self.run_id, 'done': self.done, 'failed': self.failed}, f, ensure_ascii=False)
+        os.replace(temporary, self.path)
+
+
+def warm_cache(combinations: List[Combination], cache, generate: Callable[[Dict[str, Any]], List[Dict]],
+               budget: RateBudget, checkpoint: Checkpoint, force: bool = False,
+               progress: Callable[[str], None] = logger.info, progress_every: int = 10,
+               call_count: Optional[Callable[[], int]] = None) -> Dict[str, Any]:
+    """
+    依序預熱各組合：檢查點已完成的略過；快取仍有效的略過（force 時重新生成）
+    生成失敗只記錄在檢查點，繼續下一組；額度用完即停止，下次執行從檢查點續跑
+    call_count 回傳目前為止的實際 LLM 呼叫數（例如 llm_gateway.call_count），用來把每次生成的呼叫數計入額度；
+    未提供時每次生成算一次呼叫
+    """
+    stats = {'total': len(combinations), 'generated': 0, 'cached': 0, 'resumed': 0, 'failed': 0,
+             'empty': 0, 'budget_exhausted': False}
+    started = time.monotonic()
+
+    for number, combination in enumerate(combinations, start=1):
+        key = combination.key
+        cached = None if force or key in checkpoint.done else cache.get(key)
+        if key in checkpoint.done:
+            stats['resumed'] += 1
+        elif cached is not None:
+            stats['cached'] += 1
+            checkpoint.mark_done(key, len(cached))
+        elif not budget.acquire():
+            stats['budget_exhausted'] = True
+            progress(f"Rate budget exhausted after {budget.used} calls, stopping at {number}/{len(combinations)}")
+            break
+        else:
+            calls_before = call_count() if call_count else 0
+            try:
+                recipes = generate(combination.canonical)
+            except Exception as e:
+                stats['failed'] += 1
+                checkpoint.mark_failed(key, str(e))
+                logger.warning(f"Warm-up failed for {combination.canonical['ingredients']}: {e}")
+            else:
+                if recipes:
+                    cache.set(key, recipes)
+                    stats['generated'] += 1
+                else:
+                    stats['empty'] += 1
+                checkpoint.mark_done(key, len(recipes))
+            if call_count:
+                budget.charge(call_count() - calls_before - 1)
+
+        if number % progress_every == 0 or number == len(combinations):
+            elapsed = time.monotonic() - started
+            eta = elapsed / number * (len(combinations) - number)
+            progress(
+                f"[{number}/{len(combinations)}] generated={stats['generated']} cached={stats['cached']} "
+                f"resumed={stats['resumed']} failed={stats['failed']} elapsed={elapsed:.0f}s eta={eta:.0f}s"
+            )
+
+    stats['llm_calls'] = budget.used
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    return stats
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+背景批次處理測試
+"""
+
+import threading
+
+from services.batch_worker import BatchWorker
+
+
+def test_batch_worker_groups_items_and_survives_failures():
+    batches = []
+    release = threading.Event()
+
+    def handle(batch):
+        release.wait(5)
+        batches.append(list(batch))
+        if 'bad' in batch:
+            raise RuntimeError('write failed')
+
+    worker = BatchWorker('test', handle, batch_size=3, interval=0.05, max_queue=4)
+    worker.put('first')
+    for item in ['a', 'b', 'bad', 'c', 'd', 'e']:
+        worker.put(item)
+    release.set()
+    assert worker.flush(5)
+
+    stats = worker.stats()
+    assert stats['dropped'] >= 1
+    assert stats['failed_batches'] == 1
+    assert sum(len(batch) for batch in batches) == stats['queued']
+    assert all(len(batch) <= 3 for batch in batches)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+快取模組測試
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    """建立暫存 SQLite 快取"""
+    return SQLiteCache(str(tmp_path / 'cache.sqlite3'), ttl=60, max_bytes=10_000)
+
+
+class TestLRUCache:
+    """記憶體 LRU 快取測試"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(max_entries=2, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        assert cache.get('a') is None
+
+
+class TestSQLiteCache:
+    """SQLite 持久快取測試"""
+
+    def test_roundtrip(self, disk_cache):
+        disk_cache.set('k', [{'name': '番茄'}])
+        assert disk_cache.get('k') == [{'name': '番茄'}]
+
+    def test_size_bounded_eviction(self, disk_cache):
+        for i in range(50):
+            disk_cache.set(f'k{i}', 'x' * 500)
+        disk_cache.evict()
+
+        stats = disk_cache.stats()
+        assert stats['bytes'] <= disk_cache.max_bytes
+        assert disk_cache.get('k49') == 'x' * 500
+        assert disk_cache.get('k0') is None
+
+
+class TestTieredCache:
+    """兩層快取測試"""
+
+    def test_get_or_compute_counts_hits(self, disk_cache):
+        cache = TieredCache('test', LRUCache(), disk_cache)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ['番茄']
+
+        assert cache.get_or_compute('key', compute) == ['番茄']
+        assert cache.get_or_compute('key', compute) == ['番茄']
+        assert len(calls) == 1
+
+        stats = cache.stats()
+        assert stats['misses'] == 1
+        assert stats['memory_hits'] == 1
+
+    def test_disk_hit_backfills_memory(self, disk_cache):
+        disk_cache.set('key', {'v': 1})
+        cache = TieredCache('test', LRUCache(), disk_cache)
+
+        assert cache.get('key') == {'v': 1}
+        assert cache.get('key') == {'v': 1}
+        assert cache.stats()['disk_hits'] == 1
+        assert cache.stats()['memory_hits'] == 1
+
+    def test_should_cache_skips_values(self):
+        cache = TieredCache('test', LRUCache())
+        cache.get_or_compute('key', lambda: [], should_cache=bool)
+        assert cache.get('key') is None
+
+    def test_disk_errors_do_not_propagate(self, disk_cache, monkeypatch):
+        cache = TieredCache('test', LRUCache(), disk_cache)
+        cache.set('key', 1)
+
+        def locked(*args, **kwargs):
+            raise sqlite3.OperationalError('database is locked')
+
+        for method in ('get', 'set', 'delete'):
+            monkeypatch.setattr(disk_cache, method, locked)
+        cache.delete('key')
+        cache.set('other', 2)
+        assert cache.get('key') is None
+        assert cache.get('other') == 2
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+有界併發執行測試
+"""
+
+import threading
+import time
+
+from services.concurrency import BoundedExecutor
+
+
+class TestBoundedExecutor:
+    """執行緒池 fan-out 測試"""
+
+    def test_results_keep_input_order(self):
+        executor = BoundedExecutor('test', 4)
+
+        def work(i):
+            time.sleep(0.01 * (5 - i))
+            return i * 10
+
+        results = executor.map_ordered(work, range(5))
+        assert [r.value for r in results] == [0, 10, 20, 30, 40]
+
+    def test_failure_is_isolated(self):
+        executor = BoundedExecutor('test', 4)
+
+        def work(i):
+            if i == 1:
+                raise ValueError('bad image')
+            return i
+
+        results = executor.map_ordered(work, range(3))
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, ValueError)
+        assert results[2].value == 2
+
+    def test_wall_clock_close_to_slowest(self):
+        executor = BoundedExecutor('test', 8)
+        started = time.perf_counter()
+        executor.map_ordered(lambda _: time.sleep(0.1), range(6), max_concurrency=6)
+        assert time.perf_counter() - started < 0.3
+
+    def test_per_request_cap(self):
+        executor = BoundedExecutor('test', 8)
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+
+        def work(_):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['running'] -= 1
+
+        executor.map_ordered(work, range(10), max_concurrency=2)
+        assert state['peak'] <= 2
+
+    def test_iter_completed_yields_fastest_first(self):
+        executor = BoundedExecutor('test', 4)
+
+        def work(delay):
+            time.sleep(delay)
+            return delay
+
+        completed = list(executor.iter_completed(work, [0.2, 0.01, 0.1]))
+        assert [index for index, _ in completed] == [1, 2, 0]
+        assert completed[0][1].value == 0.01
+
+    def test_iter_completed_isolates_failures(self):
+        executor = BoundedExecutor('test', 2)
+
+        def work(i):
+            if i == 0:
+                raise ValueError('bad image')
+            return i
+
+        results = dict(executor.iter_completed(work, range(3), max_concurrency=1))
+        assert not results[0].ok
+        assert results[2].value == 2
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+食材共現建議引擎測試（記憶體資料，不連線資料庫）
+"""
+
+import math
+
+import pytest
+
+from services.cooccurrence import CooccurrenceModel, recipe_ingredient_names
+from services.ingredient_normalizer import ingredient_normalizer
+from services.recipe_persist import RecipeWriter
+
+
+def recipe(*names):
+    return {'ingredients': [{'name': name, 'amount': '適量'} for name in names]}
+
+
+CORPUS = [
+    recipe('番茄', '雞蛋', '蔥'),
+    recipe('番茄', '雞蛋'),
+    recipe('番茄', '雞蛋', '洋蔥'),
+    recipe('豬肉', '高麗菜', '蒜'),
+    recipe('豬肉', '高麗菜'),
+    recipe('豬肉', '蒜', '蔥'),
+    recipe('豆腐', '蔥', '醬油'),
+    recipe('豆腐', '醬油'),
+]
+
+
+def test_recipe_ingredient_names_accepts_rows_and_lists():
+    canonical = ingredient_normalizer.canonical
+    assert recipe_ingredient_names({'ingredients': [{'name': '蕃茄'}, '雞蛋', {'name': ' '}]}, canonical) == {'番茄', '雞蛋'}
+    assert recipe_ingredient_names({'ingredients': None}, canonical) == set()
+
+
+def test_pmi_matches_definition():
+    model = CooccurrenceModel(neighbors=5, min_support=1)
+    assert model.load(CORPUS + [{'ingredients': []}]) == len(CORPUS)
+
+    # c(番茄, 雞蛋) = 3, df = 3, 3, N = 8
+    neighbors = dict(model.neighbors_of('番茄'))
+    assert neighbors['雞蛋'] == pytest.approx(math.log(3 * 8 / (3 * 3)), abs=1e-4)
+    assert '番茄' not in neighbors
+
+
+def test_incremental_rebuild_matches_full_build():
+    incremental = CooccurrenceModel(neighbors=5, min_support=1)
+    incremental.load(CORPUS[:5])
+    assert incremental.ready
+    incremental.add_recipes(CORPUS[5:])
+    rows = incremental.rebuild()
+
+    full = CooccurrenceModel(neighbors=5, min_support=1)
+    full.load(CORPUS)
+
+    assert 0 < rows
+    assert incremental._snapshot.recipes == full._snapshot.recipes
+    assert dict(incremental._snapshot.neighbors) == dict(full._snapshot.neighbors)
+
+
+def test_suggest_excludes_present_and_normalizes():
+    model = CooccurrenceModel(neighbors=5, min_support=1)
+    model.load(CORPUS)
+
+    # 蔥與番茄的 PMI 為負（log 8/9），不列入
+    suggestions = model.suggest(['蕃茄', '洋蔥'], k=3)
+    assert [item.name for item in suggestions] == ['雞蛋']
+    assert suggestions[0].support == 2
+    assert suggestions[0].score == pytest.approx(2 * math.log(8 / 3), abs=1e-3)
+    assert model.suggest(['外星肉']) == []
+
+
+def test_min_support_and_lift_score():
+    pmi = CooccurrenceModel(neighbors=5, min_support=2)
+    pmi.load(CORPUS)
+    assert [name for name, _ in pmi.neighbors_of('番茄')] == ['雞蛋']
+
+    lift = CooccurrenceModel(neighbors=5, min_support=2, score='lift')
+    lift.load(CORPUS)
+    [top] = lift.suggest(['番茄'], k=1)
+    assert top.name == '雞蛋' and top.score == pytest.approx(8 / 3, abs=1e-3)
+
+    with pytest.raises(ValueError):
+        CooccurrenceModel(score='cosine')
+
+
+def test_submit_updates_in_background_and_listens_to_writer():
+    from test_recipe_persist import MemorySink
+
+    model = CooccurrenceModel(neighbors=5, min_support=1)
+    model.load(CORPUS)
+    writer = RecipeWriter(MemorySink(), batch_size=10, interval=0.05)
+    writer.add_listener(model.submit)
+
+    writer.submit([
+        {'name': '鮭魚炒飯', 'main_ingredients': ['鮭魚', '米飯']},
+        {'name': '鮭魚飯糰', 'main_ingredients': ['鮭魚', '米飯']},
+    ])
+    assert writer.flush(5) and model.flush(5)
+
+    assert [name for name, _ in model.neighbors_of('鮭魚')] == ['米飯']
+    stats = model.stats()
+    assert stats['recipes'] == len(CORPUS) + 2
+    assert stats['pending_rows'] == 0
+    assert stats['worker']['processed'] == 2
+
+
+def test_suggest_route_uses_cooccurrence_when_ready(monkeypatch):
+    from app import app
+    import routes.ingredients as ingredients_routes
+
+    client = app.test_client()
+    model = CooccurrenceModel(neighbors=5, min_support=2)
+    model.load(CORPUS)
+    monkeypatch.setattr(ingredients_routes, 'ingredient_suggester', model)
+    data = client.post('/api/ingredients/suggest', json={'ingredients': ['番茄']}).get_json()
+    assert data['source'] == 'cooccurrence' and data['suggestions'][0] == '雞蛋'
+
+    monkeypatch.setattr(ingredients_routes, 'ingredient_suggester', None)
+    data = client.post('/api/ingredients/suggest', json={'ingredients': ['番茄']}).get_json()
+    assert data['source'] == 'rules' and '鹽' in data['suggestions']
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+近似重複圖片偵測測試
+"""
+
+import io
+import random
+
+import pytest
+
+from services.image_dedup import NearDuplicateIndex, SessionDedupStore, dhash, hamming_distance
+
+
+def _flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+class TestNearDuplicateIndex:
+    """Hamming 距離索引測試"""
+
+    def test_finds_within_threshold(self):
+        index = NearDuplicateIndex(threshold=6)
+        base = random.Random(1).getrandbits(64)
+        index.add(base, 'leader')
+
+        near = _flip_bits(base, [0, 9, 17, 30, 44, 63])
+        assert index.find(near) == (6, 'leader')
+
+    def test_ignores_beyond_threshold(self):
+        index = NearDuplicateIndex(threshold=3)
+        base = random.Random(2).getrandbits(64)
+        index.add(base, 'leader')
+
+        far = _flip_bits(base, [1, 2, 3, 4])
+        assert index.find(far) is None
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        index = NearDuplicateIndex(threshold=5)
+        values = [rng.getrandbits(64) for _ in range(200)]
+        for i, value in enumerate(values):
+            index.add(value, i)
+
+        for value in values[:20]:
+            probe = _flip_bits(value, rng.sample(range(64), 4))
+            expected = min(hamming_distance(probe, v) for v in values)
+            assert index.find(probe)[0] == expected
+
+    def test_max_entries_drops_oldest(self):
+        index = NearDuplicateIndex(threshold=2, max_entries=2)
+        index.add(0, 'a')
+        index.add((1 << 32) - 1, 'b')
+        index.add(((1 << 32) - 1) << 32, 'c')
+
+        assert len(index) == 2
+        assert index.find(0) is None
+
+    def test_expired_entries_are_pruned(self):
+        now = [0.0]
+        index = NearDuplicateIndex(threshold=2, ttl=10, clock=lambda: now[0])
+        index.add(0, 'old')
+        now[0] = 5
+        index.add((1 << 32) - 1, 'new')
+
+        now[0] = 12
+        assert index.find(0) is None
+        assert index.find((1 << 32) - 1) == (0, 'new')
+        assert len(index) == 1
+
+    def test_storage_does_not_grow_past_limit(self):
+        index = NearDuplicateIndex(threshold=2, max_entries=4)
+        for i in range(1000):
+            index.add(i << 20, i)
+        assert len(index) == 4
+        assert len(index._entries) == 4
+        assert sum(len(bucket) for bucket in index._buckets[0].values()) == 4
+
+    def test_negative_threshold_disables(self):
+        index = NearDuplicateIndex(threshold=-1)
+        index.add(0, 'a')
+        assert index.find(0) is None
+
+
+class TestSessionDedupStore:
+    """跨請求去重測試"""
+
+    def test_sessions_are_isolated(self):
+        store = SessionDedupStore(threshold=4)
+        store.add('alice', 12345, ['番茄'])
+
+        assert store.find('alice', 12345) == (0, ['番茄'])
+        assert store.find('bob', 12345) is None
+
+
+def test_batch_without_session_id_skips_cross_request_dedup(monkeypatch):
+    import routes.vision as vision_routes
+
+    store = SessionDedupStore(threshold=4)
+    store.add('alice', 12345, ['番茄'])
+    monkeypatch.setattr(vision_routes, 'session_dedup', store)
+
+    # 同一批內仍會去重
+    assert vision_routes._find_near_duplicates([12345, 12345], None) == [None, ('batch', 0, 0)]
+    assert vision_routes._find_near_duplicates([12345], 'alice') == [('session', ['番茄'], 0)]
+
+    from app import app
+    with app.test_request_context('/api/vision/batch-upload', method='POST', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert vision_routes._session_id() is None
+    with app.test_request_context('/api/vision/batch-upload', method='POST', headers={'X-Session-Id': 'alice'}):
+        assert vision_routes._session_id() == 'alice'
+
+
+class TestDHash:
+    """感知雜湊測試"""
+
+    def test_similar_images_have_close_hashes(self):
+        Image = pytest.importorskip('PIL.Image')
+
+        def encode(image, **kwargs):
+            buffer = io.BytesIO()
+            image.save(buffer, **kwargs)
+            return buffer.getvalue()
+
+        gradient = Image.linear_gradient('L').resize((640, 480)).convert('RGB')
+        a = dhash(encode(gradient, format='PNG'))
+        b = dhash(encode(gradient, format='JPEG', quality=60))
+        assert hamming_distance(a, b) <= 6
+
+    def test_undecodable_returns_none(self):
+        assert dhash(b'fake image data') is None
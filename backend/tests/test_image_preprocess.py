@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+影像前處理測試
+"""
+
+import io
+
+import pytest
+
+from services.image_preprocess import prepare_image, sniff_mime_type
+
+
+class TestSniffMimeType:
+    """檔頭格式判斷測試"""
+
+    def test_known_formats(self):
+        assert sniff_mime_type(b'\xff\xd8\xff\xe0' + b'\x00' * 12) == 'image/jpeg'
+        assert sniff_mime_type(b'\x89PNG\r\n\x1a\n' + b'\x00' * 8) == 'image/png'
+        assert sniff_mime_type(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'image/webp'
+
+    def test_unknown_format(self):
+        assert sniff_mime_type(b'fake image data') is None
+
+
+class TestPrepareImage:
+    """前處理流程測試"""
+
+    def test_undecodable_image_is_passed_through(self):
+        prepared = prepare_image(b'fake image data')
+        assert prepared.data == b'fake image data'
+        assert prepared.reencoded is False
+
+    def test_large_image_is_downscaled(self):
+        Image = pytest.importorskip('PIL.Image')
+        buffer = io.BytesIO()
+        Image.new('RGB', (4000, 3000), 'red').save(buffer, format='PNG')
+
+        prepared = prepare_image(buffer.getvalue(), max_edge=1000)
+        assert prepared.reencoded is True
+        assert prepared.mime_type == 'image/jpeg'
+        assert max(Image.open(io.BytesIO(prepared.data)).size) <= 1000
+
+    def test_small_png_keeps_format(self):
+        Image = pytest.importorskip('PIL.Image')
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'red').save(buffer, format='PNG')
+
+        prepared = prepare_image(buffer.getvalue(), max_edge=1000)
+        assert prepared.reencoded is False
+        assert prepared.mime_type == 'image/png'
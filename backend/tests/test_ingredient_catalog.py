@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+食材目錄與 /api/ingredients 路由測試
+"""
+
+import json
+
+import pytest
+
+from services.ingredient_catalog import IngredientCatalog
+
+CATEGORIES = {
+    'vegetables': ['番茄', '洋蔥'],
+    'meat': ['雞肉', 'Bacon'],
+    'others': ['雞蛋', '番茄'],
+}
+
+
+def test_lookup_and_flattened_entries():
+    catalog = IngredientCatalog(CATEGORIES)
+
+    assert catalog.category('雞肉') == 'meat'
+    assert catalog.category('番茄') == 'vegetables'  # 重複時以第一個分類為準
+    assert catalog.category('外星肉') == 'others'
+    assert '雞蛋' in catalog and '外星肉' not in catalog
+    assert len(catalog) == 5
+    assert [entry.name for entry in catalog.entries] == ['番茄', '洋蔥', '雞肉', 'Bacon', '雞蛋', '番茄']
+    assert catalog.entries[3].lowered == 'bacon'
+    assert [entry.name for entry in catalog.entries_for('meat')] == ['雞肉', 'Bacon']
+    assert catalog.entries_for('unknown') == catalog.entries
+
+
+def test_catalog_is_immutable():
+    catalog = IngredientCatalog(CATEGORIES)
+
+    with pytest.raises(AttributeError):
+        catalog.entries = ()
+    with pytest.raises(TypeError):
+        catalog.by_name['新食材'] = 'meat'
+    CATEGORIES['meat'].append('鴨肉')
+    try:
+        assert '鴨肉' not in catalog
+    finally:
+        CATEGORIES['meat'].remove('鴨肉')
+
+
+def test_categories_payload():
+    catalog = IngredientCatalog(CATEGORIES)
+
+    assert json.loads(catalog.categories_payload) == {'success': True, 'categories': CATEGORIES}
+    assert catalog.categories_etag == IngredientCatalog(CATEGORIES).categories_etag
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    return app.test_client()
+
+
+def test_ingredient_routes_are_mounted(client):
+    response = client.get('/api/ingredients/categories')
+    assert response.status_code == 200
+    assert '番茄' in response.get_json()['categories']['vegetables']
+    assert client.get('/api/ingredients/categories',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    results = client.get('/api/ingredients/search?q=雞&category=meat').get_json()['ingredients']
+    assert {'name': '雞肉', 'category': 'meat'} in [{'name': r['name'], 'category': r['category']} for r in results]
+    assert all(item['category'] == 'meat' for item in results)
+
+    validated = client.post('/api/ingredients/validate', json={'ingredients': ['雞蛋', '外星肉']}).get_json()
+    assert [item['valid'] for item in validated['ingredients']] == [True, False]
+
+
+def test_blueprints_keep_nested_prefixes(client):
+    rules = {str(rule) for rule in client.application.url_map.iter_rules()}
+
+    assert '/api/vision/batch-upload' in rules
+    assert '/api/recipes/search' in rules
+    assert '/api/search' not in rules
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+食材合併測試
+"""
+
+from services.ingredient_merge import canonical_ingredient_set, canonical_names, merge_ingredients, normalize_name
+
+
+class TestNormalization:
+    """名稱正規化測試"""
+
+    def test_normalize_name(self):
+        assert normalize_name(' Tomato ') == 'tomato'
+        assert normalize_name('番　茄') == '番茄'
+
+    def test_synonyms_map_to_canonical(self):
+        assert canonical_names.canonical('蕃茄') == '番茄'
+        assert canonical_names.canonical('Eggs') == '雞蛋'
+        assert canonical_names.canonical('龍蝦') == '龍蝦'
+
+
+class TestMergeIngredients:
+    """多圖片合併測試"""
+
+    def test_collapses_duplicates_across_images(self):
+        merged = merge_ingredients([
+            [{'name': '番茄', 'category': 'vegetables', 'confidence': 0.5}],
+            [{'name': '蕃茄', 'category': 'unknown', 'confidence': 0.5}],
+            [{'name': '番茄', 'category': 'vegetables'}, {'name': '雞蛋', 'category': 'others'}],
+        ])
+
+        assert [item['name'] for item in merged] == ['番茄', '雞蛋']
+        tomato = merged[0]
+        assert tomato['count'] == 3
+        assert tomato['category'] == 'vegetables'
+        assert tomato['confidence'] == 1.0
+        assert tomato['aliases'] == ['蕃茄']
+
+    def test_combines_confidence(self):
+        merged = merge_ingredients([
+            [{'name': '蘑菇', 'confidence': 0.5}],
+            [{'name': '洋菇', 'confidence': 0.5}],
+        ])
+        assert merged[0]['confidence'] == 0.75
+        assert merged[0]['category'] == 'unknown'
+
+    def test_skips_blank_names(self):
+        assert merge_ingredients([[{'name': '  '}]]) == []
+
+
+class TestCanonicalIngredientSet:
+    """食材組合標準形式測試"""
+
+    def test_order_and_synonyms_do_not_matter(self):
+        assert canonical_ingredient_set(['蕃茄', ' 蛋 ']) == canonical_ingredient_set(['雞蛋', '番茄', 'Tomato'])
+
+    def test_skips_blank_names(self):
+        assert canonical_ingredient_set(['', '  ', '豆腐']) == ['豆腐']
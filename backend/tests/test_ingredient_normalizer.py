@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+食材名稱正規化引擎測試
+"""
+
+from services.ingredient_merge import canonical_ingredient_set
+from services.ingredient_normalizer import (
+    AMBIGUOUS, EDIT, EXACT, MODIFIER, SYNONYM, UNKNOWN, IngredientNormalizer, edit_distance,
+)
+
+VOCABULARY = {
+    '番茄': 'vegetables',
+    '米飯': 'grains',
+    '雞胸肉': 'meat',
+    '雞肉': 'meat',
+    '豬肉': 'meat',
+    '馬鈴薯': 'vegetables',
+    '帕瑪森起司': 'dairy',
+    '切達起司': 'dairy',
+}
+SYNONYMS = {'番茄': ['蕃茄', 'tomatoes'], '米飯': ['白飯'], '雞胸肉': ['雞胸'], '豆腐': ['tofu']}
+
+
+def normalizer(**kwargs):
+    return IngredientNormalizer(VOCABULARY, SYNONYMS, **kwargs)
+
+
+def test_exact_synonym_and_modifier():
+    engine = normalizer()
+
+    assert engine.resolve('番茄')[1:] == ('番茄', 'vegetables', 1.0, EXACT)
+    assert engine.resolve('蕃茄')[1:] == ('番茄', 'vegetables', 1.0, SYNONYM)
+    assert engine.resolve('白飯').canonical == '米飯'
+    assert engine.resolve('雞胸').canonical == '雞胸肉'
+    assert engine.resolve(' Tomatoes ').canonical == '番茄'
+    assert engine.resolve('TOFU')[1:3] == ('豆腐', 'others')   # 只在同義詞表中的標準名稱
+    assert engine.resolve('新鮮番茄')[1:] == ('番茄', 'vegetables', 0.9, MODIFIER)
+    assert engine.resolve('冷凍雞胸丁').canonical == '雞胸肉'
+    assert engine.resolve('Fresh Tomatoes').method == MODIFIER
+
+
+def test_edit_distance_needs_a_unique_candidate():
+    engine = normalizer()
+
+    typo = engine.resolve('帕瑪森起士')
+    assert (typo.canonical, typo.method, typo.confidence) == ('帕瑪森起司', EDIT, 0.8)
+    assert engine.resolve('tomatoe').canonical == '番茄'
+    # 錯字比對只是建議，canonical() 不採用
+    assert engine.canonical('tomatoe') == 'tomatoe'
+    # 三字以內不做模糊比對（鴨肉不是雞肉、鴨胸肉不是雞胸肉）
+    assert engine.resolve('鴨肉').method == UNKNOWN
+    assert engine.resolve('鴨胸肉').method == UNKNOWN
+    assert engine.resolve('馬玲薯').method == UNKNOWN
+    # 同距離的候選分屬不同食材
+    peppers = IngredientNormalizer({'紅色甜椒': 'vegetables', '黃色甜椒': 'vegetables'}, {})
+    assert peppers.resolve('綠色甜椒').method == AMBIGUOUS
+    assert peppers.resolve('紅色甜叔').canonical == '紅色甜椒'
+    assert engine.resolve('').method == UNKNOWN
+
+
+def test_osa_distance():
+    assert edit_distance('馬鈴薯', '馬玲薯', 2) == 1
+    assert edit_distance('番茄', '茄番', 2) == 1
+    assert edit_distance('abcdef', 'abc', 1) == 2
+    assert edit_distance('kitten', 'sitting', 3) == 3
+
+
+def test_bulk_resolution_and_canonical_threshold():
+    engine = normalizer(min_confidence=0.85)
+
+    results = engine.resolve_many(['蕃茄', '帕瑪森起士', '蕃茄', '外星肉'])
+    assert [result.canonical for result in results] == ['番茄', '帕瑪森起司', '番茄', None]
+    assert results[0] is results[2]
+    # 低於門檻時 canonical() 保留原名
+    assert engine.canonical('帕瑪森起士') == '帕瑪森起士'
+    assert engine.canonical(' 外星肉 ') == '外星肉'
+    assert canonical_ingredient_set(['白飯', '蕃茄', '新鮮番茄'], engine) == ['番茄', '米飯']
+
+    stats = engine.stats()
+    assert stats['method_synonym'] >= 1 and stats['method_edit'] >= 1
+    assert stats['cache_hits'] >= 1
+
+
+def test_different_foods_are_not_merged():
+    from services.ingredient_normalizer import ingredient_normalizer
+
+    for name in ['鴨胸肉', '鴨腿肉', '豬里肌', '花生油', '洋芋片', '蝦片']:
+        assert not ingredient_normalizer.resolve(name).resolved, name
+        assert ingredient_normalizer.canonical(name) == name
+    # 英文短字差一個字母常是不相干的字
+    for name in ['beer', 'beet', 'porn', 'fork', 'park', 'mice', 'rise']:
+        assert not ingredient_normalizer.resolve(name).resolved, name
+        assert ingredient_normalizer.canonical(name) == name
+    # 其他後綴修飾詞仍然適用
+    assert ingredient_normalizer.resolve('紅蘿蔔絲')[1:] == ('紅蘿蔔', 'vegetables', 0.9, MODIFIER)
+
+
+def test_lru_cache_is_bounded():
+    engine = normalizer(cache_size=2)
+    for name in ['番茄', '米飯', '雞肉']:
+        engine.resolve(name)
+    assert engine.stats()['cache_entries'] == 2
+
+
+def test_vision_parser_and_validate_route():
+    from services.recognizers import parse_ingredients
+
+    parsed = parse_ingredients([{'name': '蕃茄'}, {'name': '鴨肉', 'category': 'meat'}, {'name': '新鮮番茄'}, {'name': ''}])
+    assert parsed[0] == {'name': '番茄', 'original': '蕃茄', 'confidence': 1.0, 'category': 'vegetables'}
+    assert parsed[1] == {'name': '鴨肉', 'confidence': 1.0, 'category': 'meat'}
+    # 修飾詞與錯字比對只是推測，不改寫模型回傳的名稱
+    assert parsed[2] == {'name': '新鮮番茄', 'confidence': 1.0, 'category': 'unknown'}
+    assert len(parsed) == 3
+
+    from app import app
+
+    response = app.test_client().post('/api/ingredients/validate', json={'ingredients': ['白飯', '雞胸', '外星肉']})
+    items = response.get_json()['ingredients']
+    assert [(item['canonical'], item['valid']) for item in items] == [('米飯', True), ('雞胸肉', True), (None, False)]
+    assert items[0]['match'] == 'synonym' and items[0]['category'] == 'grains'
+
+
+def test_recipe_cache_key_uses_normalizer():
+    from services.recipe_generation import canonical_request, recipe_cache_key
+
+    assert recipe_cache_key(canonical_request(['蕃茄', '白飯'], {})) == \
+        recipe_cache_key(canonical_request(['米飯', '新鮮番茄'], {}))
+    assert recipe_cache_key(canonical_request(['鴨胸肉'], {})) != recipe_cache_key(canonical_request(['雞胸肉'], {}))
+    assert 'beer' in canonical_request(['beer', 'fish'], {})['ingredients']
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+食材即時搜尋索引測試
+"""
+
+from services.ingredient_search import FUZZY, PREFIX, SUBSTRING, TypeaheadIndex
+
+NAMES = {
+    '雞肉': 'meat',
+    '雞胸肉': 'meat',
+    '火雞肉': 'meat',
+    '雞蛋': 'others',
+    '番茄': 'vegetables',
+    '小番茄乾': 'others',
+    '馬鈴薯': 'vegetables',
+}
+ALIASES = {'番茄': ['蕃茄', 'Tomato'], '馬鈴薯': ['potato'], '不在目錄': ['別名']}
+
+
+def names(matches):
+    return [match.name for match in matches]
+
+
+def test_prefix_before_substring_before_fuzzy():
+    index = TypeaheadIndex(NAMES, ALIASES)
+
+    matches = index.search('雞')
+    assert names(matches) == ['雞肉', '雞蛋', '雞胸肉', '火雞肉']
+    assert [match.match for match in matches] == [PREFIX, PREFIX, PREFIX, SUBSTRING]
+
+    matches = index.search('番茄')
+    assert names(matches) == ['番茄', '小番茄乾']
+    assert [match.match for match in matches] == [PREFIX, SUBSTRING]
+
+
+def test_aliases_and_normalization():
+    index = TypeaheadIndex(NAMES, ALIASES)
+
+    assert index.term_count == len(NAMES) + 3
+    assert names(index.search('蕃')) == ['番茄']
+    assert names(index.search(' TOMA ')) == ['番茄']
+    assert names(index.search('ｐｏｔ')) == ['馬鈴薯']
+    assert index.search('別名') == []
+
+
+def test_fuzzy_matches_typos():
+    index = TypeaheadIndex(NAMES, ALIASES)
+
+    match = index.search('番加')[0]
+    assert (match.name, match.match) == ('番茄', FUZZY)
+    assert 0.3 <= match.score < 1
+    assert names(index.search('potatp')) == ['馬鈴薯']
+    assert index.search('番加', fuzzy=False) == []
+    assert index.search('鮭魚') == []
+
+
+def test_category_filter_and_limit():
+    index = TypeaheadIndex(NAMES, ALIASES)
+
+    assert names(index.search('雞', category='others')) == ['雞蛋']
+    assert names(index.search('番茄', category='others')) == ['小番茄乾']
+    assert names(index.search('雞', category='unknown')) == names(index.search('雞'))
+    assert names(index.search('雞', limit=2)) == ['雞肉', '雞蛋']
+    assert index.search('', limit=5) == [] and index.search('雞', limit=0) == []
+
+
+def test_search_route_ranks_and_limits():
+    from app import app
+
+    client = app.test_client()
+    results = client.get('/api/ingredients/search?q=蕃茄').get_json()['ingredients']
+    assert results[0] == {'name': '番茄', 'category': 'vegetables', 'match': 'prefix', 'score': 1.0}
+    assert len(client.get('/api/ingredients/search?q=肉&limit=3').get_json()['ingredients']) == 3
+    assert client.get('/api/ingredients/search?q=肉&limit=x').status_code == 400
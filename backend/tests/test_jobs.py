@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+非同步工作佇列測試
+"""
+
+import time
+
+import pytest
+
+from services.jobs import EXPIRED, FAILED, SUCCEEDED, InProcessJobBackend, JobManager, QueueFullError
+
+
+class TestJobManager:
+    """行程內工作佇列測試"""
+
+    def test_job_runs_in_background(self):
+        manager = JobManager(InProcessJobBackend(), workers=2)
+        manager.register_handler('double', lambda payload: payload * 2)
+
+        job = manager.submit('double', 21)
+        result = manager.get(job['id'], wait=2)
+
+        assert result['status'] == SUCCEEDED
+        assert result['result'] == 42
+        assert result['timings']['total_ms'] >= 0
+
+    def test_failure_is_recorded(self):
+        manager = JobManager(InProcessJobBackend(), workers=1)
+
+        def boom(_):
+            raise RuntimeError('upstream down')
+
+        manager.register_handler('boom', boom)
+        job = manager.submit('boom', None)
+        result = manager.get(job['id'], wait=2)
+
+        assert result['status'] == FAILED
+        assert 'upstream down' in result['error']
+
+    def test_bounded_queue_depth(self):
+        backend = InProcessJobBackend(max_depth=1)
+        manager = JobManager(backend, workers=0)
+        manager.register_handler('noop', lambda payload: payload)
+
+        manager.submit('noop', 1)
+        with pytest.raises(QueueFullError):
+            manager.submit('noop', 2)
+        assert manager.stats()['rejected'] == 1
+
+    def test_stale_job_expires(self):
+        backend = InProcessJobBackend()
+        manager = JobManager(backend, workers=0, ttl=0.01)
+        manager.register_handler('noop', lambda payload: payload)
+
+        job = manager.submit('noop', 1)
+        time.sleep(0.02)
+        manager._run(*backend.dequeue(timeout=1))
+
+        assert manager.get(job['id'])['status'] == EXPIRED
+
+    def test_unknown_job(self):
+        manager = JobManager(InProcessJobBackend(), workers=0)
+        assert manager.get('missing') is None
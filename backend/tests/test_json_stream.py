@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+增量 JSON 解析測試
+"""
+
+import json
+
+from services.json_stream import IncrementalArrayParser
+
+DOCUMENT = json.dumps({
+    'note': 'recipes [ignored] {',
+    'recipes': [
+        {'name': '番茄炒蛋', 'description': '含 "引號" 與 {括號}', 'main_ingredients': ['番茄', '雞蛋']},
+        {'name': '蛋花湯', 'steps': [{'text': 'a'}], 'time': 10},
+    ],
+    'other': [{'name': 'not a recipe'}],
+}, ensure_ascii=False)
+
+
+class TestIncrementalArrayParser:
+    """串流解析測試"""
+
+    def test_emits_each_item_once_complete(self):
+        parser = IncrementalArrayParser('recipes')
+        emitted = []
+        first_at = None
+        for i, char in enumerate(DOCUMENT):
+            items = parser.feed(char)
+            if items and first_at is None:
+                first_at = i
+            emitted.extend(items)
+
+        assert emitted == json.loads(DOCUMENT)['recipes']
+        # 第一個食譜在文件結束前就已產出
+        assert first_at < DOCUMENT.index('蛋花湯')
+
+    def test_arbitrary_chunk_sizes(self):
+        for size in (1, 3, 7, 64, len(DOCUMENT)):
+            parser = IncrementalArrayParser('recipes')
+            emitted = []
+            for start in range(0, len(DOCUMENT), size):
+                emitted.extend(parser.feed(DOCUMENT[start:start + size]))
+            assert [item['name'] for item in emitted] == ['番茄炒蛋', '蛋花湯']
+            assert parser.count == 2
+
+    def test_ignores_other_keys(self):
+        parser = IncrementalArrayParser('recipes')
+        assert parser.feed('{"items": [{"a": 1}], "recipes": []}') == []
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+LLM 閘道測試（假 client，不呼叫 OpenAI API）
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services.llm_gateway import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, GatewayTimeout, LLMGateway, is_retryable
+)
+from services.metrics import LatencyHistogram
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def completion(content='{}', prompt_tokens=10, completion_tokens=5):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+class FakeClient:
+    """依序回傳 outcomes 中的結果；例外則拋出"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_gateway(outcomes, **kwargs):
+    sleeps = []
+    kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=3, cooldown=30))
+    gateway = LLMGateway(client=FakeClient(outcomes), sleep=sleeps.append, backoff_base=0.1, **kwargs)
+    return gateway, sleeps
+
+
+def test_retryable_errors():
+    assert is_retryable(UpstreamError(429))
+    assert is_retryable(UpstreamError(503))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(UpstreamError(400))
+    assert not is_retryable(ValueError())
+
+
+def test_retries_then_succeeds_and_records_usage():
+    gateway, sleeps = make_gateway([UpstreamError(500), UpstreamError(429, retry_after=2), completion()])
+
+    response = gateway.chat('gpt-test', [{'role': 'user', 'content': 'hi'}])
+
+    assert response.choices[0].message.content == '{}'
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.1
+    assert sleeps[1] == 2  # 遵守 Retry-After
+    stats = gateway.stats()['models']['gpt-test']
+    assert stats['calls'] == 3
+    assert stats['retries'] == 2
+    assert stats['rate_limited'] == 1
+    assert stats['succeeded'] == 1
+    assert stats['prompt_tokens'] == 10
+    assert stats['completion_tokens'] == 5
+    assert stats['latency']['count'] == 1
+    assert gateway.call_count() == 3
+    assert gateway.limiter.in_flight == 0
+
+
+def test_client_errors_are_not_retried():
+    gateway, sleeps = make_gateway([UpstreamError(400)])
+
+    with pytest.raises(UpstreamError):
+        gateway.chat('gpt-test', [])
+    assert sleeps == []
+    assert gateway.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_retries():
+    gateway, sleeps = make_gateway([UpstreamError(502)] * 3, max_retries=2)
+
+    with pytest.raises(UpstreamError):
+        gateway.chat('gpt-test', [])
+    assert len(sleeps) == 2
+    assert gateway.stats()['models']['gpt-test']['failed'] == 1
+
+
+def test_circuit_opens_and_recovers_after_cooldown():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10, clock=lambda: now[0])
+    gateway, _ = make_gateway([UpstreamError(503), UpstreamError(503), completion()],
+                              breaker=breaker, max_retries=0)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            gateway.chat('gpt-test', [])
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        gateway.chat('gpt-test', [])
+    assert len(gateway.client.calls) == 2
+
+    now[0] = 11
+    gateway.chat('gpt-test', [])
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert gateway.stats()['rejected']['circuit_open'] == 1
+
+
+def test_half_open_allows_single_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=5, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 6
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def half_open_gateway(outcomes, **kwargs):
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=5, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 6
+    return make_gateway(outcomes, breaker=breaker, **kwargs)[0]
+
+
+def test_half_open_probe_released_on_queue_timeout():
+    limiter = AdaptiveLimiter(minimum=1, maximum=1)
+    gateway = half_open_gateway([completion()], limiter=limiter)
+    assert limiter.acquire(0.1)
+
+    with pytest.raises(GatewayTimeout):
+        gateway.chat('gpt-test', [], timeout=0.05)
+    assert gateway.breaker.state == CircuitBreaker.HALF_OPEN
+    limiter.release()
+
+    gateway.chat('gpt-test', [])
+    assert gateway.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_released_on_stream_close():
+    chunk = SimpleNamespace(choices=[], usage=None)
+    gateway = half_open_gateway([iter([chunk] * 3), iter([chunk] * 3)])
+
+    # 被對沖取消（其他執行緒 close()）與提前關閉都沒有上游結果
+    first = gateway.chat('gpt-test', [], stream=True)
+    first.close()
+    with pytest.raises(StopIteration):
+        next(first)
+    assert gateway.breaker.allow()
+    gateway.breaker.release_probe()
+
+    second = gateway.chat('gpt-test', [], stream=True)
+    assert len(list(second)) == 3
+    assert gateway.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_limiter_aimd():
+    limiter = AdaptiveLimiter(minimum=2, maximum=8, target_latency=1)
+
+    limiter.on_overload()
+    assert limiter.limit == 4
+    limiter.on_success(5)
+    assert limiter.limit == pytest.approx(3.6)
+    for _ in range(10):
+        limiter.on_success(0.1)
+    assert limiter.limit > 5
+
+    limiter.limit = 1
+    assert limiter.acquire(0.1)
+    assert not limiter.acquire(0.05)  # 已達上限，排隊逾時
+    limiter.release()
+
+
+def test_stream_holds_slot_until_consumed():
+    chunks = [
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='{"a"'))], usage=None),
+        SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3)),
+    ]
+    gateway, _ = make_gateway([iter(chunks)])
+
+    stream = gateway.chat('gpt-test', [], stream=True)
+    assert gateway.client.calls[0]['stream_options'] == {'include_usage': True}
+    assert gateway.limiter.in_flight == 1
+    assert len(list(stream)) == 2
+    assert gateway.limiter.in_flight == 0
+
+    stats = gateway.stats()['models']['gpt-test']
+    assert stats['succeeded'] == 1
+    assert stats['prompt_tokens'] == 7
+
+
+def test_stream_close_releases_slot():
+    gateway, _ = make_gateway([iter([SimpleNamespace(choices=[], usage=None)] * 3)])
+
+    stream = gateway.chat('gpt-test', [], stream=True)
+    next(stream)
+    stream.close()
+    stream.close()
+    assert gateway.limiter.in_flight == 0
+    assert gateway.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram(buckets=(0.1, 1, 10))
+    for seconds in [0.05] * 50 + [0.5] * 45 + [5] * 4 + [50]:
+        histogram.observe(seconds)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['p50_seconds'] == 0.1
+    assert snapshot['p95_seconds'] == 1
+    assert snapshot['p99_seconds'] == 10
+    assert snapshot['buckets']['le_0.1'] == 50
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+微批次測試
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from services.micro_batch import MicroBatcher
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_share_one_batch():
+    batches = []
+    singles = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    def run_single(item):
+        singles.append(item)
+        return item * 10
+
+    batcher = MicroBatcher('test', run_batch, run_single, window=0.2, max_batch=4)
+    results = run_concurrently(4, batcher.submit)
+
+    assert results == [0, 10, 20, 30]
+    assert len(batches) == 1 and sorted(batches[0]) == [0, 1, 2, 3]
+    assert singles == []
+    stats = batcher.stats()
+    assert stats['batches'] == 1
+    assert stats['avg_batch_size'] == 4
+    assert stats['completed'] == 4
+    assert stats['queue_delay']['count'] == 4
+
+
+def test_window_closes_without_full_batch():
+    batcher = MicroBatcher('test', lambda items: items, lambda item: ('single', item), window=0.02, max_batch=8)
+
+    started = time.monotonic()
+    assert batcher.submit('only') == ('single', 'only')
+    assert time.monotonic() - started < 1
+    assert batcher.stats()['singles'] == 1
+
+
+def test_malformed_entries_fall_back_per_request():
+    def run_batch(items):
+        return [None if item % 2 else item for item in items]
+
+    batcher = MicroBatcher('test', run_batch, lambda item: -item, window=0.2, max_batch=4)
+    results = run_concurrently(4, batcher.submit)
+
+    assert results == [0, -1, 2, -3]
+    stats = batcher.stats()
+    assert stats['fallbacks'] == 2
+    assert stats['fallback_rate'] == 0.5
+
+
+def test_batch_error_falls_back_for_everyone():
+    def run_batch(items):
+        raise RuntimeError('batched call failed')
+
+    batcher = MicroBatcher('test', run_batch, lambda item: item + 100, window=0.2, max_batch=3)
+    assert run_concurrently(3, batcher.submit) == [100, 101, 102]
+    assert batcher.stats()['batch_errors'] == 1
+
+
+def test_tokens_per_request():
+    tokens = [1000]
+    batcher = MicroBatcher('test', lambda items: items, lambda item: item, window=0.01, max_batch=2,
+                           token_counter=lambda: tokens[0])
+    batcher.submit(1)
+    tokens[0] += 300
+    assert batcher.stats()['tokens_per_request'] == 300
+
+
+def test_parse_recipe_batch():
+    from services.recipe_generation import parse_recipe_batch
+
+    content = json.dumps({'results': [
+        {'index': 2, 'recipes': [{'name': '蔥油餅'}]},
+        {'index': 1, 'recipes': [{'name': ''}]},
+        {'index': 9, 'recipes': [{'name': '越界'}]},
+    ]}, ensure_ascii=False)
+
+    assert parse_recipe_batch(3)(content) == [None, [{'name': '蔥油餅'}], None]
+    with pytest.raises(ValueError):
+        parse_recipe_batch(2)(json.dumps({'results': []}))
+    with pytest.raises(ValueError):
+        parse_recipe_batch(2)('not json')
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+分層模型路由測試（假閘道，不呼叫 OpenAI API）
+"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.metrics import LatencyHistogram
+from services.model_router import HedgePolicy, ModelRouter, Tier, parse_tiers
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, parts, delay):
+        self.parts = list(parts)
+        self.delay = delay
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for part in self.parts:
+            if self.closed.wait(self.delay):
+                raise ConnectionError('stream closed')
+            yield chunk(part)
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeGateway:
+    """依模型回傳預設內容；delays 依呼叫順序決定每塊之間的延遲"""
+
+    def __init__(self, outputs, delays=None):
+        self.outputs = outputs
+        self.delays = list(delays or [])
+        self.calls = []
+        self.streams = []
+        self._lock = threading.Lock()
+
+    def chat(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls.append((model, kwargs))
+            delay = self.delays.pop(0) if self.delays else 0
+        output = self.outputs[model]
+        if isinstance(output, Exception):
+            raise output
+        fake = FakeStream([output[:len(output) // 2], output[len(output) // 2:]], delay)
+        self.streams.append(fake)
+        return fake
+
+
+def parse(content):
+    data = json.loads(content)
+    if not data.get('recipes'):
+        raise ValueError('no recipes')
+    return data['recipes']
+
+
+GOOD = json.dumps({'recipes': [{'name': '番茄炒蛋'}]}, ensure_ascii=False)
+EMPTY = json.dumps({'recipes': []})
+TIERS = [Tier('fast', 500), Tier('strong', 1000)]
+
+
+def test_parse_tiers():
+    assert parse_tiers('gpt-4o-mini, gpt-4o:1200', 1000) == [Tier('gpt-4o-mini', 1000), Tier('gpt-4o', 1200)]
+    with pytest.raises(ValueError):
+        parse_tiers(' , ', 1000)
+
+
+def test_fast_tier_serves_valid_output():
+    gateway = FakeGateway({'fast': GOOD, 'strong': GOOD})
+    router = ModelRouter(TIERS, HedgePolicy('off'), gateway=gateway)
+
+    recipes, tier = router.complete([], parse)
+
+    assert tier.model == 'fast'
+    assert recipes == [{'name': '番茄炒蛋'}]
+    assert gateway.calls == [('fast', {'max_tokens': 500})]
+    stats = router.stats()['by_tier']
+    assert stats['fast']['served'] == 1
+    assert stats['fast']['escalation_rate'] == 0.0
+
+
+def test_escalates_on_invalid_output_and_errors():
+    gateway = FakeGateway({'fast': EMPTY, 'strong': GOOD})
+    router = ModelRouter(TIERS, HedgePolicy('off'), gateway=gateway)
+
+    _, tier = router.complete([], parse)
+    assert tier.model == 'strong'
+
+    gateway.outputs['fast'] = TimeoutError('upstream timeout')
+    _, tier = router.complete([], parse)
+    assert tier.model == 'strong'
+
+    stats = router.stats()['by_tier']
+    assert stats['fast']['escalated_invalid'] == 1
+    assert stats['fast']['escalated_error'] == 1
+    assert stats['fast']['escalation_rate'] == 1.0
+    assert stats['strong']['served'] == 2
+
+
+def test_last_tier_failure_raises():
+    gateway = FakeGateway({'fast': EMPTY, 'strong': EMPTY})
+    router = ModelRouter(TIERS, HedgePolicy('off'), gateway=gateway)
+
+    with pytest.raises(ValueError):
+        router.complete([], parse)
+
+
+def test_hedge_wins_and_cancels_slow_request():
+    # 第一個請求每塊 1 秒，對沖請求立即完成
+    gateway = FakeGateway({'fast': GOOD}, delays=[1.0, 0])
+    router = ModelRouter([Tier('fast', 500)], HedgePolicy('0.05', min_delay=0.05), gateway=gateway)
+
+    started = time.monotonic()
+    recipes, _ = router.complete([], parse)
+
+    assert time.monotonic() - started < 0.8
+    assert recipes == [{'name': '番茄炒蛋'}]
+    assert len(gateway.calls) == 2
+    assert gateway.streams[0].closed.wait(1)
+    stats = router.stats()['by_tier']['fast']
+    assert stats['hedged'] == 1
+    assert stats['hedge_wins'] == 1
+    assert stats['cancelled'] == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    gateway = FakeGateway({'fast': GOOD})
+    router = ModelRouter([Tier('fast', 500)], HedgePolicy('1', min_delay=1), gateway=gateway)
+
+    router.complete([], parse)
+    assert len(gateway.calls) == 1
+    assert router.stats()['by_tier']['fast']['hedged'] == 0
+
+
+def test_p95_policy_needs_samples():
+    policy = HedgePolicy('p95', min_samples=10, min_delay=0.5)
+    latency = LatencyHistogram(buckets=(1, 2, 4))
+    assert policy.delay(latency) is None
+
+    for _ in range(20):
+        latency.observe(1.5)
+    assert policy.delay(latency) == 2
+    assert HedgePolicy('off').delay(latency) is None
+    with pytest.raises(ValueError):
+        HedgePolicy('sometimes')
+
+
+def test_hedging_is_off_unless_enabled(monkeypatch):
+    from services.model_router import create_router
+
+    monkeypatch.delenv('TEST_HEDGE', raising=False)
+    assert create_router('test', 'TEST', 'fast', 500).stats()['hedge'] == 'off'
+    monkeypatch.setenv('TEST_HEDGE', 'p95')
+    assert create_router('test', 'TEST', 'fast', 500).stats()['hedge'] == 'p95'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+本地營養資料庫測試
+"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from services.ingredient_normalizer import ingredient_normalizer  # noqa: E402
+from services.nutrition import (  # noqa: E402
+    NUTRIENTS, NUTRITION_CSV_PATH, Amount, NutritionTable, parse_amount,
+)
+
+CSV = """name,calories,protein,carbs,fat,fiber,sodium,unit_grams
+番茄,20,1,4,0,1,5,150
+雞蛋,140,12,1,10,0,140,50
+米飯,130,3,28,0,0,1,200
+"""
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / 'nutrition.csv'
+    path.write_text(CSV, encoding='utf-8')
+    return NutritionTable.from_csv(str(path), str(tmp_path / 'cache'))
+
+
+def test_parse_amount():
+    assert parse_amount('200g') == Amount(200, 1.0)
+    assert parse_amount(' 2 大匙') == Amount(2, 15.0)
+    assert parse_amount('1000ml') == Amount(1000, 1.0)
+    assert parse_amount('1/4顆') == Amount(0.25, None)
+    assert parse_amount('2-3個') == Amount(2.5, None)
+    assert parse_amount('兩個') == Amount(2, None)
+    assert parse_amount('半碗') == Amount(0.5, 200.0)
+    assert parse_amount('3') is None
+    assert parse_amount('200') is None
+    assert parse_amount('適量') is None
+    assert parse_amount('2盒') is None
+    assert parse_amount('1/0個') is None
+
+
+def test_columnar_memory_mapped_lookup(table, tmp_path):
+    assert table.mapped
+    assert isinstance(table.columns, np.memmap)
+    assert table.columns.shape == (len(NUTRIENTS) + 1, 3)
+    assert table.lookup('雞蛋') == {'calories': 140, 'protein': 12, 'carbs': 1, 'fat': 10, 'fiber': 0, 'sodium': 140}
+    assert table.unit_grams('番茄') == 150
+    assert table.lookup('外星肉') is None and table.position('外星肉') == -1
+
+    # 第二個 worker 直接 mmap 同一個檔案
+    again = NutritionTable.from_csv(str(tmp_path / 'nutrition.csv'), str(tmp_path / 'cache'))
+    assert again.columns.filename == table.columns.filename
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_batch_recipe_totals(table):
+    recipes = [
+        [{'name': '蕃茄', 'amount': '2個'}, {'name': '雞蛋', 'amount': '100g'}, {'name': '鹽', 'amount': '適量'}],
+        [{'name': '白飯', 'amount': '1碗'}, '雞蛋'],
+        [],
+        'not a list',
+    ]
+    results = table.recipe_nutrition(recipes)
+
+    # 番茄 300 g + 雞蛋 100 g
+    assert results[0]['calories'] == 60 + 140
+    assert results[0]['protein'] == 3 + 12
+    assert (results[0]['matched'], results[0]['ingredients']) == (2, 3)
+    # 白飯 -> 米飯 200 g；沒有份量的食材不計入
+    assert results[1]['calories'] == 260
+    assert (results[1]['matched'], results[1]['ingredients']) == (1, 2)
+    assert results[2]['calories'] == 0 and results[3]['ingredients'] == 0
+
+
+def test_unitless_amounts_and_fuzzy_names_are_not_counted(table):
+    [bare, fuzzy] = table.recipe_nutrition([
+        [{'name': '雞蛋', 'amount': 200}, {'name': '雞蛋', 'amount': '200'}],
+        [{'name': 'beer', 'amount': '200g'}, {'name': '新鮮番茄', 'amount': '100g'}],
+    ])
+    assert (bare['calories'], bare['matched']) == (0, 0)
+    assert (fuzzy['calories'], fuzzy['matched']) == (0, 0)
+
+
+def test_vectorized_totals_match_per_recipe_sums(table):
+    rng = np.random.default_rng(0)
+    recipe_ids = rng.integers(0, 50, size=400)
+    positions = rng.integers(0, 3, size=400)
+    grams = rng.uniform(1, 300, size=400)
+
+    totals = table.totals(recipe_ids, positions, grams, 50)
+    expected = np.zeros((50, len(NUTRIENTS)))
+    for recipe, position, weight in zip(recipe_ids, positions, grams):
+        expected[recipe] += np.asarray(table.columns[:len(NUTRIENTS), position], dtype=np.float64) * weight / 100
+    assert np.allclose(totals, expected, rtol=1e-5)
+
+
+def test_bundled_csv_covers_vocabulary(tmp_path):
+    bundled = NutritionTable.from_csv(NUTRITION_CSV_PATH, str(tmp_path))
+    assert set(ingredient_normalizer.vocabulary) <= set(bundled.names)
+
+
+def test_nutrition_routes():
+    from app import app
+
+    client = app.test_client()
+    nutrition = client.get('/api/ingredients/nutrition/蕃茄').get_json()['nutrition']
+    assert nutrition['canonical'] == '番茄' and nutrition['calories_per_100g'] == 18
+    assert client.get('/api/ingredients/nutrition/外星肉').status_code == 404
+
+    response = client.post('/api/ingredients/nutrition', json={'recipes': [
+        {'ingredients': [{'name': '雞蛋', 'amount': '2個'}]},
+        [{'name': '米飯', 'amount': '100g'}],
+    ]})
+    assert [item['calories'] for item in response.get_json()['nutrition']] == [143, 130]
+    assert client.post('/api/ingredients/nutrition', json={'recipes': []}).status_code == 400
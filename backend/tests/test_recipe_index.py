@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+食材倒排索引測試
+"""
+
+import random
+
+import pytest
+
+from services import recipe_index
+from services.recipe_index import RecipeIndex
+
+
+def make_recipe(recipe_id, names, cooking_time=15, difficulty='簡單', cuisine='中式'):
+    return {
+        'id': str(recipe_id),
+        'name': f'recipe-{recipe_id}',
+        'ingredients': [{'name': name, 'amount': ''} for name in names],
+        'cooking_time': cooking_time,
+        'difficulty': difficulty,
+        'cuisine': cuisine,
+    }
+
+
+RECIPES = [
+    make_recipe(1, ['番茄', '雞蛋']),
+    make_recipe(2, ['番茄', '雞蛋', '蔥'], cooking_time=10),
+    make_recipe(3, ['番茄', '牛肉', '洋蔥', '馬鈴薯'], cooking_time=60, difficulty='中等', cuisine='西式'),
+    make_recipe(4, ['雞蛋']),
+    make_recipe(5, ['豆腐', '蔥']),
+]
+
+
+def brute_force(recipes, ingredients):
+    """逐筆計算 (coverage, matched) 作為對照"""
+    user = set(ingredients)
+    results = []
+    for recipe in recipes:
+        names = {item['name'] for item in recipe['ingredients']}
+        matched = len(names & user)
+        if matched:
+            results.append((matched / len(names), matched, -len(names), recipe['id']))
+    return sorted(results, reverse=True)
+
+
+class TestRecipeIndex:
+    """查詢與排序測試"""
+
+    def test_coverage_ranking(self):
+        index = RecipeIndex(RECIPES)
+        hits = index.query(['蕃茄', '蛋'], k=10)
+        assert [hit.recipe['id'] for hit in hits[:2]] in (['1', '4'], ['4', '1'])
+        assert [hit.recipe['id'] for hit in hits[2:]] == ['2', '3']
+        assert hits[2].missing == ['蔥']
+        assert hits[2].coverage == pytest.approx(2 / 3)
+
+    def test_missing_and_jaccard_rankings(self):
+        index = RecipeIndex(RECIPES)
+        assert index.query(['番茄', '雞蛋', '蔥'], ranking='missing', k=1)[0].recipe['id'] in ('1', '2', '4')
+        best = index.query(['番茄', '雞蛋', '蔥'], ranking='jaccard', k=1)[0]
+        assert best.recipe['id'] == '2'
+        assert best.jaccard(3) == 1.0
+
+    def test_filters(self):
+        index = RecipeIndex(RECIPES)
+        assert [hit.recipe['id'] for hit in index.query(['番茄'], cooking_time=10)] == ['2']
+        assert [hit.recipe['id'] for hit in index.query(['番茄'], cuisine='西式')] == ['3']
+        assert index.query(['番茄'], difficulty='困難') == []
+        assert index.query(['番茄'], cooking_time=5) == []
+
+    def test_thresholds_and_top_k(self):
+        index = RecipeIndex(RECIPES)
+        assert all(hit.coverage >= 0.6 for hit in index.query(['番茄', '雞蛋'], min_coverage=0.6))
+        assert all(len(hit.missing) <= 1 for hit in index.query(['番茄', '雞蛋'], max_missing=1))
+        assert len(index.query(['番茄', '雞蛋'], k=2)) == 2
+        assert index.query(['龍蝦']) == []
+
+    def test_matches_brute_force_with_sparse_postings(self, monkeypatch):
+        # 使用較高的門檻讓部分食材以排序陣列保存
+        monkeypatch.setattr(recipe_index, 'DENSE_RATIO', 4)
+        rng = random.Random(3)
+        vocabulary = [f'食材{i}' for i in range(40)]
+        recipes = [
+            make_recipe(i, rng.sample(vocabulary[:10] if i % 2 else vocabulary, rng.randint(1, 6)))
+            for i in range(300)
+        ]
+        index = RecipeIndex(recipes)
+        assert index.stats()['sparse_postings'] > 0
+
+        for _ in range(20):
+            query = rng.sample(vocabulary, 5)
+            expected = brute_force(recipes, query)
+            hits = index.query(query, k=len(recipes))
+            assert [(hit.coverage, hit.matched, -hit.size) for hit in hits] == [item[:3] for item in expected]
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'snapshot' / 'recipes.json')
+        RecipeIndex.write_snapshot(RECIPES, path)
+        index = RecipeIndex.from_snapshot(path)
+        assert len(index) == len(RECIPES)
+        assert index.query(['豆腐'])[0].recipe['id'] == '5'
+
+
+def test_index_scorer_and_request_key_share_the_normalizer():
+    from services.recipe_generation import canonical_request
+    from services.recipe_store import score_recipe
+
+    recipe = make_recipe(1, ['新鮮番茄', '雞蛋'])
+    ingredients = canonical_request(['番茄', '蛋'], {})['ingredients']
+
+    [hit] = RecipeIndex([recipe]).query(ingredients)
+    assert hit.coverage == 1.0 and hit.missing == []
+    scored = score_recipe(recipe, ingredients)
+    assert scored.coverage == 1.0 and scored.missing == []
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+生成食譜寫回測試（記憶體 sink，不連線資料庫）
+"""
+
+from services.recipe_persist import (
+    RecipeWriter, generated_recipe_id, parse_recipe_id, recipe_fingerprint, recipe_public_id,
+    recipe_row
+)
+
+
+class MemorySink:
+    name = 'memory'
+
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+
+    def write(self, rows):
+        self.batches.append(len(rows))
+        inserted = []
+        for row in rows:
+            if row['fingerprint'] not in self.rows:
+                row = dict(row, id=str(len(self.rows) + 1))
+                self.rows[row['fingerprint']] = row
+                inserted.append(row)
+        return inserted
+
+
+class FlakySink(MemorySink):
+    """第一次寫入失敗（資料庫暫時無法連線）"""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    def write(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('database unavailable')
+        return super().write(rows)
+
+
+class MemoryEmbedder:
+    name = 'memory'
+
+    def __init__(self):
+        self.ids = []
+
+    def write(self, rows):
+        self.ids.extend(row['id'] for row in rows)
+        return rows
+
+
+TOMATO_EGG = {'name': '番茄炒蛋', 'time': '15', 'difficulty': '簡單', 'main_ingredients': ['番茄', '雞蛋']}
+
+
+def test_fingerprint_is_stable_across_spelling():
+    variant = {'name': '番茄 炒蛋', 'main_ingredients': [{'name': '雞蛋'}, {'name': '番茄'}, '番茄']}
+
+    assert recipe_fingerprint(TOMATO_EGG) == recipe_fingerprint(variant)
+    assert generated_recipe_id(TOMATO_EGG).startswith('gen-')
+    assert recipe_fingerprint(dict(TOMATO_EGG, name='番茄蛋花湯')) != recipe_fingerprint(TOMATO_EGG)
+
+
+def test_public_id_matches_generated_id():
+    row = dict(recipe_row(TOMATO_EGG), id='42')
+    assert recipe_public_id(row) == generated_recipe_id(TOMATO_EGG)
+    assert parse_recipe_id(generated_recipe_id(TOMATO_EGG)) == ('fingerprint', row['fingerprint'])
+    # 未經生成的食譜（沒有指紋）使用資料庫 id
+    assert recipe_public_id({'id': '7', 'fingerprint': None}) == 'db-7'
+    assert parse_recipe_id('db-7') == ('id', '7')
+    assert parse_recipe_id('7') is None and parse_recipe_id('x-7') is None
+
+
+def test_recipe_row_defaults():
+    row = recipe_row({'name': '炒青菜', 'main_ingredients': ['青菜'], 'difficulty': '很難', 'time': 'soon'},
+                     {'cuisine': '中式'})
+
+    assert row['ingredients'] == [{'name': '青菜'}]
+    assert row['cooking_time'] == 0
+    assert row['difficulty'] == '中等'
+    assert row['cuisine'] == '中式'
+    assert row['steps'] == []
+
+
+def test_writer_dedups_batches_and_embeds():
+    sink, embedder = MemorySink(), MemoryEmbedder()
+    writer = RecipeWriter(sink, embedder, batch_size=10, interval=0.05)
+
+    writer.submit([TOMATO_EGG, dict(TOMATO_EGG, name='番茄 炒蛋'), {'name': '', 'main_ingredients': ['蔥']}])
+    writer.submit([TOMATO_EGG, {'name': '蔥油餅', 'main_ingredients': ['蔥', '麵粉']}])
+    assert writer.flush(5)
+
+    assert len(sink.rows) == 2
+    assert sorted(embedder.ids) == ['1', '2']
+    stats = writer.stats()
+    assert stats['duplicates'] == 2
+    assert stats['written'] == 2
+    assert stats['embedded'] == 2
+    assert stats['persist_queue']['processed'] == 2
+
+
+def test_failed_write_can_be_resubmitted():
+    sink = FlakySink()
+    writer = RecipeWriter(sink, batch_size=10, interval=0.05)
+
+    assert writer.submit([TOMATO_EGG]) == 1
+    assert writer.flush(5)
+    assert sink.rows == {}
+    assert writer.writer.stats()['failed_batches'] == 1
+
+    assert writer.submit([TOMATO_EGG]) == 1
+    assert writer.flush(5)
+    assert len(sink.rows) == 1
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+本地食譜檢索測試
+"""
+
+from services.recipe_store import (
+    RecipeStore, SearchStats, matches_preferences, retrieve_recipes, score_recipe
+)
+
+
+def make_recipe(recipe_id, names, cooking_time=15, difficulty='簡單', cuisine='中式'):
+    return {
+        'id': str(recipe_id),
+        'name': f'recipe-{recipe_id}',
+        'description': '',
+        'ingredients': [{'name': name, 'amount': '', 'category': ''} for name in names],
+        'steps': [],
+        'cooking_time': cooking_time,
+        'difficulty': difficulty,
+        'cuisine': cuisine,
+    }
+
+
+class ListStore(RecipeStore):
+    """固定候選清單"""
+
+    name = 'list'
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def candidates(self, ingredients, limit, preferences=None):
+        return self.recipes[:limit]
+
+
+class TestScoring:
+    """覆蓋率評分測試"""
+
+    def test_synonyms_count_as_covered(self):
+        scored = score_recipe(make_recipe(1, ['蕃茄', '蛋', '蔥']), ['番茄', '雞蛋'])
+        assert round(scored.coverage, 4) == 0.6667
+        assert scored.usage == 1.0
+        assert scored.missing == ['蔥']
+
+    def test_preferences_are_hard_filters(self):
+        recipe = make_recipe(1, ['番茄'], cooking_time=40)
+        assert not matches_preferences(recipe, {'cooking_time': '30'})
+        assert matches_preferences(recipe, {'cooking_time': '45', 'cuisine': '中式'})
+        assert not matches_preferences(recipe, {'difficulty': '困難'})
+
+
+class TestRetrieval:
+    """檢索門檻與排序測試"""
+
+    def test_returns_best_recipes_above_threshold(self):
+        store = ListStore([
+            make_recipe(1, ['番茄', '雞蛋', '蔥']),
+            make_recipe(2, ['番茄', '雞蛋']),
+            make_recipe(3, ['牛肉', '洋蔥', '番茄']),
+        ])
+        results = retrieve_recipes(store, ['番茄', '雞蛋'], {}, limit=3, min_coverage=0.6, min_score=0.5)
+        assert [item.recipe['id'] for item in results] == ['2', '1']
+
+    def test_limit_and_preferences(self):
+        store = ListStore([make_recipe(i, ['番茄'], cuisine='西式' if i % 2 else '中式') for i in range(6)])
+        results = retrieve_recipes(store, ['番茄'], {'cuisine': '中式'}, limit=2)
+        assert len(results) == 2
+        assert all(item.recipe['cuisine'] == '中式' for item in results)
+
+
+class TestSearchStats:
+    """路徑統計測試"""
+
+    def test_llm_skipped_rate(self):
+        stats = SearchStats()
+        stats.record(3, 0)
+        stats.record(1, 2)
+        stats.record(0, 3)
+        stats.record(3, 0)
+        snapshot = stats.stats()
+        assert snapshot['retrieval_only'] == 2
+        assert snapshot['mixed'] == 1
+        assert snapshot['llm_only'] == 1
+        assert snapshot['llm_skipped_rate'] == 0.5
+
+
+def test_index_store_resolves_public_ids(tmp_path):
+    from services.recipe_index import RecipeIndex
+    from services.recipe_store import IndexRecipeStore
+
+    generated = dict(make_recipe(2, ['番茄', '雞蛋']), fingerprint='abc123')
+    path = str(tmp_path / 'recipes.json')
+    RecipeIndex.write_snapshot([make_recipe(1, ['豆腐']), generated], path)
+    store = IndexRecipeStore(path)
+
+    assert store.get('gen-abc123')['id'] == '2'
+    assert store.get('db-1')['name'] == 'recipe-1'
+    assert store.get('db-2') is None   # 生成的食譜只以 gen- id 對外
+    assert store.get('gen-missing') is None
+
+
+def test_recipe_route_reopens_generated_id(monkeypatch):
+    from app import app
+    import routes.recipes as recipe_routes
+
+    generated = dict(make_recipe(2, ['番茄', '雞蛋']), fingerprint='abc123')
+
+    class OneRecipeStore(ListStore):
+        def get(self, recipe_id):
+            return generated if recipe_id == 'gen-abc123' else None
+
+    client = app.test_client()
+    monkeypatch.setattr(recipe_routes, 'recipe_store', OneRecipeStore([generated]))
+    recipe = client.get('/api/recipes/gen-abc123').get_json()['recipe']
+    assert recipe['id'] == 'gen-abc123' and recipe['main_ingredients'] == ['番茄', '雞蛋']
+    assert client.get('/api/recipes/gen-unknown').status_code == 404
+
+    monkeypatch.setattr(recipe_routes, 'recipe_store', None)
+    assert client.get('/api/recipes/gen-abc123').status_code == 503
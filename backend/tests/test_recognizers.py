@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+識別後端測試
+"""
+
+import json
+import time
+
+from services.recognizers import (
+    LatencyModel, RecordingRecognizer, Recognizer, ReplayRecognizer, create_recognizer, image_digest
+)
+
+TOMATO = [{'name': '番茄', 'confidence': 1.0, 'category': 'vegetables'}]
+
+
+class FixedRecognizer(Recognizer):
+    """固定回傳結果的後端"""
+
+    name = 'fixed'
+
+    def recognize(self, image, prepared=None):
+        return [dict(item, name=f"{item['name']}:{len(image)}") for item in TOMATO]
+
+
+class TestLatencyModel:
+    """延遲分佈測試"""
+
+    def test_none_and_fixed(self):
+        assert LatencyModel('none').sample() == 0.0
+        assert LatencyModel('fixed:0.25').sample() == 0.25
+
+    def test_seeded_samples_are_reproducible(self):
+        first = LatencyModel('lognormal:0.5,0.3', seed='7')
+        second = LatencyModel('lognormal:0.5,0.3', seed='7')
+        assert [first.sample() for _ in range(5)] == [second.sample() for _ in range(5)]
+
+    def test_uniform_within_bounds(self):
+        model = LatencyModel('uniform:0.1,0.2', seed='1')
+        assert all(0.1 <= model.sample() <= 0.2 for _ in range(100))
+
+
+class TestReplayRecognizer:
+    """重播後端測試"""
+
+    def test_replays_by_image_hash(self, tmp_path):
+        path = tmp_path / 'vision.json'
+        path.write_text(json.dumps({image_digest(b'tomato'): TOMATO}), encoding='utf-8')
+        recognizer = ReplayRecognizer(str(path), latency='none')
+
+        assert recognizer.recognize(b'tomato') == TOMATO
+        assert recognizer.recognize(b'unknown') == []
+        assert recognizer.recognize_packed([b'unknown', b'tomato'], [None, None]) == [[], TOMATO]
+        stats = recognizer.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 2
+        assert stats['calls'] == 3
+
+    def test_simulates_latency(self, tmp_path):
+        recognizer = ReplayRecognizer(str(tmp_path / 'missing.json'), latency='fixed:0.05')
+        started = time.perf_counter()
+        recognizer.recognize(b'image')
+        assert time.perf_counter() - started >= 0.05
+
+    def test_results_are_copies(self, tmp_path):
+        path = tmp_path / 'vision.json'
+        path.write_text(json.dumps({image_digest(b'tomato'): TOMATO}), encoding='utf-8')
+        recognizer = ReplayRecognizer(str(path), latency='none')
+        recognizer.recognize(b'tomato')[0]['name'] = 'changed'
+        assert recognizer.recognize(b'tomato') == TOMATO
+
+
+class TestRecording:
+    """錄製後可重播測試"""
+
+    def test_record_then_replay(self, tmp_path):
+        path = str(tmp_path / 'recordings' / 'vision.json')
+        recording = RecordingRecognizer(FixedRecognizer(), path)
+        recorded = recording.recognize(b'abc')
+        recording.recognize_packed([b'abcd'], [None])
+
+        replay = ReplayRecognizer(path, latency='none')
+        assert replay.recognize(b'abc') == recorded
+        assert replay.recognize(b'abcd')[0]['name'] == '番茄:4'
+
+    def test_appends_lines_and_tolerates_truncated_tail(self, tmp_path):
+        path = tmp_path / 'vision.json'
+        recording = RecordingRecognizer(FixedRecognizer(), str(path))
+        recording.recognize(b'abc')
+        recording.recognize(b'abc')
+        recording.recognize(b'abcd')
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line)['digest'] for line in lines] == [image_digest(b'abc'), image_digest(b'abcd')]
+
+        # 模擬寫入中途中斷：殘行略過，其餘錄製仍可重播，之後繼續附加
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"digest": "trunc')
+        resumed = RecordingRecognizer(FixedRecognizer(), str(path))
+        assert len(resumed.recordings) == 2
+        resumed.recognize(b'abcde')
+        replay = ReplayRecognizer(str(path), latency='none')
+        assert replay.recognize(b'abcd')[0]['name'] == '番茄:4'
+        assert replay.recognize(b'abcde')[0]['name'] == '番茄:5'
+
+    def test_create_recognizer_from_dotted_path(self, tmp_path):
+        recognizer = create_recognizer(f'{__name__}:FixedRecognizer', record_path='')
+        assert recognizer.name == 'fixed'
+
+        recording = create_recognizer(f'{__name__}:FixedRecognizer', record_path=str(tmp_path / 'r.json'))
+        assert isinstance(recording, RecordingRecognizer)
+        assert recording.name == 'fixed'
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+相同請求合併測試
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.singleflight import SingleFlight, SingleFlightTimeout
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = ('ok', target())
+        except Exception as e:
+            results[i] = ('error', e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """single-flight 測試"""
+
+    def test_concurrent_calls_share_one_upstream(self):
+        flight = SingleFlight('test', timeout=5)
+        calls = []
+
+        def upstream():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'recipes': ['番茄炒蛋']}
+
+        results = run_concurrently(8, lambda: flight.do('key', upstream))
+        assert len(calls) == 1
+        assert all(result == ('ok', {'recipes': ['番茄炒蛋']}) for result in results)
+        stats = flight.stats()
+        assert stats['upstream'] == 1
+        assert stats['coalesced'] == 7
+        assert stats['in_flight'] == 0
+
+    def test_error_is_shared_and_not_remembered(self):
+        flight = SingleFlight('test', timeout=5)
+
+        def failing():
+            time.sleep(0.05)
+            raise ValueError('upstream failed')
+
+        results = run_concurrently(4, lambda: flight.do('key', failing))
+        assert all(kind == 'error' and isinstance(error, ValueError) for kind, error in results)
+        assert flight.stats()['errors'] == 1
+        # 失敗後的新請求會重新呼叫上游
+        assert flight.do('key', lambda: 'ok') == 'ok'
+
+    def test_different_keys_do_not_coalesce(self):
+        flight = SingleFlight('test')
+        assert flight.do('a', lambda: 1) == 1
+        assert flight.do('b', lambda: 2) == 2
+        assert flight.stats()['coalesced'] == 0
+
+    def test_waiter_timeout(self):
+        flight = SingleFlight('test', timeout=0.05)
+        call, leader = flight.acquire('slow')
+        assert leader
+
+        with pytest.raises(SingleFlightTimeout):
+            flight.do('slow', lambda: 'never')
+        assert flight.stats()['timeouts'] == 1
+
+        flight.finish('slow', call, 'done')
+        assert call.wait(0) == 'done'
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+上傳檔案處理測試（以 SpooledUploadRequest 解析實際的 multipart 請求）
+"""
+
+import io
+import tempfile
+
+from werkzeug.test import EnvironBuilder
+
+from services.uploads import SpooledUploadRequest, image_data_url, read_upload
+
+IMAGE = b'\xff\xd8\xff\xe0' + bytes(range(256)) * 64
+
+
+def upload_request(request_class=SpooledUploadRequest, **overrides):
+    builder = EnvironBuilder(method='POST', data={'image': (io.BytesIO(IMAGE), 'photo.jpg')})
+    environ = builder.get_environ()
+    environ.update(overrides)
+    return request_class(environ)
+
+
+def test_small_upload_stays_in_bytesio():
+    request = upload_request()
+    file = request.files['image']
+
+    assert isinstance(file.stream, io.BytesIO)
+    assert read_upload(file) == IMAGE
+
+
+def test_large_upload_uses_spooled_file(tmp_path):
+    class SmallSpool(SpooledUploadRequest):
+        spool_max_bytes = 1024
+        spool_dir = str(tmp_path)
+
+    file = upload_request(SmallSpool).files['image']
+
+    assert not isinstance(file.stream, io.BytesIO)
+    assert read_upload(file) == IMAGE
+
+
+def test_unknown_length_uses_spooled_file():
+    # chunked 上傳沒有 Content-Length，無法事先確定大小
+    request = upload_request()
+    stream = request._get_file_stream(None, 'image/jpeg', 'photo.jpg')
+    assert isinstance(stream, tempfile.SpooledTemporaryFile)
+    stream.close()
+
+
+def test_image_data_url_matches_base64():
+    import base64
+
+    assert image_data_url(IMAGE) == 'data:image/jpeg;base64,' + base64.b64encode(IMAGE).decode('ascii')
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+離線預熱食譜快取與使用記錄測試
+"""
+
+import json
+from datetime import datetime, timezone
+
+from services.cache import LRUCache
+from services.usage_log import UsageLog, iter_usage_file
+from services.warm_cache import Checkpoint, RateBudget, top_combinations, traffic_coverage, warm_cache
+
+
+def canonicalize(ingredients, preferences):
+    return {'ingredients': sorted(set(ingredients)), 'preferences': preferences or {}}
+
+
+def key_fn(canonical):
+    return json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+
+
+def records(*groups):
+    return [{'ingredients': list(group)} for group in groups]
+
+
+TRAFFIC = records(
+    ['番茄', '雞蛋'], ['雞蛋', '番茄'], ['雞蛋', '番茄', '番茄'],
+    ['豆腐', '蔥'], ['蔥', '豆腐'],
+    ['牛肉'],
+)
+
+
+def test_top_combinations_counts_canonical_sets():
+    top, total = top_combinations(TRAFFIC, canonicalize, key_fn, limit=10)
+
+    assert total == 6
+    assert [(item.canonical['ingredients'], item.count) for item in top] == [
+        (['番茄', '雞蛋'], 3), (['蔥', '豆腐'], 2)
+    ]
+
+
+def test_traffic_coverage():
+    warmed = {key_fn(canonicalize(['番茄', '雞蛋'], None))}
+    result = traffic_coverage(TRAFFIC, canonicalize, key_fn, warmed)
+
+    assert result['requests'] == 6
+    assert result['covered_requests'] == 3
+    assert result['coverage'] == 0.5
+    assert result['unique_combinations'] == 3
+    assert result['covered_combinations'] == 1
+
+
+def test_rate_budget_spaces_calls_and_stops_at_total():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    budget = RateBudget(per_minute=60, max_calls=3, clock=lambda: now[0], sleep=sleep)
+    assert [budget.acquire() for _ in range(4)] == [True, True, True, False]
+    assert sleeps == [1.0, 1.0]
+
+
+def test_rate_budget_charges_extra_calls():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    budget = RateBudget(per_minute=60, max_calls=4, clock=lambda: now[0], sleep=sleep)
+    assert budget.acquire()
+    budget.charge(2)
+    assert budget.acquire()
+    assert sleeps == [3.0]
+    assert not budget.acquire()
+
+
+def test_warm_cache_counts_real_llm_calls(tmp_path):
+    top, _ = top_combinations(TRAFFIC, canonicalize, key_fn, limit=10, min_count=1)
+    calls = [0]
+
+    def generate(canonical):
+        calls[0] += 3   # 例如升級層級加一次重試
+        return [{'name': '、'.join(canonical['ingredients'])}]
+
+    stats = warm_cache(top, LRUCache(), generate, RateBudget(0, max_calls=4),
+                       Checkpoint(str(tmp_path / 'checkpoint.json'), 'run'), call_count=lambda: calls[0])
+    assert stats['generated'] == 2
+    assert stats['budget_exhausted']
+    assert stats['llm_calls'] == 6
+
+
+def test_warm_cache_reads_each_cached_key_once(tmp_path):
+    top, _ = top_combinations(TRAFFIC, canonicalize, key_fn, limit=10, min_count=1)
+    cache = LRUCache()
+    for combination in top:
+        cache.set(combination.key, [{'name': 'cached'}])
+    reads = []
+    get = cache.get
+    cache.get = lambda key: reads.append(key) or get(key)
+
+    stats = warm_cache(top, cache, lambda canonical: [], RateBudget(0), Checkpoint('', 'run'))
+    assert stats['cached'] == len(top)
+    assert len(reads) == len(top)
+
+
+def test_warm_cache_resumes_from_checkpoint(tmp_path):
+    top, _ = top_combinations(TRAFFIC, canonicalize, key_fn, limit=10, min_count=1)
+    path = str(tmp_path / 'checkpoint.json')
+    cache = LRUCache()
+    calls = []
+
+    def generate(canonical):
+        calls.append(canonical['ingredients'])
+        if canonical['ingredients'] == ['牛肉']:
+            raise RuntimeError('upstream error')
+        return [{'name': '、'.join(canonical['ingredients'])}]
+
+    # 第一次只有一次呼叫額度
+    stats = warm_cache(top, cache, generate, RateBudget(0, max_calls=1), Checkpoint(path, 'run-1'))
+    assert stats['generated'] == 1
+    assert stats['budget_exhausted']
+
+    stats = warm_cache(top, cache, generate, RateBudget(0), Checkpoint(path, 'run-1'))
+    assert stats['resumed'] == 1
+    assert stats['generated'] == 1
+    assert stats['failed'] == 1
+    assert len(calls) == 3
+    assert cache.get(top[0].key) == [{'name': '番茄、雞蛋'}]
+
+    checkpoint = Checkpoint(path, 'run-1')
+    assert set(checkpoint.done) == {top[0].key, top[1].key}
+    assert list(checkpoint.failed) == [top[2].key]
+
+    # 不同執行從頭開始，快取仍有效的組合不重新生成
+    stats = warm_cache(top, cache, generate, RateBudget(0), Checkpoint(path, 'run-2'))
+    assert stats['cached'] == 2
+    assert len(calls) == 4
+
+
+def test_usage_log_round_trip(tmp_path):
+    path = str(tmp_path / 'logs' / 'usage.jsonl')
+    log = UsageLog(path, interval=0.05)
+    log.record('recipe_search', {'ingredients': ['番茄'], 'preferences': {}})
+    log.record('vision_upload', {'images': 2})
+    assert log.flush(5)
+    assert log.stats()['batches'] == 1
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('not json\n')
+
+    assert list(iter_usage_file(path, 'recipe_search')) == [{'ingredients': ['番茄'], 'preferences': {}}]
+    future = datetime(2999, 1, 1, tzinfo=timezone.utc)
+    assert list(iter_usage_file(path, 'recipe_search', since=future)) == []
+
+
+def test_job_does_not_import_web_routes():
+    import os
+    import subprocess
+    import sys
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import sys, jobs.warm_recipe_cache; "
+        "print(sorted(m for m in ('routes.recipes', 'services.recipe_store', 'services.micro_batch', 'flask') "
+        "if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=backend, OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'test'))
+    output = subprocess.run([sys.executable, '-c', code], cwd=backend, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == '[]'
@@ -57,7 +57,12 @@ def create_tables(conn):
         )
     """)
     
+    # LLM 生成並寫回的食譜：來源與內容指紋（去重、穩定 id）
+    cursor.execute("ALTER TABLE recipes ADD COLUMN IF NOT EXISTS source VARCHAR(20) DEFAULT 'curated'")
+    cursor.execute("ALTER TABLE recipes ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)")
+    
     # 建立索引
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_fingerprint ON recipes(fingerprint)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_cuisine ON recipes(cuisine)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_difficulty ON recipes(difficulty)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_cooking_time ON recipes(cooking_time)")
@@ -30,7 +30,7 @@ def create_connection():
 def get_recipes_from_db(conn):
     """從資料庫取得所有食譜"""
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, description, ingredients, steps, cooking_time, difficulty, cuisine FROM recipes")
+    cursor.execute("SELECT id, name, description, ingredients, steps, cooking_time, difficulty, cuisine, fingerprint FROM recipes")
     
     recipes = []
     for row in cursor.fetchall():
@@ -42,7 +42,8 @@ def get_recipes_from_db(conn):
             'steps': json.loads(row[4]) if row[4] else [],
             'cooking_time': row[5],
             'difficulty': row[6],
-            'cuisine': row[7]
+            'cuisine': row[7],
+            'fingerprint': row[8]
         }
         recipes.append(recipe)
     
@@ -132,7 +133,9 @@ def create_vector_index():
             'steps': json.dumps(recipe['steps'], ensure_ascii=False),
             'cooking_time': recipe['cooking_time'],
             'difficulty': recipe['difficulty'],
-            'cuisine': recipe['cuisine']
+            'cuisine': recipe['cuisine'],
+            # 生成後寫回的食譜以 gen-<指紋> 對外（見 backend/services/recipe_persist.py）
+            'fingerprint': recipe['fingerprint'] or ''
         }
         metadatas.append(metadata)
         ids.append(recipe['id'])
@@ -49,7 +49,12 @@ CREATE TABLE IF NOT EXISTS usage_logs (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- LLM 生成並寫回的食譜：來源與內容指紋（去重、穩定 id）
+ALTER TABLE recipes ADD COLUMN IF NOT EXISTS source VARCHAR(20) DEFAULT 'curated';
+ALTER TABLE recipes ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
+
 -- 建立索引
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_fingerprint ON recipes(fingerprint);
 CREATE INDEX IF NOT EXISTS idx_recipes_cuisine ON recipes(cuisine);
 CREATE INDEX IF NOT EXISTS idx_recipes_difficulty ON recipes(difficulty);
 CREATE INDEX IF NOT EXISTS idx_recipes_cooking_time ON recipes(cooking_time);